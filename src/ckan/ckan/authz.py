@@ -321,11 +321,13 @@ def has_user_permission_for_group_or_org(group_id: Optional[str],
         return True
     capacities = check_config_permission('roles_that_cascade_to_sub_groups')
     assert isinstance(capacities, list)
+    if not capacities:
+        return False
     # Handle when permissions cascade. Check the user's roles on groups higher
     # in the group hierarchy for permission.
+    parent_groups = group.get_parent_group_hierarchy(type=group.type)
+    group_ids = [group_.id for group_ in parent_groups]
     for capacity in capacities:
-        parent_groups = group.get_parent_group_hierarchy(type=group.type)
-        group_ids = [group_.id for group_ in parent_groups]
         if _has_user_permission_for_groups(user_id, permission, group_ids,
                                            capacity=capacity):
             return True
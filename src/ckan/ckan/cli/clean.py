@@ -4,12 +4,12 @@ import click
 import magic
 import os
 
-from typing import List
+from typing import List, Optional
 
 from ckan import model
 from ckan import logic
 from ckan.common import config
-from ckan.lib.uploader import get_uploader
+from ckan.lib.uploader import get_uploader, get_resource_uploader
 from ckan.types import Context
 
 
@@ -92,3 +92,34 @@ def users(force: bool):
         else:
             logic.get_action("user_delete")(context, {"id": user.name})
             click.secho("Deleted user: %s" % user.name, fg="green", bold=True)
+
+
+@clean.command(
+    "part-uploads", short_help="Remove abandoned chunked resource uploads."
+)
+@click.option(
+    "--max-age", type=int,
+    help="Age in seconds of the uploads to remove, by default "
+    "ckan.upload.part_upload_ttl."
+)
+def part_uploads(max_age: Optional[int]):
+    """Removes the files of the chunked resource uploads that didn't
+    receive any data recently.
+
+    Example:
+
+      ckan clean part-uploads
+      ckan clean part-uploads --max-age 3600
+
+    """
+    if max_age is None:
+        max_age = config.get("ckan.upload.part_upload_ttl")
+    if not max_age:
+        click.echo("Chunked uploads don't expire.")
+        return
+    upload = get_resource_uploader({})
+    if not hasattr(upload, "clean_part_uploads"):
+        click.echo("The resource uploader doesn't support chunked uploads.")
+        return
+    count = upload.clean_part_uploads(max_age)  # type: ignore
+    click.secho("Removed {} abandoned uploads.".format(count), fg="green")
@@ -15,8 +15,10 @@ def jobs():
 
 @jobs.command(short_help=u"Start a worker.",)
 @click.option(u"--burst", is_flag=True, help=u"Start worker in burst mode.")
+@click.option(u"--with-scheduler", is_flag=True,
+              help=u"Also start jobs enqueued to run later.")
 @click.argument(u"queues", nargs=-1)
-def worker(burst: bool, queues: list[str]):
+def worker(burst: bool, with_scheduler: bool, queues: list[str]):
     """Start a worker that fetches jobs from queues and executes them. If
     no queue names are given then the worker listens to the default
     queue, this is equivalent to
@@ -35,8 +37,15 @@ def worker(burst: bool, queues: list[str]):
 
     If the `--burst` option is given then the worker will exit as soon
     as all its queues are empty.
+
+    If the `--with-scheduler` option is given then the worker also
+    starts the jobs of its queues that were enqueued to run at a later
+    time, like the flush of API Token accesses on the default queue.
+    A single worker per queue is enough for this:
+
+        ckan jobs worker --with-scheduler default
     """
-    bg_jobs.Worker(queues).work(burst=burst)
+    bg_jobs.Worker(queues).work(burst=burst, with_scheduler=with_scheduler)
 
 
 @jobs.command(name=u"list", short_help=u"List jobs.")
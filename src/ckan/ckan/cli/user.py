@@ -6,6 +6,7 @@ from typing import Optional
 
 import click
 
+import ckan.lib.api_token as api_token
 import ckan.logic as logic
 import ckan.model as model
 from ckan.cli import error_shout
@@ -244,3 +245,12 @@ def list_tokens(username: str):
                 name=token[u"name"], id=token[u"id"], accessed=accessed
             )
         )
+
+
+@token.command(u"flush")
+def flush_tokens_last_access():
+    """Write the buffered last access times of API Tokens to the database"""
+    count = api_token.flush_last_access()
+    click.secho(
+        u"Last access time of {} API Tokens updated".format(count),
+        fg=u"green")
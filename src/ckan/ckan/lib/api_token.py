@@ -3,13 +3,18 @@ from __future__ import annotations
 
 import jwt
 import logging
+import time
 from typing import Any, Iterable, Mapping, Optional
 from calendar import timegm
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, or_
 
 import ckan.plugins as plugins
 import ckan.model as model
+from ckan.model.api_token import api_token_table
 from ckan.common import config
+from ckan.lib.redis import connect_to_redis
 from ckan.logic.schema import default_create_api_token_schema
 from ckan.exceptions import CkanConfigurationException
 from ckan.types import Schema
@@ -23,6 +28,15 @@ _config_secret_fallback = u"SECRET_KEY"
 
 _config_algorithm = u"api_token.jwt.algorithm"
 
+# Maximal number of entries kept by the in-process caches below
+_cache_size = 1024
+
+# encoded token -> (monotonic expiration time, decoded data)
+_decoded_cache: dict[str, tuple[float, Mapping[str, Any]]] = {}
+
+# token id -> monotonic time when its access was last buffered
+_buffered_access: dict[str, float] = {}
+
 
 def _get_plugins() -> Iterable[plugins.IApiToken]:
     return plugins.PluginImplementations(plugins.IApiToken)
@@ -115,12 +129,123 @@ def add_extra(result: dict[str, Any]) -> dict[str, Any]:
     return result
 
 
+def _decode_cached(token: str) -> Optional[Mapping[str, Any]]:
+    '''Decode the token, reusing the result for a few seconds
+    (``api_token.decode_cache_ttl``) so clients sending many requests with
+    the same token don't pay for verifying the signature every time.
+    '''
+    ttl = config.get(u"api_token.decode_cache_ttl")
+    if not ttl:
+        return decode(token)
+
+    now = time.monotonic()
+    cached = _decoded_cache.get(token)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    data = decode(token)
+    if data:
+        expires = now + ttl
+        if isinstance(data.get(u"exp"), (int, float)):
+            # never keep a token beyond its expiration time
+            expires = min(expires, now + data[u"exp"] - time.time())
+        if len(_decoded_cache) >= _cache_size:
+            _decoded_cache.clear()
+        _decoded_cache[token] = (expires, data)
+    return data
+
+
+def _get_access_buffer_key() -> str:
+    return u"ckan:{}:api_token:last_access".format(config[u"ckan.site_id"])
+
+
+def record_access(token: model.ApiToken) -> None:
+    '''Record that the token was used right now.
+
+    The access time is only stored with the precision set by
+    ``api_token.last_access_precision``. Access times are buffered in
+    Redis and written to the database in bulk by
+    :py:func:`flush_last_access`, at most once per precision interval, so
+    the database is not updated on every request. Accesses buffered while
+    a flush is not allowed are flushed by a background job at the end of
+    the interval, even if no other request arrives.
+    '''
+    precision = config.get(u"api_token.last_access_precision")
+    if not precision or not token.last_access:
+        # the first use of a token is recorded immediately
+        token.touch(True)
+        return
+
+    now = datetime.utcnow()
+    if (now - token.last_access).total_seconds() < precision:
+        return
+    buffered = _buffered_access.get(token.id)
+    if buffered and time.monotonic() - buffered < precision:
+        return
+
+    if len(_buffered_access) >= _cache_size:
+        _buffered_access.clear()
+    _buffered_access[token.id] = time.monotonic()
+
+    redis = connect_to_redis()
+    redis.hset(_get_access_buffer_key(), token.id, into_seconds(now))
+    flush_lock = _get_access_buffer_key() + u":flush"
+    if redis.set(flush_lock, 1, nx=True, ex=precision):
+        flush_last_access()
+    elif redis.set(flush_lock + u":scheduled", 1, nx=True, ex=precision):
+        _schedule_flush(redis.ttl(flush_lock))
+
+
+def _schedule_flush(delay: int) -> None:
+    '''Run :py:func:`flush_last_access` in a background job after
+    ``delay`` seconds. The job is added to the default queue and is
+    started by a worker of that queue running with ``--with-scheduler``.'''
+    import ckan.lib.jobs as jobs
+    try:
+        jobs.get_queue().enqueue_in(
+            timedelta(seconds=max(delay, 1)), flush_last_access,
+            job_timeout=config.get(u"ckan.jobs.timeout"))
+    except Exception:
+        log.exception(u"Could not schedule the flush of API Token accesses")
+
+
+def flush_last_access() -> int:
+    '''Write the buffered access times of API tokens to the database.
+
+    :returns: the number of tokens that were buffered
+    '''
+    redis = connect_to_redis()
+    key = _get_access_buffer_key()
+    pipeline = redis.pipeline()
+    pipeline.hgetall(key)
+    pipeline.delete(key)
+    buffered, _ = pipeline.execute()
+    if not buffered:
+        return 0
+
+    params = [{
+        u"_id": id.decode(),
+        u"_last_access": datetime.utcfromtimestamp(int(seconds)),
+    } for id, seconds in buffered.items()]
+    last_access = bindparam(u"_last_access")
+    stmt = api_token_table.update().where(
+        api_token_table.c.id == bindparam(u"_id")
+    ).where(or_(
+        api_token_table.c.last_access.is_(None),
+        api_token_table.c.last_access < last_access,
+    )).values(last_access=last_access)
+    model.Session.execute(stmt, params)
+    model.Session.commit()
+    return len(params)
+
+
 def get_user_from_token(token: str,
                         update_access_time: bool = True
                         ) -> Optional[model.User]:
-    data = decode(token)
+    data = _decode_cached(token)
     if not data:
         return None
+    data = dict(data)
     # do preprocessing in reverse order, allowing onion-like "unwrapping" of
     # the data, added during postprocessing, when token was
     # created. `Interface._reverse_iteration_order` cannot be used here,
@@ -134,5 +259,5 @@ def get_user_from_token(token: str,
     if not token_obj:
         return None
     if update_access_time:
-        token_obj.touch(True)
+        record_access(token_obj)
     return token_obj.owner
@@ -33,6 +33,7 @@ import ckan.lib.dictization as d
 import ckan.authz as authz
 import ckan.lib.search as search
 import ckan.lib.munge as munge
+import ckan.lib.request_cache as request_cache
 import ckan.model as model
 from ckan.types import Context
 from ckan.common import config
@@ -64,7 +65,9 @@ def group_list_dictize(
     if with_package_counts and 'dataset_counts' not in group_dictize_context:
         # 'dataset_counts' will already be in the context in the case that
         # group_list_dictize recurses via group_dictize (groups in groups)
-        group_dictize_context['dataset_counts'] = get_group_dataset_counts()
+        group_dictize_context['dataset_counts'] = request_cache.get(
+            search.REQUEST_CACHE_NAMESPACE, 'group_dataset_counts',
+            get_group_dataset_counts)
     if context.get('with_capacity'):
         group_list = [
             group_dictize(
@@ -340,6 +343,37 @@ def get_group_dataset_counts() -> dict[str, Any]:
     return query.facets
 
 
+def get_visible_group_dataset_counts(
+        context: Context, include_private: bool) -> dict[str, Any]:
+    '''Return the number of datasets of every group and organization that
+    the user in the context can find with ``package_search``, as a SOLR
+    facet with ``groups`` (by name) and ``owner_org`` (by id) fields.
+
+    Private datasets are counted only if ``include_private`` is set, and
+    only those the user has access to.
+
+    The facets are computed once per request, so listing many groups costs
+    a single search.
+    '''
+    def get_counts() -> dict[str, Any]:
+        search_context = cast(
+            Context, dict((k, v) for (k, v) in context.items()
+                          if k != 'schema'))
+        search_results = logic.get_action('package_search')(
+            search_context, {
+                'facet.field': ['groups', 'owner_org'],
+                'facet.limit': -1,
+                'rows': 0,
+                'include_private': include_private,
+            })
+        return search_results['facets']
+
+    return request_cache.get(
+        search.REQUEST_CACHE_NAMESPACE,
+        ('group_dataset_counts', context.get('user'), include_private),
+        get_counts)
+
+
 def group_dictize(group: model.Group, context: Context,
                   include_groups: bool=True,
                   include_tags: bool=True,
@@ -369,6 +403,16 @@ def group_dictize(group: model.Group, context: Context,
     context['with_capacity'] = True
 
     if packages_field:
+        def include_private_for_this_group(group_: model.Group) -> bool:
+            if not group_.is_organization:
+                return False
+            is_group_member = (context.get('user') and
+                authz.has_user_permission_for_group_or_org(
+                    group_.id, context.get('user'), 'read'))
+            if is_group_member:
+                return True
+            return config.get('ckan.auth.allow_dataset_collaborators')
+
         def get_packages_for_this_group(group_: model.Group,
                                         just_the_count: bool = False):
             # Ask SOLR for the list of packages for this org/group
@@ -382,15 +426,8 @@ def group_dictize(group: model.Group, context: Context,
             else:
                 q['fq'] = '+groups:"{0}"'.format(group_.name)
 
-            if group_.is_organization:
-                is_group_member = (context.get('user') and
-                    authz.has_user_permission_for_group_or_org(
-                        group_.id, context.get('user'), 'read'))
-                if is_group_member:
-                    q['include_private'] = True
-                else:
-                    if config.get('ckan.auth.allow_dataset_collaborators'):
-                        q['include_private'] = True
+            if include_private_for_this_group(group_):
+                q['include_private'] = True
 
             if not just_the_count:
                 # package_search limits 'rows' anyway, so this is only if you
@@ -416,15 +453,17 @@ def group_dictize(group: model.Group, context: Context,
             dataset_counts = context.get('dataset_counts', None)
 
             if dataset_counts is None:
-                package_count, packages = get_packages_for_this_group(
-                    group, just_the_count=True)
+                # Share a single search between all the groups dictized
+                # in this request, instead of searching for each of them
+                dataset_counts = get_visible_group_dataset_counts(
+                    context, include_private_for_this_group(group))
+
+            # Use the pre-calculated package_counts
+            facets = dataset_counts
+            if group.is_organization:
+                package_count = facets.get('owner_org', {}).get(group.id, 0)
             else:
-                # Use the pre-calculated package_counts passed in.
-                facets = dataset_counts
-                if group.is_organization:
-                    package_count = facets['owner_org'].get(group.id, 0)
-                else:
-                    package_count = facets['groups'].get(group.name, 0)
+                package_count = facets.get('groups', {}).get(group.name, 0)
 
         result_dict['package_count'] = package_count
 
@@ -0,0 +1,81 @@
+# encoding: utf-8
+
+'''
+Display names of the facet items returned by ``package_search``.
+
+The titles of all the groups and organizations are loaded with a single
+query and kept by each process until a group or organization is created,
+updated or deleted in any of them, which is tracked with a generation
+token in Redis. License titles are built once for each language, so
+restructuring the facets of a search needs no database queries.
+'''
+from __future__ import annotations
+
+import uuid
+from typing import Any, Optional
+
+import flask
+
+import ckan.logic as logic
+import ckan.model as model
+from ckan.common import config
+from ckan.lib import i18n, signals
+from ckan.lib.redis import connect_to_redis
+
+# Actions with these prefixes change the group titles, unless they are
+# side effect free
+INVALIDATING_ACTION_PREFIXES = ('group_', 'organization_')
+
+_group_titles: Optional[tuple[Optional[bytes], dict[str, str]]] = None
+
+
+def _key() -> str:
+    return 'ckan:{}:facet_titles:generation'.format(config['ckan.site_id'])
+
+
+def group_titles() -> dict[str, str]:
+    '''Return the titles of all the groups and organizations by name.'''
+    global _group_titles
+    redis = connect_to_redis()
+    generation = redis.get(_key())
+    if generation is None:
+        redis.set(_key(), uuid.uuid4().hex, nx=True)
+        generation = redis.get(_key())
+    cached = _group_titles
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    titles = dict(model.Session.query(model.Group.name, model.Group.title))
+    _group_titles = (generation, titles)
+    return titles
+
+
+def license_titles() -> dict[str, str]:
+    '''Return the titles of the licenses by id, in the current language.'''
+    if flask.has_request_context():
+        language = i18n.get_lang()
+    else:
+        language = config.get('ckan.locale_default')
+    return model.Package.get_license_register().get_titles(language)
+
+
+def invalidate() -> None:
+    '''Discard the group titles loaded by all the processes.'''
+    # a new random value, as a counter could go back to a value seen before
+    # if Redis is flushed
+    connect_to_redis().set(_key(), uuid.uuid4().hex)
+
+
+def _on_action_succeeded(action_name: str, **kwargs: Any) -> None:
+    if not action_name.startswith(INVALIDATING_ACTION_PREFIXES):
+        return
+    try:
+        action = logic.get_action(action_name)
+    except KeyError:
+        return
+    if getattr(action, 'side_effect_free', False):
+        return
+    invalidate()
+
+
+signals.action_succeeded.connect(_on_action_succeeded)
@@ -48,6 +48,7 @@ import ckan.model as model
 import ckan.lib.formatters as formatters
 import ckan.lib.maintain as maintain
 import ckan.lib.datapreview as datapreview
+import ckan.lib.home_cache as home_cache
 import ckan.logic as logic
 import ckan.lib.uploader as uploader
 import ckan.authz as authz
@@ -2436,10 +2437,10 @@ def get_featured_organizations(count: int = 1) -> list[dict[str, Any]]:
     of organization_list action function
     '''
     config_orgs = config.get('ckan.featured_orgs')
-    orgs = featured_group_org(get_action='organization_show',
-                              list_action='organization_list',
-                              count=count,
-                              items=config_orgs)
+    orgs = home_cache.get(
+        'featured_organizations:{}'.format(count), featured_group_org,
+        config_orgs, 'organization_show', 'organization_list', count,
+        home_cache.is_enabled())
     return orgs
 
 
@@ -2449,32 +2450,39 @@ def get_featured_groups(count: int = 1) -> list[dict[str, Any]]:
     of organization_list action function
     '''
     config_groups = config.get('ckan.featured_groups')
-    groups = featured_group_org(get_action='group_show',
-                                list_action='group_list',
-                                count=count,
-                                items=config_groups)
+    groups = home_cache.get(
+        'featured_groups:{}'.format(count), featured_group_org,
+        config_groups, 'group_show', 'group_list', count,
+        home_cache.is_enabled())
     return groups
 
 
 @core_helper
 def featured_group_org(items: list[str], get_action: str, list_action: str,
-                       count: int) -> list[dict[str, Any]]:
+                       count: int,
+                       anonymous: bool = False) -> list[dict[str, Any]]:
+    # with anonymous, the result is cached for all the users, see
+    # home_cache, so it only includes what anonymous users can see
     def get_group(id: str):
-        context: Context = {'ignore_auth': True,
-                            'limits': {'packages': 2},
+        context: Context = {'limits': {'packages': 2},
                             'for_view': True}
+        if anonymous:
+            context['user'] = ''
+        else:
+            context['ignore_auth'] = True
         data_dict = {'id': id,
                      'include_datasets': True}
 
         try:
             out = logic.get_action(get_action)(context, data_dict)
-        except logic.NotFound:
+        except (logic.NotFound, logic.NotAuthorized):
             return None
         return out
 
     groups_data = []
 
-    extras = logic.get_action(list_action)({}, {})
+    list_context: Context = {'user': ''} if anonymous else {}
+    extras = logic.get_action(list_action)(list_context, {})
 
     # list of found ids to prevent duplicates
     found = []
@@ -2495,12 +2503,18 @@ def featured_group_org(items: list[str], get_action: str, list_action: str,
 
 @core_helper
 def get_site_statistics() -> dict[str, int]:
+    return home_cache.get('site_statistics', _get_site_statistics)
+
+
+def _get_site_statistics() -> dict[str, int]:
+    # cached for all the users, so only public datasets are counted
     stats = {}
     stats['dataset_count'] = logic.get_action('package_search')(
-        {}, {"rows": 1})['count']
-    stats['group_count'] = len(logic.get_action('group_list')({}, {}))
+        {'user': ''}, {"rows": 1})['count']
+    stats['group_count'] = len(
+        logic.get_action('group_list')({'user': ''}, {}))
     stats['organization_count'] = len(
-        logic.get_action('organization_list')({}, {}))
+        logic.get_action('organization_list')({'user': ''}, {}))
     return stats
 
 
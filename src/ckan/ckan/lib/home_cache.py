@@ -0,0 +1,126 @@
+# encoding: utf-8
+
+'''
+Cache for the data shown on the home page.
+
+Values such as the site statistics or the featured groups are computed
+with searches and database queries that would otherwise run on every
+render of the front page. They are stored in Redis and served from there
+for :ref:`ckan.home.cache_ttl` seconds. After that, or as soon as a
+dataset, group or organization is modified, the stale value is still
+served while a background job computes a new one.
+'''
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Any, Callable
+
+import ckan.logic as logic
+from ckan.common import config
+from ckan.lib import signals
+from ckan.lib.redis import connect_to_redis
+
+log = logging.getLogger(__name__)
+
+# Actions with these prefixes invalidate the cache, unless they are side
+# effect free
+INVALIDATING_ACTION_PREFIXES = (
+    'package_', 'dataset_', 'bulk_update_',
+    'group_', 'organization_', 'member_',
+)
+
+
+def _key(suffix: str) -> str:
+    return 'ckan:{}:home_cache:{}'.format(config['ckan.site_id'], suffix)
+
+
+def is_enabled() -> bool:
+    return config.get('ckan.home.cache_ttl') > 0
+
+
+def get(name: str, compute: Callable[..., Any], *args: Any) -> Any:
+    '''Return the cached value called ``name``, computed by calling
+    ``compute(*args)``.
+
+    ``compute`` must be a module level function, so it can be called from
+    a background job, and must return a JSON serializable value. The value
+    is shared by all the users, so it must be computed as an anonymous
+    user, never with the permissions of the current one.
+
+    The value is computed synchronously only if nothing has been cached
+    yet or if caching is disabled by setting :ref:`ckan.home.cache_ttl` to
+    ``0``.
+    '''
+    if not is_enabled():
+        return compute(*args)
+
+    ttl = config.get('ckan.home.cache_ttl')
+    redis = connect_to_redis()
+    pipeline = redis.pipeline()
+    pipeline.hget(_key('values'), name)
+    pipeline.get(_key('invalidated'))
+    cached, invalidated = pipeline.execute()
+
+    if cached is None:
+        return refresh(name, compute, *args)
+
+    entry = json.loads(cached)
+    stale = (entry['at'] + ttl < time.time()
+             or entry['at'] < float(invalidated or 0))
+    if stale:
+        _schedule_refresh(name, compute, args, ttl)
+    return entry['value']
+
+
+def refresh(name: str, compute: Callable[..., Any], *args: Any) -> Any:
+    '''Compute the value called ``name`` and store it in the cache.'''
+    now = time.time()
+    value = compute(*args)
+    redis = connect_to_redis()
+    redis.hset(_key('values'), name, json.dumps({'at': now, 'value': value}))
+    redis.delete(_key('refreshing:' + name))
+    return value
+
+
+def invalidate() -> None:
+    '''Mark all the cached values as stale.'''
+    connect_to_redis().set(_key('invalidated'), time.time())
+
+
+def _schedule_refresh(name: str, compute: Callable[..., Any],
+                      args: tuple[Any, ...], ttl: int) -> None:
+    redis = connect_to_redis()
+    # only one refresh for each value at a time
+    if not redis.set(_key('refreshing:' + name), 1, nx=True, ex=ttl):
+        return
+
+    if not config.get('ckan.home.cache_background_refresh'):
+        refresh(name, compute, *args)
+        return
+
+    import ckan.lib.jobs as jobs
+    try:
+        jobs.enqueue(refresh, [name, compute] + list(args),
+                     title='Refresh home page cache: {}'.format(name))
+    except Exception:
+        log.exception('Could not enqueue refresh of %s', name)
+        redis.delete(_key('refreshing:' + name))
+
+
+def _on_action_succeeded(action_name: str, **kwargs: Any) -> None:
+    if not config.get('ckan.home.cache_ttl'):
+        return
+    if not action_name.startswith(INVALIDATING_ACTION_PREFIXES):
+        return
+    try:
+        action = logic.get_action(action_name)
+    except KeyError:
+        return
+    if getattr(action, 'side_effect_free', False):
+        return
+    invalidate()
+
+
+signals.action_succeeded.connect(_on_action_succeeded)
@@ -1,11 +1,13 @@
 # encoding: utf-8
 from __future__ import annotations
 
+import os
 import re
 import logging
 from os import path
 from typing import Any, Iterable, Optional, Sequence, Union
 
+from jinja2 import bccache
 from jinja2 import nodes
 from jinja2 import loaders
 from jinja2 import ext
@@ -34,11 +36,27 @@ def _get_extensions() -> list[Any]:
 
 
 def get_jinja_env_options() -> dict[str, Any]:
-    return dict(
-        loader=CkanFileSystemLoader(config['computed_template_paths']),
+    auto_reload = config.get('ckan.template_auto_reload')
+    options: dict[str, Any] = dict(
+        loader=CkanFileSystemLoader(
+            config['computed_template_paths'],
+            use_index=config.get('ckan.template_index'),
+            auto_reload=auto_reload,
+        ),
         autoescape=True,
         extensions=_get_extensions(),
     )
+    if not auto_reload:
+        options['auto_reload'] = False
+        # keep every compiled template, they never change
+        options['cache_size'] = -1
+
+    cache_dir = config.get('ckan.template_bytecode_cache_dir')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        options['bytecode_cache'] = bccache.FileSystemBytecodeCache(
+            cache_dir)
+    return options
 
 
 ### Filters
@@ -184,6 +202,45 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 =====================================================================
     '''
 
+    def __init__(self, searchpath: Any, encoding: str = 'utf-8',
+                 followlinks: bool = False,
+                 use_index: bool = False,
+                 auto_reload: bool = True) -> None:
+        super(CkanFileSystemLoader, self).__init__(
+            searchpath, encoding, followlinks)
+        self.auto_reload = auto_reload
+        self.index: Optional[dict[str, list[int]]] = None
+        # with auto_reload, templates added after startup must be found,
+        # even when they override a template of a later path
+        if use_index and not auto_reload:
+            self.index = self.build_index()
+
+    def build_index(self) -> dict[str, list[int]]:
+        ''' Map the name of every template to the positions, in the
+        search path, of the directories that contain it, so looking a
+        template up does not need to probe every directory. '''
+        index: dict[str, list[int]] = {}
+        for position, searchpath in enumerate(self.searchpath):
+            walk = os.walk(searchpath, followlinks=self.followlinks)
+            for dirpath, _dirnames, filenames in walk:
+                for filename in filenames:
+                    name = path.relpath(
+                        path.join(dirpath, filename), searchpath
+                    ).replace(path.sep, '/')
+                    index.setdefault(name, []).append(position)
+        return index
+
+    def _candidates(self, pieces: list[str], start: int) -> Iterable[str]:
+        ''' Yield the paths where the template may be, in order of
+        priority, starting at position `start` of the search path. '''
+        if self.index is not None:
+            for position in self.index.get('/'.join(pieces), []):
+                if position >= start:
+                    yield path.join(self.searchpath[position], *pieces)
+            return
+        for searchpath in self.searchpath[start:]:
+            yield path.join(searchpath, *pieces)
+
     def get_source(self, environment: Any, template: str) -> Any:
         # if the template name starts with * then this should be
         # treated specially.
@@ -193,10 +250,9 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
         if template.startswith('*'):
             parts = template.split('*')
             template = parts[2]
-            index = self.searchpath.index(parts[1])
-            searchpaths = self.searchpath[index + 1:]
+            start = self.searchpath.index(parts[1]) + 1
         else:
-            searchpaths = self.searchpath
+            start = 0
         # § snippet wrapper
         smatch = re.match(r'([^"]+)§(\w+(?:,\w+)*)?([.]\w+)$', template)
         if smatch:
@@ -211,8 +267,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
             )
         # end of ckan changes
         pieces = loaders.split_template_path(template)
-        for searchpath in searchpaths:
-            filename = path.join(searchpath, *pieces)
+        for filename in self._candidates(pieces, start):
             f = open_if_exists(filename)
             if f is None:
                 continue
@@ -227,6 +282,10 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
             finally:
                 f.close()
 
+            if not self.auto_reload:
+                # templates are not expected to change
+                return contents, filename, lambda: True
+
             mtime = path.getmtime(filename)
 
             def uptodate():
@@ -0,0 +1,174 @@
+# encoding: utf-8
+
+'''
+Permission labels granted to users by their memberships.
+
+``package_search`` filters the datasets shown to each logged in user with
+the labels returned by
+:py:meth:`ckan.lib.plugins.DefaultPermissionLabels.get_user_dataset_labels`.
+The ``member-`` and ``collaborator-`` labels of a user are resolved here
+with a single query returning only ids, and kept in Redis for
+:ref:`ckan.auth.permission_labels_cache_ttl` seconds.
+
+They only change when organization memberships, the organization hierarchy,
+dataset collaborators or sysadmin rights change. Any such change discards
+all the cached labels once it is committed to the database.
+'''
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+from typing import Any
+
+import sqlalchemy as sa
+from redis.exceptions import RedisError
+
+import ckan.authz as authz
+import ckan.model as model
+from ckan.common import config
+from ckan.lib import request_cache
+from ckan.lib.redis import connect_to_redis
+
+log = logging.getLogger(__name__)
+
+# flag set on the session when a flush changes data the labels depend on
+_CHANGED = 'ckan_permission_labels_changed'
+
+USER_LABELS_SQL = '''WITH member_of(group_id, cascades) AS
+(
+    -- organizations the user is a member of
+    SELECT group_id, capacity IN :roles_that_cascade FROM member
+    WHERE table_name = 'user' AND table_id = :user_id AND state = 'active'
+          AND capacity IN :roles
+)
+SELECT 'member-' || id FROM "group"
+    WHERE is_organization AND state = 'active'
+          AND (id IN (SELECT group_id FROM member_of)
+               -- their children, if the role cascades to sub groups
+               OR id IN (SELECT h.descendant_id FROM group_hierarchy AS h
+                         JOIN member_of AS p ON p.group_id = h.ancestor_id
+                         WHERE p.cascades))
+'''
+
+SYSADMIN_LABELS_SQL = '''SELECT 'member-' || id FROM "group"
+    WHERE is_organization AND state = 'active'
+'''
+
+COLLABORATOR_LABELS_SQL = '''
+UNION ALL
+SELECT 'collaborator-' || package_id FROM package_member
+    WHERE user_id = :user_id
+'''
+
+
+def _key(suffix: str) -> str:
+    return 'ckan:{}:permission_labels:{}'.format(
+        config['ckan.site_id'], suffix)
+
+
+def get_user_labels(user_obj: model.User) -> list[str]:
+    '''Return the labels granted to the user by their organization
+    memberships and, if enabled, dataset collaborations.
+    '''
+    return list(request_cache.get(
+        'permission_labels', user_obj.id, lambda: _cached_labels(user_obj)))
+
+
+def _cached_labels(user_obj: model.User) -> list[str]:
+    ttl = config.get('ckan.auth.permission_labels_cache_ttl')
+    if not ttl:
+        return query_user_labels(user_obj)
+
+    redis = connect_to_redis()
+    pipeline = redis.pipeline()
+    pipeline.get(_key('generation'))
+    pipeline.get(_key('user:' + user_obj.id))
+    generation, cached = pipeline.execute()
+    generation = int(generation or 0)
+
+    if cached is not None:
+        entry = json.loads(cached)
+        if entry['generation'] == generation:
+            return entry['labels']
+
+    labels = query_user_labels(user_obj)
+    redis.set(
+        _key('user:' + user_obj.id),
+        json.dumps({'generation': generation, 'labels': labels}),
+        ex=ttl)
+    return labels
+
+
+def query_user_labels(user_obj: model.User) -> list[str]:
+    '''Return the labels of the user read from the database.'''
+    if user_obj.sysadmin:
+        sql = SYSADMIN_LABELS_SQL
+    else:
+        sql = USER_LABELS_SQL
+    if authz.check_config_permission('allow_dataset_collaborators'):
+        sql += COLLABORATOR_LABELS_SQL
+
+    statement = sa.text(sql)
+    params: dict[str, Any] = {'user_id': user_obj.id}
+    if not user_obj.sysadmin:
+        statement = statement.bindparams(
+            sa.bindparam('roles', expanding=True),
+            sa.bindparam('roles_that_cascade', expanding=True))
+        params['roles'] = authz.get_roles_with_permission('read')
+        params['roles_that_cascade'] = authz.check_config_permission(
+            'roles_that_cascade_to_sub_groups')
+    return [row[0] for row in model.Session.execute(statement, params)]
+
+
+def invalidate() -> None:
+    '''Discard the labels cached for all users.'''
+    connect_to_redis().incr(_key('generation'))
+    request_cache.invalidate('permission_labels')
+
+
+def _affects_labels(obj: Any, session: Any) -> bool:
+    if isinstance(obj, model.Member):
+        # memberships of users and the organization hierarchy they
+        # cascade through, not the datasets of groups
+        return obj.table_name in ('user', 'group')
+    if isinstance(obj, model.PackageMember):
+        return True
+    if isinstance(obj, model.Group) and obj.is_organization:
+        return obj in session.new or obj in session.deleted or _has_changes(
+            obj, 'state')
+    if isinstance(obj, model.User):
+        return obj not in session.new and _has_changes(obj, 'sysadmin')
+    return False
+
+
+def _has_changes(obj: Any, attribute: str) -> bool:
+    return sa.inspect(obj).attrs[attribute].history.has_changes()
+
+
+def _before_flush(session: Any, flush_context: Any, instances: Any):
+    if session.info.get(_CHANGED):
+        return
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if _affects_labels(obj, session):
+            session.info[_CHANGED] = True
+            return
+
+
+def _after_commit(session: Any):
+    if session.info.pop(_CHANGED, False):
+        try:
+            invalidate()
+        except RedisError:
+            # the change is already committed, so don't fail the request
+            log.exception('Could not invalidate the cached permission labels')
+
+
+def _after_rollback(session: Any):
+    session.info.pop(_CHANGED, None)
+
+
+for _session in (model.Session, model.meta.create_local_session):
+    sa.event.listen(_session, 'before_flush', _before_flush)
+    sa.event.listen(_session, 'after_commit', _after_commit)
+    sa.event.listen(_session, 'after_rollback', _after_rollback)
@@ -11,10 +11,10 @@ from flask import Blueprint
 import ckan.logic.schema as schema
 from ckan.lib.maintain import deprecated
 from ckan.common import g
-from ckan import logic, model, plugins
+from ckan import model, plugins
 import ckan.authz
 from ckan.types import Context, DataDict, Schema
-from . import signals
+from . import permission_labels, signals
 from .navl.dictization_functions import validate
 if TYPE_CHECKING:
     from ckan.config.middleware.flask_app import CKANFlask
@@ -673,15 +673,9 @@ class DefaultPermissionLabels(object):
 
         labels.append(u'creator-%s' % user_obj.id)
 
-        orgs = logic.get_action(u'organization_list_for_user')(
-            {u'user': user_obj.id}, {u'permission': u'read'})
-        labels.extend(u'member-%s' % o[u'id'] for o in orgs)
-
-        if ckan.authz.check_config_permission('allow_dataset_collaborators'):
-            # Add a label for each dataset this user is a collaborator of
-            datasets = logic.get_action('package_collaborator_list_for_user')(
-                {'ignore_auth': True}, {'id': user_obj.id})
-
-            labels.extend('collaborator-%s' % d['package_id'] for d in datasets)
+        # "member-(org id)" for the orgs the user can read and, if enabled,
+        # "collaborator-(dataset id)" for each dataset this user is a
+        # collaborator of
+        labels.extend(permission_labels.get_user_labels(user_obj))
 
         return labels
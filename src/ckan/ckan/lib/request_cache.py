@@ -0,0 +1,86 @@
+# encoding: utf-8
+
+'''
+Memoization of values for the lifetime of the current request.
+
+Values are stored on the Flask application context, grouped by namespace,
+so they are discarded automatically once the request is over. Outside of
+an application context (e.g. CLI commands or background jobs) nothing is
+cached and the factory is called every time.
+
+Example::
+
+    from ckan.lib import request_cache
+
+    counts = request_cache.get(
+        'group_dataset_counts', 'public', get_group_dataset_counts)
+
+Code that changes the cached data must call :py:func:`invalidate` for the
+affected namespace.
+'''
+from __future__ import annotations
+
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+import flask
+
+T = TypeVar('T')
+
+_ATTRIBUTE = '_ckan_request_cache'
+
+
+def _get_storage() -> Optional[dict[str, dict[Hashable, Any]]]:
+    if not flask.has_app_context():
+        return None
+    storage = flask.g.get(_ATTRIBUTE)
+    if storage is None:
+        storage = {}
+        setattr(flask.g, _ATTRIBUTE, storage)
+    return storage
+
+
+def get(namespace: str, key: Hashable, factory: Callable[[], T]) -> T:
+    '''Return the value cached for ``key`` in ``namespace``, calling
+    ``factory`` to compute it the first time it is requested.
+    '''
+    storage = _get_storage()
+    if storage is None:
+        return factory()
+
+    values = storage.setdefault(namespace, {})
+    if key not in values:
+        values[key] = factory()
+    return values[key]
+
+
+def peek(namespace: str, key: Hashable) -> Any:
+    '''Return the value cached for ``key`` in ``namespace``, or None if
+    there is none.
+    '''
+    storage = _get_storage()
+    if storage is None:
+        return None
+    return storage.get(namespace, {}).get(key)
+
+
+def store(namespace: str, key: Hashable, value: Any) -> None:
+    '''Cache ``value`` for ``key`` in ``namespace``, replacing any previous
+    value.
+    '''
+    storage = _get_storage()
+    if storage is None:
+        return
+    storage.setdefault(namespace, {})[key] = value
+
+
+def invalidate(namespace: Optional[str] = None) -> None:
+    '''Drop the values cached in ``namespace``, or all cached values if no
+    namespace is given.
+    '''
+    storage = _get_storage()
+    if storage is None:
+        return
+    if namespace is None:
+        storage.clear()
+    else:
+        storage.pop(namespace, None)
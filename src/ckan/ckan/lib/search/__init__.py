@@ -9,6 +9,7 @@ import warnings
 import traceback
 
 import xml.dom.minidom
+from xml.parsers.expat import ExpatError
 from typing import Collection, Any, Optional, Type, overload
 
 import requests
@@ -23,7 +24,8 @@ from ckan.types import Context
 from ckan.lib.search.common import (
     make_connection, SearchIndexError, SearchQueryError,  # type: ignore
     SolrConnectionError, # type: ignore
-    SearchError, is_available, SolrSettings, config
+    SearchError, is_available, SolrSettings, config,
+    REQUEST_CACHE_NAMESPACE
 )
 from ckan.lib.search.index import (
     SearchIndex, PackageSearchIndex, NoopSearchIndex
@@ -57,7 +59,11 @@ def text_traceback() -> str:
     return res
 
 
-SUPPORTED_SCHEMA_VERSIONS = ['2.8', '2.9', '2.10', '2.11']
+SUPPORTED_SCHEMA_VERSIONS = ['2.8', '2.9', '2.10', '2.11', '2.11.1']
+
+# schema versions where all the fields are stored or have docValues, so
+# Solr keeps them on atomic updates (see ckan.search.partial_updates)
+PARTIAL_UPDATE_SCHEMA_VERSIONS = ['2.11.1']
 
 DEFAULT_OPTIONS = {
     'limit': 20,
@@ -325,37 +331,14 @@ def _get_schema_from_solr(file_offset: str):
 
     return response
 
-def check_solr_schema_version(schema_file: Optional[str]=None) -> bool:
+def get_solr_schema_version(schema_file: Optional[str]=None) -> str:
     '''
-        Checks if the schema version of the SOLR server is compatible
-        with this CKAN version.
-
-        The schema will be retrieved from the SOLR server, using the
-        offset defined in SOLR_SCHEMA_FILE_OFFSET_MANAGED
-        ('/schema?wt=schema.xml'). If SOLR is set to use the manually
-        edited `schema.xml`, the schema will be retrieved from the SOLR
-        server using the offset defined in
-        SOLR_SCHEMA_FILE_OFFSET_CLASSIC ('/admin/file/?file=schema.xml').
-
-        The schema_file parameter allows to override this pointing to
-        different schema file, but it should only be used for testing
-        purposes.
-
-        If the CKAN instance is configured to not use SOLR or the SOLR
-        server is not available, the function will return False, as the
-        version check does not apply. If the SOLR server is available,
-        a SearchError exception will be thrown if the version could not
-        be extracted or it is not included in the supported versions list.
+        Returns the CKAN version of the schema of the SOLR server, or of
+        schema_file if given.
 
-        :schema_file: Absolute path to an alternative schema file. Should
-                      be only used for testing purposes (Default is None)
+        A SearchError exception will be thrown if the version could not be
+        extracted.
     '''
-
-    if not is_available():
-        # Something is wrong with the SOLR server
-        log.warn('Problems were found while connecting to the SOLR server')
-        return False
-
     # Try to get the schema XML file to extract the version
     if not schema_file:
         try:
@@ -386,9 +369,71 @@ def check_solr_schema_version(schema_file: Optional[str]=None) -> bool:
         if schema_file:
             msg += ', using file {}'.format(schema_file)
         raise SearchError(msg)
+    return version
+
+
+def check_solr_schema_version(schema_file: Optional[str]=None) -> bool:
+    '''
+        Checks if the schema version of the SOLR server is compatible
+        with this CKAN version.
+
+        The schema will be retrieved from the SOLR server, using the
+        offset defined in SOLR_SCHEMA_FILE_OFFSET_MANAGED
+        ('/schema?wt=schema.xml'). If SOLR is set to use the manually
+        edited `schema.xml`, the schema will be retrieved from the SOLR
+        server using the offset defined in
+        SOLR_SCHEMA_FILE_OFFSET_CLASSIC ('/admin/file/?file=schema.xml').
+
+        The schema_file parameter allows to override this pointing to
+        different schema file, but it should only be used for testing
+        purposes.
+
+        If the CKAN instance is configured to not use SOLR or the SOLR
+        server is not available, the function will return False, as the
+        version check does not apply. If the SOLR server is available,
+        a SearchError exception will be thrown if the version could not
+        be extracted or it is not included in the supported versions list.
+
+        :schema_file: Absolute path to an alternative schema file. Should
+                      be only used for testing purposes (Default is None)
+    '''
 
+    if not is_available():
+        # Something is wrong with the SOLR server
+        log.warn('Problems were found while connecting to the SOLR server')
+        return False
+
+    version = get_solr_schema_version(schema_file)
     if not version in SUPPORTED_SCHEMA_VERSIONS:
         raise SearchError('SOLR schema version not supported: %s. Supported'
                           ' versions are [%s]'
                           % (version, ', '.join(SUPPORTED_SCHEMA_VERSIONS)))
     return True
+
+
+# schema versions of the SOLR servers, by URL
+_schema_versions: dict[str, str] = {}
+
+
+def schema_supports_partial_updates() -> bool:
+    '''
+        Returns True if the schema of the SOLR server keeps all the fields
+        of the documents on atomic updates. The schema version is only
+        read once per process.
+    '''
+    solr_url = SolrSettings.get()[0]
+    if solr_url not in _schema_versions:
+        try:
+            version = get_solr_schema_version()
+        except (SearchError, requests.RequestException, ExpatError):
+            log.warning('Could not read the version of the SOLR schema',
+                        exc_info=True)
+            return False
+        if version not in PARTIAL_UPDATE_SCHEMA_VERSIONS:
+            log.warning(
+                'SOLR schema version %s does not support partial updates,'
+                ' ckan.search.partial_updates is ignored. Supported'
+                ' versions are [%s]', version,
+                ', '.join(PARTIAL_UPDATE_SCHEMA_VERSIONS))
+        _schema_versions[solr_url] = version
+    return _schema_versions[solr_url] in PARTIAL_UPDATE_SCHEMA_VERSIONS
@@ -3,13 +3,19 @@ from __future__ import annotations
 
 import datetime
 import logging
+import os
 import re
+import threading
+import time
 from typing import Any, Optional
 
 import pysolr
+import requests
 import simplejson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from six.moves.urllib.parse import quote_plus  # type: ignore
+from six.moves.urllib.parse import quote_plus, urlparse  # type: ignore
 from pysolr import Solr
 
 from ckan.common import config
@@ -35,6 +41,14 @@ class SolrConnectionError(Exception):
 
 DEFAULT_SOLR_URL = 'http://127.0.0.1:8983/solr/ckan'
 
+# Namespace of ckan.lib.request_cache for values computed from the search
+# index. It is invalidated every time the index is modified.
+REQUEST_CACHE_NAMESPACE = 'search'
+
+# prefix of the stored fields with the JSON of each top level key of the
+# validated dataset dicts, see ckan.search.store_projection_fields
+PROJECTION_FIELD_PREFIX = 'validated_field_'
+
 
 class SolrSettings(object):
     _is_initialised: bool = False
@@ -77,6 +91,178 @@ def is_available() -> bool:
     return True
 
 
+# upper bounds in seconds of the buckets of the Solr latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+# responses to retry, as Solr or a proxy in front of it is unavailable
+RETRY_STATUSES = (502, 503, 504)
+
+# path of the Solr requests that modify the index
+UPDATE_PATH_RE = re.compile(r'/update(/|$)')
+
+_session: Optional[SolrSession] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+_metrics: dict[str, dict[str, Any]] = {}
+_metrics_lock = threading.Lock()
+
+
+def is_update_url(url: str) -> bool:
+    return bool(UPDATE_PATH_RE.search(urlparse(url).path))
+
+
+class SolrSession(requests.Session):
+    """
+    HTTP session of the Solr connections, sending the updates with their
+    own timeout and retries, as they can't be sent again once Solr may have
+    received them.
+    """
+    def __init__(self, write_adapter: HTTPAdapter,
+                 read_timeout: Optional[int],
+                 write_timeout: Optional[int]) -> None:
+        super(SolrSession, self).__init__()
+        self.write_adapter = write_adapter
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+
+    def request(self, method: str, url: str,  # type: ignore
+                *args: Any, **kwargs: Any) -> requests.Response:
+        kwargs['timeout'] = self.write_timeout if is_update_url(url) \
+            else self.read_timeout
+        return super(SolrSession, self).request(method, url, *args, **kwargs)
+
+    def get_adapter(self, url: str) -> Any:
+        if is_update_url(url):
+            return self.write_adapter
+        return super(SolrSession, self).get_adapter(url)
+
+    def close(self) -> None:
+        super(SolrSession, self).close()
+        self.write_adapter.close()
+
+
+def get_session() -> SolrSession:
+    """
+    Return the HTTP session shared by all the Solr connections of the
+    process, keeping connections alive in a pool and retrying requests
+    that fail to connect or get a transient error, with backoff.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        # connections can't be shared with a forked process
+        if _session is None or _session_pid != os.getpid():
+            retries = Retry(
+                total=config.get('ckan.search.solr_retries'),
+                backoff_factor=config.get(
+                    'ckan.search.solr_retry_backoff') / 1000.0,
+                status_forcelist=RETRY_STATUSES,
+                # searches can be sent with POST too
+                allowed_methods=None,
+                raise_on_status=False)
+            pool_size = config.get('ckan.search.solr_pool_size')
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                max_retries=retries)
+            # an update that timed out may still be running: sending it
+            # again only piles up work on Solr
+            write_adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                max_retries=retries.new(read=0))
+            default_timeout = config.get('solr_timeout')
+            session = SolrSession(
+                write_adapter,
+                config.get('ckan.search.solr_read_timeout')
+                or default_timeout,
+                config.get('ckan.search.solr_write_timeout')
+                or default_timeout)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def reset_session() -> None:
+    """
+    Close the pooled connections, so the next request uses a new session
+    built from the current configuration.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def _record(operation: str, duration: float, error: bool) -> None:
+    with _metrics_lock:
+        metrics = _metrics.setdefault(operation, {
+            'count': 0,
+            'errors': 0,
+            'seconds': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+        metrics['count'] += 1
+        metrics['seconds'] += duration
+        if error:
+            metrics['errors'] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                break
+        else:
+            i = len(LATENCY_BUCKETS)
+        metrics['buckets'][i] += 1
+
+
+def get_metrics() -> dict[str, dict[str, Any]]:
+    """
+    Return the metrics of the Solr requests made by this process, by
+    operation (``read`` or ``write``): the number of requests, the number
+    of them that failed, the total seconds spent and the latency histogram,
+    as a list of ``(upper bound in seconds, count)`` pairs with the last
+    bound being ``None``.
+    """
+    with _metrics_lock:
+        return {
+            operation: dict(
+                metrics,
+                buckets=list(zip(LATENCY_BUCKETS + (None,),
+                                 metrics['buckets'])))
+            for operation, metrics in _metrics.items()}
+
+
+def reset_metrics() -> None:
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class PooledSolr(pysolr.Solr):
+    """
+    Solr client using the connection pool of the process, recording the
+    metrics of each request.
+    """
+    def __init__(self, url: str, **kwargs: Any) -> None:
+        super(PooledSolr, self).__init__(url, **kwargs)
+        self.session = get_session()
+
+    def _send_request(self, method: str, path: str = '',
+                      *args: Any, **kwargs: Any) -> str:
+        operation = 'write' if path.startswith('update') else 'read'
+        start = time.monotonic()
+        try:
+            response = super(PooledSolr, self)._send_request(
+                method, path, *args, **kwargs)
+        except Exception:
+            _record(operation, time.monotonic() - start, error=True)
+            raise
+        _record(operation, time.monotonic() - start, error=False)
+        return response
+
+
 def make_connection(decode_dates: bool = True) -> Solr:
     solr_url, solr_user, solr_password = SolrSettings.get()
 
@@ -91,13 +277,11 @@ def make_connection(decode_dates: bool = True) -> Solr:
                                        quote_plus(solr_password),
                                        solr_url)
 
-    timeout = config.get('solr_timeout')
-
     if decode_dates:
         decoder = simplejson.JSONDecoder(object_hook=solr_datetime_decoder)
-        return pysolr.Solr(solr_url, decoder=decoder, timeout=timeout)
+        return PooledSolr(solr_url, decoder=decoder)
     else:
-        return pysolr.Solr(solr_url, timeout=timeout)
+        return PooledSolr(solr_url)
 
 
 def solr_datetime_decoder(d: dict[str, Any]) -> dict[str, Any]:
@@ -5,23 +5,29 @@ import socket
 import string
 import logging
 import collections
+import hashlib
 import json
 import re
 from dateutil.parser import parse, ParserError as DateParserError
-from typing import Any, NoReturn, Optional
+from typing import Any, NoReturn, Optional, cast
 
 import six
 import pysolr
 from ckan.common import config
 
 
-from .common import SearchIndexError, make_connection
+from .common import (
+    SearchIndexError, make_connection, REQUEST_CACHE_NAMESPACE,
+    PROJECTION_FIELD_PREFIX
+)
 import ckan.model as model
 from ckan.plugins import (PluginImplementations,
                           IPackageController)
 import ckan.logic as logic
 import ckan.lib.plugins as lib_plugins
 import ckan.lib.navl.dictization_functions
+import ckan.lib.request_cache as request_cache
+from . import result_cache
 from ckan.types import Context
 
 log = logging.getLogger(__name__)
@@ -30,6 +36,18 @@ TYPE_FIELD = "entity_type"
 PACKAGE_TYPE = "package"
 KEY_CHARS = string.digits + string.ascii_letters + "_-"
 
+# resource fields indexed as lists, with the values of all the resources
+RESOURCE_FIELDS = [('name', 'res_name'),
+                   ('description', 'res_description'),
+                   ('format', 'res_format'),
+                   ('url', 'res_url'),
+                   ('resource_type', 'res_type')]
+
+# top level keys of the dataset dicts that can be updated in the index
+# without reindexing the whole document, see
+# PackageSearchIndex.update_changed_fields()
+PARTIAL_UPDATE_KEYS = {'resources', 'num_resources', 'metadata_modified'}
+
 SOLR_FIELDS = [TYPE_FIELD, "res_url", "text", "urls", "indexed_ts", "site_id"]
 RESERVED_FIELDS = SOLR_FIELDS + ["tags", "groups", "res_name", "res_description",
                                  "res_format", "res_url", "res_type"]
@@ -46,12 +64,26 @@ def escape_xml_illegal_chars(val: str, replacement: str='') -> str:
     return _illegal_xml_chars_re.sub(replacement, val)
 
 
+def index_id(package_id: str) -> str:
+    '''Return the unique key of the document of a dataset in the index.'''
+    return hashlib.md5(six.b('%s%s' % (
+        package_id, config.get('ckan.site_id')))).hexdigest()
+
+
+def _is_empty(value: Any) -> bool:
+    if isinstance(value, list):
+        return all(_is_empty(item) for item in value)
+    return value is None or value == ''
+
+
 def clear_index() -> None:
     conn = make_connection()
     query = "+site_id:\"%s\"" % (config.get('ckan.site_id'))
     try:
         conn.delete(q=query)
         conn.commit()
+        request_cache.invalidate(REQUEST_CACHE_NAMESPACE)
+        result_cache.bump_index_generation()
     except socket.error as e:
         err = 'Could not connect to SOLR %r: %r' % (conn.url, e)
         log.error(err)
@@ -102,8 +134,143 @@ class PackageSearchIndex(SearchIndex):
     def update_dict(self,
                     pkg_dict: dict[str, Any],
                     defer_commit: bool = False) -> None:
+        from ckan.lib.search import schema_supports_partial_updates
+        if config.get('ckan.search.partial_updates') and pkg_dict and \
+                schema_supports_partial_updates() and \
+                self.update_changed_fields(pkg_dict, defer_commit):
+            return
         self.index_package(pkg_dict, defer_commit)
 
+    def update_fields(self,
+                      package_id: str,
+                      fields: dict[str, Any],
+                      defer_commit: bool = False) -> None:
+        '''
+        Set the values of some fields of the document of a dataset in the
+        index with a Solr atomic update, instead of reindexing it.
+
+        All the fields of the Solr schema that are not the destination of a
+        copyField must be stored or have docValues, as in the schema
+        provided by CKAN since version 2.11.1. Raises SearchIndexError if
+        the schema of the Solr server is older or the dataset is not
+        indexed.
+        '''
+        from ckan.lib.search import schema_supports_partial_updates
+        if not schema_supports_partial_updates():
+            raise SearchIndexError(
+                'The Solr schema does not support partial updates')
+        if not fields or any(_is_empty(value) for value in fields.values()):
+            # pysolr drops empty values, so they can't be set
+            raise SearchIndexError(
+                'Can not set empty values with a partial update')
+        doc = dict(fields, index_id=index_id(package_id))
+        # only update the document if it exists
+        doc['_version_'] = 1
+        commit = not defer_commit and config.get('ckan.search.solr_commit')
+        try:
+            conn = make_connection()
+            conn.add(docs=[doc],
+                     fieldUpdates={field: 'set' for field in fields},
+                     commit=commit)
+        except pysolr.SolrError as e:
+            raise SearchIndexError(
+                'Solr returned an error: {0}'.format(e.args[0][:1000]))
+        request_cache.invalidate(REQUEST_CACHE_NAMESPACE)
+        result_cache.bump_index_generation()
+
+    def update_changed_fields(self,
+                              pkg_dict: dict[str, Any],
+                              defer_commit: bool = False) -> bool:
+        '''
+        Update only the fields of the indexed document of a dataset that
+        depend on its resources and modification date, if they are the only
+        changes since it was indexed. The stored data dicts are patched
+        with the new resources, validating only them.
+
+        ``before_dataset_index`` plugin hooks are not called.
+
+        Returns False if the whole dataset needs to be reindexed.
+        '''
+        package_plugin = lib_plugins.lookup_package_plugin(
+            pkg_dict.get('type'))
+        if hasattr(package_plugin, 'validate'):
+            # it may validate the resources depending on the dataset
+            return False
+
+        try:
+            conn = make_connection(decode_dates=False)
+            response = conn.search(
+                q='index_id:%s' % index_id(pkg_dict['id']),
+                fl='data_dict validated_data_dict', rows=1)
+        except pysolr.SolrError:
+            log.warning('Could not read %s from the search index',
+                        pkg_dict['id'], exc_info=True)
+            return False
+        docs = cast("list[dict[str, Any]]", response.docs)
+        if not docs or 'data_dict' not in docs[0]:
+            return False
+
+        indexed = json.loads(docs[0]['data_dict'])
+        indexed.pop('validated_data_dict', None)
+        # compare the dicts as they are serialized
+        new = json.loads(json.dumps(pkg_dict))
+        changed = {key for key in set(indexed) | set(new)
+                   if indexed.get(key) != new.get(key)}
+        if not changed or not changed <= PARTIAL_UPDATE_KEYS:
+            return False
+
+        schema = package_plugin.show_package_schema()
+        # validation errors are ignored, as when indexing the whole dataset
+        resources, _errors = ckan.lib.navl.dictization_functions.validate(
+            {'resources': new.get('resources', [])},
+            {'resources': schema['resources']},
+            {'model': model, 'session': model.Session})
+        validated_pkg_dict = json.loads(docs[0]['validated_data_dict'])
+        for key in changed:
+            if key == 'resources':
+                validated_pkg_dict[key] = resources.get(key, [])
+            elif key in new:
+                validated_pkg_dict[key] = new[key]
+            else:
+                validated_pkg_dict.pop(key, None)
+        validated_data_dict = json.dumps(
+            validated_pkg_dict,
+            cls=ckan.lib.navl.dictization_functions.MissingNullEncoder)
+        new['validated_data_dict'] = validated_data_dict
+
+        fields: dict[str, Any] = {
+            'data_dict': json.dumps(new),
+            'validated_data_dict': validated_data_dict,
+            'metadata_modified': new['metadata_modified'] + 'Z',
+        }
+        resource_extras = [(e, 'res_extras_' + e) for e
+                           in model.Resource.get_extra_columns()]
+        for okey, nkey in RESOURCE_FIELDS + resource_extras:
+            values = [resource.get(okey, u'')
+                      for resource in new.get('resources', [])]
+            if values != [resource.get(okey, u'')
+                          for resource in indexed.get('resources', [])]:
+                fields[nkey] = values
+        if config.get('ckan.search.store_projection_fields'):
+            for key in changed:
+                if key in validated_pkg_dict:
+                    fields[PROJECTION_FIELD_PREFIX + key] = json.dumps(
+                        validated_pkg_dict[key],
+                        cls=ckan.lib.navl.dictization_functions.
+                        MissingNullEncoder)
+
+        if any(_is_empty(value) for value in fields.values()):
+            return False
+        try:
+            self.update_fields(pkg_dict['id'], fields, defer_commit)
+        except SearchIndexError:
+            log.warning('Could not update %s in the search index, '
+                        'reindexing it', pkg_dict['id'], exc_info=True)
+            return False
+        log.debug('Updated %s of %s in the index',
+                  ', '.join(sorted(changed)), pkg_dict.get('name'))
+        return True
+
     def index_package(self,
                       pkg_dict: Optional[dict[str, Any]],
                       defer_commit: bool = False) -> None:
@@ -186,16 +353,11 @@ class PackageSearchIndex(SearchIndex):
         else:
            pkg_dict['organization'] = None
 
-        resource_fields = [('name', 'res_name'),
-                           ('description', 'res_description'),
-                           ('format', 'res_format'),
-                           ('url', 'res_url'),
-                           ('resource_type', 'res_type')]
         resource_extras = [(e, 'res_extras_' + e) for e
                             in model.Resource.get_extra_columns()]
         # flatten the structure for indexing:
         for resource in pkg_dict.get('resources', []):
-            for (okey, nkey) in resource_fields + resource_extras:
+            for (okey, nkey) in RESOURCE_FIELDS + resource_extras:
                 pkg_dict[nkey] = pkg_dict.get(nkey, []) + [resource.get(okey, u'')]
         pkg_dict.pop('resources', None)
 
@@ -265,8 +427,16 @@ class PackageSearchIndex(SearchIndex):
                 pass
 
         # add a unique index_id to avoid conflicts
-        import hashlib
-        pkg_dict['index_id'] = hashlib.md5(six.b('%s%s' % (pkg_dict['id'],config.get('ckan.site_id')))).hexdigest()
+        pkg_dict['index_id'] = index_id(pkg_dict['id'])
+
+        # store each top level field of the validated data dict on its own,
+        # so searches projecting a few fields only read those
+        if config.get('ckan.search.store_projection_fields'):
+            for key, value in validated_pkg_dict.items():
+                if key and all(c in KEY_CHARS for c in key):
+                    pkg_dict[PROJECTION_FIELD_PREFIX + key] = json.dumps(
+                        value, cls=ckan.lib.navl.dictization_functions.
+                        MissingNullEncoder)
 
         for item in PluginImplementations(IPackageController):
             pkg_dict = item.before_dataset_index(pkg_dict)
@@ -288,6 +458,8 @@ class PackageSearchIndex(SearchIndex):
             if not config.get('ckan.search.solr_commit'):
                 commit = False
             conn.add(docs=[pkg_dict], commit=commit)
+            request_cache.invalidate(REQUEST_CACHE_NAMESPACE)
+            result_cache.bump_index_generation()
         except pysolr.SolrError as e:
             msg = 'Solr returned an error: {0}'.format(
                 e.args[0][:1000] # limit huge responses
@@ -318,6 +490,8 @@ class PackageSearchIndex(SearchIndex):
         try:
             commit = config.get('ckan.search.solr_commit')
             conn.delete(q=query, commit=commit)
+            request_cache.invalidate(REQUEST_CACHE_NAMESPACE)
+            result_cache.bump_index_generation()
         except Exception as e:
             log.exception(e)
             raise SearchIndexError(e)
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import re
 import logging
-from typing import Any, NoReturn, Optional, Union, cast, Dict
+from typing import Any, Iterable, NoReturn, Optional, Union, cast, Dict
 from pyparsing import (
     Word, QuotedString, Suppress, OneOrMore, Group, alphanums
 )
@@ -30,9 +30,13 @@ _open_licenses: Optional[list[str]] = None
 VALID_SOLR_PARAMETERS = set([
     'q', 'fl', 'fq', 'rows', 'sort', 'start', 'wt', 'qf', 'bf', 'boost',
     'facet', 'facet.mincount', 'facet.limit', 'facet.field',
-    'extras', 'fq_list', 'tie', 'defType', 'mm', 'df'
+    'extras', 'fq_list', 'tie', 'defType', 'mm', 'df', 'cursorMark'
 ])
 
+# field used to break ties when sorting for cursor pagination, Solr requires
+# the unique key of the index in the sort
+CURSOR_SORT_FIELD = 'index_id'
+
 # for (solr) package searches, this specifies the fields that are searched
 # and their relative weighting
 QUERY_FIELDS = "name^4 title^4 tags^2 groups^2 text"
@@ -199,10 +203,12 @@ class SearchQuery(object):
     count: int
     results: list[Any]
     facets: dict[str, Any]
+    next_cursor: Optional[str]
 
     def __init__(self) -> None:
         self.results = []
         self.count = 0
+        self.next_cursor = None
 
     @property
     def open_licenses(self) -> list[str]:
@@ -387,11 +393,21 @@ class PackageSearchQuery(SearchQuery):
         if not q or q == '""' or q == "''":
             query['q'] = "*:*"
 
+        # deep pagination with a cursor instead of an offset
+        cursor = query.get('cursorMark')
+        if cursor is not None:
+            if int(query.get('start') or 0):
+                raise SearchQueryError(
+                    '"start" can not be used together with a cursor')
+            query.pop('start', None)
+            query['sort'] = cursor_sort(query.get('sort'))
+
         # number of results
         rows_to_return = int(query.get('rows', 10))
         # query['rows'] should be a defaulted int, due to schema, but make
-        # certain, for legacy tests
-        if rows_to_return > 0:
+        # certain, for legacy tests. Not with a cursor, as the next one
+        # would skip the extra row
+        if rows_to_return > 0 and cursor is None:
             # #1683 Work around problem of last result being out of order
             #       in SOLR 1.4
             rows_to_query = rows_to_return + 1
@@ -411,10 +427,6 @@ class PackageSearchQuery(SearchQuery):
         if not any('+state:' in _item for _item in fq):
             fq.append('+state:active')
 
-        # only return things we should be able to see
-        if permission_labels is not None:
-            fq.append('+permission_labels:(%s)' % ' OR '.join(
-                solr_literal(p) for p in permission_labels))
         query['fq'] = fq
 
         # faceting
@@ -453,6 +465,10 @@ class PackageSearchQuery(SearchQuery):
                 for item in query[param]:
                     _check_query_parser(param, item)
 
+        # only return things we should be able to see (added after the
+        # check, the terms query parser is not allowed in user parameters)
+        if permission_labels is not None:
+            fq.append(permission_labels_filter(permission_labels))
 
         conn = make_connection(decode_dates=False)
         log.debug('Package query: %r' % query)
@@ -469,6 +485,9 @@ class PackageSearchQuery(SearchQuery):
                         'Unknown sort order' in e.args[0]:
                     raise SearchQueryError('Invalid "sort" parameter')
 
+                if "cursorMark" in e.args[0] and cursor is not None:
+                    raise SearchQueryError('Invalid "cursor" parameter')
+
                 if "Failed to connect to server" in e.args[0]:
                     log.warning("Connection Error: Failed to connect to Solr server.")
                     raise SolrConnectionError("Solr returned an error while searching.")
@@ -478,6 +497,11 @@ class PackageSearchQuery(SearchQuery):
         self.count = solr_response.hits
         self.results = cast("list[Any]", solr_response.docs)
 
+        # Solr returns the same cursor once all the results have been read
+        self.next_cursor = None
+        if cursor is not None and solr_response.nextCursorMark != cursor:
+            self.next_cursor = solr_response.nextCursorMark
+
 
         # #1683 Filter out the last row that is sometimes out of order
         self.results = self.results[:rows_to_return]
@@ -504,6 +528,71 @@ class PackageSearchQuery(SearchQuery):
         return {'results': self.results, 'count': self.count}
 
 
+def cursor_sort(sort: Optional[str]) -> str:
+    '''
+    return the sort with the unique key of the index added as the last
+    criteria, as needed to paginate with a cursor.
+    '''
+    clauses = [c.strip() for c in (sort or '').split(',') if c.strip()]
+    if not any(c.split()[0] == CURSOR_SORT_FIELD for c in clauses):
+        clauses.append(CURSOR_SORT_FIELD + ' asc')
+    return ', '.join(clauses)
+
+
+def projection_tree(fields: Iterable[str]) -> dict[str, Any]:
+    '''
+    return the tree of keys selected by a list of dotted paths, that can
+    also be separated by commas. A key whose whole value is selected maps to
+    None, e.g. ``["title", "resources.format,resources.url"]`` gives
+    ``{"title": None, "resources": {"format": None, "url": None}}``.
+    '''
+    tree: dict[str, Any] = {}
+    for item in fields:
+        for path in item.split(','):
+            keys = [key.strip() for key in path.split('.')]
+            if not all(keys):
+                continue
+            node = tree
+            for key in keys[:-1]:
+                if key in node and node[key] is None:
+                    # the whole value is already selected
+                    break
+                node = node.setdefault(key, {})
+            else:
+                node[keys[-1]] = None
+    return tree
+
+
+def project(value: Any, tree: Optional[dict[str, Any]]) -> Any:
+    '''
+    return the parts of value selected by a tree from
+    :py:func:`projection_tree`. Lists are projected item by item.
+    '''
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree)
+                for key, subtree in tree.items() if key in value}
+    return value
+
+
+def permission_labels_filter(labels: Iterable[str]) -> str:
+    '''
+    return a filter query for the documents with any of the permission
+    labels. The terms query parser keeps its cost low however many labels
+    users have, and the labels are sorted so the same labels always give
+    the same filter, which can be reused from the Solr filter cache.
+    '''
+    labels = sorted(set(labels))
+    if any(u',' in label for label in labels):
+        # can't be separated by the terms query parser
+        return u'+permission_labels:(%s)' % u' OR '.join(
+            solr_literal(p) for p in labels)
+    return u'{!terms f=permission_labels}' + u','.join(labels)
+
+
 def solr_literal(t: str) -> str:
     '''
     return a safe literal string for a solr query. Instead of escaping
@@ -0,0 +1,91 @@
+# encoding: utf-8
+
+'''
+Process wide cache of ``package_search`` results for public searches.
+
+Dataset listings, facets and embedded widgets repeat the same searches
+over and over. When :ref:`ckan.search.result_cache.size` is set, the
+results of searches that can only return public datasets are kept in
+memory, keyed by their normalized parameters, for
+:ref:`ckan.search.result_cache.ttl` seconds.
+
+Every change to the search index increments a generation counter stored
+in Redis, shared by all the CKAN processes. Cached results from an older
+generation are never returned.
+'''
+from __future__ import annotations
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ckan.common import config
+from ckan.lib.redis import connect_to_redis
+
+_results: "OrderedDict[str, tuple[int, float, dict[str, Any]]]" = \
+    OrderedDict()
+_lock = threading.Lock()
+
+
+def _generation_key() -> str:
+    return 'ckan:{}:search:index_generation'.format(config['ckan.site_id'])
+
+
+def get_index_generation() -> int:
+    '''Return the current generation of the search index.'''
+    return int(connect_to_redis().get(_generation_key()) or 0)
+
+
+def bump_index_generation() -> None:
+    '''Mark all the cached search results as stale. Called whenever the
+    search index is modified.'''
+    connect_to_redis().incr(_generation_key())
+
+
+def is_enabled() -> bool:
+    return config.get('ckan.search.result_cache.size') > 0
+
+
+def make_key(data_dict: dict[str, Any], labels: list[str],
+             for_view: bool = False) -> str:
+    '''Return the cache key of a search, the same for any order of the
+    parameters.'''
+    return json.dumps([data_dict, sorted(labels), bool(for_view)],
+                      sort_keys=True, default=str)
+
+
+def get(key: str, generation: int) -> Optional[dict[str, Any]]:
+    '''Return a copy of the results cached for the search, or None if there
+    are none or they are older than the index ``generation``.'''
+    with _lock:
+        entry = _results.get(key)
+        if entry is None:
+            return None
+        entry_generation, expires, results = entry
+        if entry_generation != generation or expires < time.monotonic():
+            del _results[key]
+            return None
+        _results.move_to_end(key)
+    return copy.deepcopy(results)
+
+
+def store(key: str, results: dict[str, Any], generation: int) -> None:
+    '''Cache the results of the search, computed from the index at
+    ``generation``, which must be read before running the search.'''
+    size = config.get('ckan.search.result_cache.size')
+    expires = time.monotonic() + config.get('ckan.search.result_cache.ttl')
+    entry = (generation, expires, copy.deepcopy(results))
+    with _lock:
+        _results[key] = entry
+        _results.move_to_end(key)
+        while len(_results) > size:
+            _results.popitem(last=False)
+
+
+def clear() -> None:
+    '''Discard all the results cached by this process.'''
+    with _lock:
+        _results.clear()
@@ -3,12 +3,21 @@ from __future__ import annotations
 
 import os
 import cgi
+import contextlib
 import datetime
+import fcntl
+import hashlib
+import json
 import logging
 import magic
 import mimetypes
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, IO, Optional, Union
+from typing import Any, IO, Iterator, Optional, Union
 from urllib.parse import urlparse
 
 from werkzeug.datastructures import FileStorage as FlaskFileStorage
@@ -21,12 +30,31 @@ from ckan.types import ErrorDict, PUploader, PResourceUploader
 
 ALLOWED_UPLOAD_TYPES = (cgi.FieldStorage, FlaskFileStorage)
 MB = 1 << 20
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+PART_STATE_RE = re.compile(r'~[0-9a-f]{32}\.json$')
+# number of chunked uploads whose SHA-256 state is kept by each process
+MAX_PART_HASHERS = 100
+# keys of the state of the chunked uploads saved in their .json file
+PART_STATE_KEYS = ('upload_id', 'filename', 'size', 'checksum', 'generation')
 
 log = logging.getLogger(__name__)
 
+# SHA-256 state of the chunked uploads being written by this process, by
+# part path, as (write generation, number of bytes hashed, hasher). Hash
+# objects can't be saved, so an upload written by another process since
+# then is read again when it is completed.
+_part_hashers: "OrderedDict[str, tuple[int, int, Any]]" = OrderedDict()
+_part_hashers_lock = threading.Lock()
+
 
 def _copy_file(input_file: IO[bytes],
-               output_file: IO[bytes], max_size: int) -> None:
+               output_file: IO[bytes], max_size: int,
+               hasher: Optional["hashlib._Hash"] = None) -> None:
+    '''Copy ``input_file`` into ``output_file`` in MB chunks.
+
+    If ``hasher`` is given, it is updated with every chunk written, so the
+    checksum of the file is available without reading it a second time.
+    '''
     input_file.seek(0)
     current_size = 0
     while True:
@@ -37,10 +65,96 @@ def _copy_file(input_file: IO[bytes],
         if not data:
             break
         output_file.write(data)
+        if hasher is not None:
+            hasher.update(data)
         if current_size > max_size:
             raise logic.ValidationError({'upload': ['File upload too large']})
 
 
+def _write_stream(input_stream: IO[bytes], output_file: IO[bytes],
+                  max_bytes: int,
+                  hasher: Optional["hashlib._Hash"] = None) -> int:
+    '''Copy a non seekable ``input_stream`` into ``output_file`` in MB
+    chunks, stopping with a ValidationError once ``output_file`` would grow
+    past ``max_bytes``. Returns the number of bytes written.'''
+    start = output_file.tell()
+    written = 0
+    while True:
+        data = input_stream.read(MB)
+        if not data:
+            break
+        written += len(data)
+        if start + written > max_bytes:
+            raise logic.ValidationError({'upload': ['File upload too large']})
+        output_file.write(data)
+        if hasher is not None:
+            hasher.update(data)
+    return written
+
+
+def _hash_file(filepath: str) -> str:
+    hasher = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        while True:
+            data = f.read(MB)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _pop_part_hasher(part_path: str, generation: int,
+                     offset: int) -> Optional["hashlib._Hash"]:
+    '''Return the hasher of the data written to ``part_path`` up to
+    ``offset``, or None if this process didn't write all of it or the upload
+    was written again since (its ``generation`` changed).'''
+    with _part_hashers_lock:
+        kept = _part_hashers.pop(part_path, None)
+    if offset == 0:
+        return hashlib.sha256()
+    if kept is None or kept[:2] != (generation, offset):
+        return None
+    return kept[2]
+
+
+def _keep_part_hasher(part_path: str, generation: int, hashed: int,
+                      hasher: "hashlib._Hash") -> None:
+    with _part_hashers_lock:
+        _part_hashers[part_path] = (generation, hashed, hasher)
+        while len(_part_hashers) > MAX_PART_HASHERS:
+            _part_hashers.popitem(last=False)
+
+
+def _save_part_state(part_path: str, info: dict[str, Any]) -> None:
+    '''Replace the state of a chunked upload, without readers ever seeing
+    it half written.'''
+    state = {key: info[key] for key in PART_STATE_KEYS}
+    with open(part_path + '.json~', 'w') as f:
+        json.dump(state, f)
+    os.replace(part_path + '.json~', part_path + '.json')
+
+
+@contextlib.contextmanager
+def _lock_part_upload(part_path: str) -> Iterator[None]:
+    '''Hold an exclusive lock on a chunked upload, or fail with a
+    ValidationError if another request is writing to it.
+
+    The lock is taken on the part file, as the state file is replaced on
+    every write.'''
+    try:
+        lock_file = open(part_path, 'rb')
+    except OSError:
+        raise logic.NotFound('Upload not found')
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise logic.ValidationError({
+                'upload': ['Another part of this upload is being written']
+            })
+        yield
+
+
 def _get_underlying_file(wrapper: Union[FlaskFileStorage, cgi.FieldStorage]):
     if isinstance(wrapper, FlaskFileStorage):
         return wrapper.stream
@@ -272,10 +386,13 @@ class Upload(object):
 
 class ResourceUpload(object):
     mimetype: Optional[str]
+    checksum: Optional[str]
 
     def __init__(self, resource: dict[str, Any]) -> None:
         path = get_storage_path()
         config_mimetype_guess = config.get('ckan.mimetype_guess')
+        # SHA-256 hex digest of the uploaded file, computed by upload()
+        self.checksum = None
 
         if not path:
             self.storage_path = None
@@ -361,6 +478,9 @@ class ResourceUpload(object):
             or ``None`` if nothing changed
         :rtype: ``string`` or ``None``
 
+        The SHA-256 digest of an uploaded file is computed while it is
+        written and made available as ``self.checksum``.
+
         '''
         if not self.storage_path:
             return
@@ -382,16 +502,19 @@ class ResourceUpload(object):
                 if e.errno != 17:
                     raise
             tmp_filepath = filepath + '~'
+            hasher = hashlib.sha256()
             with open(tmp_filepath, 'wb+') as output_file:
                 assert self.upload_file
                 try:
-                    _copy_file(self.upload_file, output_file, max_size)
+                    _copy_file(
+                        self.upload_file, output_file, max_size, hasher)
                 except logic.ValidationError:
                     os.remove(tmp_filepath)
                     raise
                 finally:
                     self.upload_file.close()
             os.rename(tmp_filepath, filepath)
+            self.checksum = hasher.hexdigest()
             return
 
         # The resource form only sets self.clear (via the input clear_upload)
@@ -404,3 +527,195 @@ class ResourceUpload(object):
                 os.remove(filepath)
             except OSError:
                 pass
+
+    def get_part_path(self, id: str, upload_id: str) -> str:
+        '''Path of the file that receives the parts of a chunked upload.
+
+        It is located next to the final path of the resource file, so
+        completing the upload is a rename rather than a copy.
+        '''
+        if not UPLOAD_ID_RE.match(upload_id):
+            raise logic.NotFound('Upload not found')
+        return self.get_path(id) + '~' + upload_id
+
+    def init_part_upload(self, id: str, filename: str,
+                         size: Optional[int] = None,
+                         checksum: Optional[str] = None,
+                         max_size: int = 10) -> dict[str, Any]:
+        '''Start a chunked upload of ``filename`` for resource ``id``.
+
+        ``size`` and ``checksum`` (SHA-256 hex digest), when provided, are
+        verified on completion.
+
+        :returns: the state of the upload, see ``get_part_upload``
+        '''
+        if not self.storage_path:
+            raise logic.ValidationError({'upload': ['Uploads are disabled']})
+        if size is not None and size > max_size * MB:
+            raise logic.ValidationError({'upload': ['File upload too large']})
+
+        upload_id = uuid.uuid4().hex
+        part_path = self.get_part_path(id, upload_id)
+        os.makedirs(self.get_directory(id), exist_ok=True)
+        info: dict[str, Any] = {
+            'upload_id': upload_id,
+            'filename': munge.munge_filename(filename),
+            'size': size,
+            'checksum': checksum.lower() if checksum else None,
+            'generation': 0,
+        }
+        open(part_path, 'wb').close()
+        _save_part_state(part_path, info)
+        info['offset'] = 0
+        return info
+
+    def get_part_upload(self, id: str, upload_id: str) -> dict[str, Any]:
+        '''Return the state of a chunked upload, including the ``offset``
+        where the next part must start, so that interrupted uploads can be
+        resumed.
+
+        Uploads that didn't receive data for
+        :ref:`ckan.upload.part_upload_ttl` seconds are discarded.
+        '''
+        part_path = self.get_part_path(id, upload_id)
+        try:
+            with open(part_path + '.json') as f:
+                info = json.load(f)
+            stat = os.stat(part_path)
+        except (OSError, ValueError):
+            raise logic.NotFound('Upload not found')
+        ttl = config.get('ckan.upload.part_upload_ttl')
+        if ttl and stat.st_mtime < time.time() - ttl:
+            self.abort_part_upload(id, upload_id)
+            raise logic.NotFound('Upload not found')
+        info['offset'] = stat.st_size
+        return info
+
+    def write_part(self, id: str, upload_id: str, stream: IO[bytes],
+                   offset: int, max_size: int = 10) -> dict[str, Any]:
+        '''Write the part read from ``stream`` at ``offset``.
+
+        The offset cannot be past the data already received, but it can be
+        lower to resend a part that failed. Anything after the new part is
+        discarded.
+        '''
+        part_path = self.get_part_path(id, upload_id)
+        with _lock_part_upload(part_path):
+            info = self.get_part_upload(id, upload_id)
+            if offset < 0 or offset > info['offset']:
+                raise logic.ValidationError({
+                    'offset': ['Expected offset {} or lower'.format(
+                        info['offset'])]
+                })
+            max_bytes = max_size * MB
+            if info['size'] is not None:
+                max_bytes = min(max_bytes, info['size'])
+
+            hasher = _pop_part_hasher(
+                part_path, info.get('generation', 0), offset)
+            # hashers kept by other processes are outdated from now on,
+            # even if this write fails half way
+            info['generation'] = info.get('generation', 0) + 1
+            _save_part_state(part_path, info)
+            with open(part_path, 'r+b') as output_file:
+                output_file.seek(offset)
+                written = _write_stream(
+                    stream, output_file, max_bytes, hasher)
+                output_file.truncate()
+            info['offset'] = offset + written
+            if hasher is not None:
+                _keep_part_hasher(
+                    part_path, info['generation'], info['offset'], hasher)
+        return info
+
+    def complete_part_upload(self, id: str, upload_id: str,
+                             checksum: Optional[str] = None
+                             ) -> dict[str, Any]:
+        '''Verify a chunked upload and move it to the resource path.
+
+        After this call ``filename``, ``filesize``, ``mimetype`` and
+        ``checksum`` describe the uploaded file.
+        '''
+        part_path = self.get_part_path(id, upload_id)
+        with _lock_part_upload(part_path):
+            info = self.get_part_upload(id, upload_id)
+            expected = (checksum or '').lower() or info['checksum']
+
+            if info['size'] is not None and info['offset'] != info['size']:
+                raise logic.ValidationError({
+                    'size': ['Received {} bytes, expected {}'.format(
+                        info['offset'], info['size'])]
+                })
+            hasher = _pop_part_hasher(
+                part_path, info.get('generation', 0), info['offset'])
+            if hasher is not None:
+                actual = hasher.hexdigest()
+            else:
+                actual = _hash_file(part_path)
+            if expected and actual != expected:
+                raise logic.ValidationError({
+                    'checksum': ['Checksum mismatch, got {}'.format(actual)]
+                })
+
+            self._store_part(id, part_path, actual)
+            os.remove(part_path + '.json')
+
+        self.filename = info['filename']
+        self.filesize = info['offset']
+        self.checksum = actual
+        self.mimetype = None
+        config_mimetype_guess = config.get('ckan.mimetype_guess')
+        if config_mimetype_guess == 'file_ext':
+            self.mimetype = mimetypes.guess_type(info['filename'])[0]
+        elif config_mimetype_guess == 'file_contents':
+            try:
+                self.mimetype = magic.from_file(self.get_path(id), mime=True)
+            except IOError:
+                self.mimetype = None
+
+        info['checksum'] = actual
+        return info
+
+    def abort_part_upload(self, id: str, upload_id: str) -> None:
+        '''Discard the data received for a chunked upload.'''
+        part_path = self.get_part_path(id, upload_id)
+        with _part_hashers_lock:
+            _part_hashers.pop(part_path, None)
+        for path in (part_path, part_path + '.json', part_path + '.json~'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clean_part_uploads(self, max_age: int) -> int:
+        '''Discard the chunked uploads that didn't receive data for
+        ``max_age`` seconds.
+
+        :returns: the number of uploads discarded
+        '''
+        if not self.storage_path:
+            return 0
+        limit = time.time() - max_age
+        count = 0
+        for directory, _dirs, files in os.walk(self.storage_path):
+            for name in files:
+                if not PART_STATE_RE.search(name):
+                    continue
+                state_path = os.path.join(directory, name)
+                part_path = state_path[:-len('.json')]
+                try:
+                    mtime = os.stat(part_path).st_mtime
+                except OSError:
+                    mtime = os.stat(state_path).st_mtime
+                if mtime >= limit:
+                    continue
+                for path in (part_path, state_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                count += 1
+        return count
+
+    def _store_part(self, id: str, part_path: str, checksum: str) -> None:
+        os.replace(part_path, self.get_path(id))
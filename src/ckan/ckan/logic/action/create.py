@@ -324,8 +324,11 @@ def resource_create(context: Context,
     # package_show until after commit
     package = context['package']
     assert package
-    upload.upload(package.resources[-1].id,
-                  uploader.get_max_resource_size())
+    resource_obj = package.resources[-1]
+    upload.upload(resource_obj.id, uploader.get_max_resource_size())
+    checksum = getattr(upload, 'checksum', None)
+    if checksum:
+        resource_obj.hash = checksum
 
     model.repo.commit()
 
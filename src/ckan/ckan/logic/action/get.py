@@ -21,6 +21,7 @@ import ckan.logic as logic
 import ckan.logic.action
 import ckan.logic.schema
 import ckan.lib.dictization.model_dictize as model_dictize
+import ckan.lib.facet_titles as facet_titles
 import ckan.lib.jobs as jobs
 import ckan.lib.navl.dictization_functions
 import ckan.model as model
@@ -29,6 +30,7 @@ import ckan.plugins as plugins
 import ckan.lib.search as search
 from ckan.model.follower import ModelFollowingModel
 from ckan.lib.search.query import solr_literal
+from ckan.lib.search import result_cache
 
 import ckan.lib.plugins as lib_plugins
 import ckan.lib.datapreview as datapreview
@@ -713,12 +715,14 @@ def organization_list_for_user(context: Context,
             authz.check_config_permission('roles_that_cascade_to_sub_groups')
         )
         group_ids_to_capacities: dict[str, str] = {}
-        for member, group in q.all():
+        memberships = q.all()
+        children = model.Group.get_children_group_ids(
+            [group.id for member, group in memberships
+             if member.capacity in roles_that_cascade],
+            type='organization')
+        for member, group in memberships:
             if member.capacity in roles_that_cascade:
-                children_group_ids = [
-                    grp_tuple[0] for grp_tuple
-                    in group.get_children_group_hierarchy(type='organization')
-                ]
+                children_group_ids = children.get(group.id, [])
                 for group_id in children_group_ids:
                     group_ids_to_capacities[group_id] = member.capacity
                 group_ids |= set(children_group_ids)
@@ -1732,6 +1736,12 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
     :param start: the offset in the complete result for where the set of
         returned datasets should begin.
     :type start: int
+    :param cursor: paginate with a cursor instead of ``start``, which stays
+        fast however deep into the results the page is. Pass ``"*"`` to get
+        the first page, and the ``next_cursor`` returned to get the following
+        ones. A unique key of the datasets is added as the last sort
+        criteria. Optional.
+    :type cursor: string
     :param facet: whether to enable faceted results.  Default: ``True``.
     :type facet: string
     :param facet.mincount: the minimum counts for facet fields should be
@@ -1761,6 +1771,15 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
     :param use_default_schema: use default package schema instead of
         a custom schema defined with an IDatasetForm plugin (default: ``False``)
     :type use_default_schema: bool
+    :param fields: only return these fields of the datasets, as dotted paths
+        to select nested fields, e.g.
+        ``["title", "organization.title", "resources.format"]``. Lists are
+        projected item by item. If :ref:`ckan.search.store_projection_fields`
+        is enabled, only the top level fields selected are read from the
+        search index. Can't be combined with ``fl``, and the
+        ``before_dataset_view`` plugin hooks are not called on the partial
+        datasets returned. Optional.
+    :type fields: list of strings
 
 
     The following advanced Solr parameters are supported as well. Note that
@@ -1801,6 +1820,10 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
         "count", "display_name" and "name" entries.  The display_name is a
         form of the name that can be used in titles.
     :type search_facets: nested dict of dicts.
+    :param next_cursor: the ``cursor`` to pass to get the next page of
+        results, ``None`` on the last page.  Only returned if ``cursor`` was
+        passed.
+    :type next_cursor: string
 
     An example result: ::
 
@@ -1840,11 +1863,29 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
         raise ValidationError(errors)
 
     model = context['model']
-    session = context['session']
     user = context.get('user')
 
     _check_access('package_search', context, data_dict)
 
+    # enforce permission filter based on user
+    if context.get('ignore_auth') or (user and authz.is_sysadmin(user)):
+        labels = None
+    else:
+        labels = lib_plugins.get_permission_labels(
+            ).get_user_dataset_labels(context['auth_user_obj'])
+
+    # searches that can only return public datasets have the same results
+    # for everyone
+    cache_key = None
+    generation = 0
+    if labels == ['public'] and result_cache.is_enabled():
+        generation = result_cache.get_index_generation()
+        cache_key = result_cache.make_key(
+            data_dict, labels, context.get('for_view', False))
+        cached = result_cache.get(cache_key, generation)
+        if cached is not None:
+            return cached
+
     # Move ext_ params to extras and remove them from the root of the search
     # params, so they don't cause and error
     data_dict['extras'] = data_dict.get('extras', {})
@@ -1868,6 +1909,11 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
     results: list[dict[str, Any]] = []
     facets: dict[str, Any] = {}
     count = 0
+    next_cursor = None
+
+    cursor = data_dict.pop('cursor', None)
+    if cursor is not None:
+        data_dict['cursorMark'] = cursor
 
     if not abort:
         if asbool(data_dict.get('use_default_schema')):
@@ -1877,7 +1923,28 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
         data_dict.pop('use_default_schema', None)
 
         result_fl = data_dict.get('fl')
-        if not result_fl:
+        projection = None
+        if data_dict.get('fields'):
+            if result_fl:
+                raise ValidationError(
+                    {'fields': [_('Can not be combined with "fl"')]})
+            projection = search.query.projection_tree(data_dict['fields'])
+        data_dict.pop('fields', None)
+
+        projection_fields = None
+        if projection is not None and set(projection) <= {'id', 'name'}:
+            # stored as they are in the index
+            data_dict['fl'] = 'id name'
+        elif projection is not None and data_source == 'validated_data_dict' \
+                and config.get('ckan.search.store_projection_fields'):
+            # only keys the indexer stores can be selected, others would
+            # end up in the Solr field list as they are
+            projection_fields = {
+                key: search.common.PROJECTION_FIELD_PREFIX + key
+                for key in projection
+                if all(c in search.index.KEY_CHARS for c in key)}
+            data_dict['fl'] = 'id ' + ' '.join(projection_fields.values())
+        elif not result_fl:
             data_dict['fl'] = 'id {0}'.format(data_source)
         else:
             data_dict['fl'] = ' '.join(result_fl)
@@ -1903,20 +1970,26 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
         # Pop these ones as Solr does not need them
         extras = data_dict.pop('extras', None)
 
-        # enforce permission filter based on user
-        if context.get('ignore_auth') or (user and authz.is_sysadmin(user)):
-            labels = None
-        else:
-            labels = lib_plugins.get_permission_labels(
-                ).get_user_dataset_labels(context['auth_user_obj'])
-
         query = search.query_for(model.Package)
         query.run(data_dict, permission_labels=labels)
 
         # Add them back so extensions can use them on after_search
         data_dict['extras'] = extras
 
-        if result_fl:
+        if projection is not None:
+            for package in query.results:
+                if projection_fields is not None:
+                    package_dict = {
+                        key: json.loads(package[field])
+                        for key, field in projection_fields.items()
+                        if field in package}
+                elif data_source in package:
+                    package_dict = json.loads(package[data_source])
+                else:
+                    package_dict = package
+                results.append(
+                    search.query.project(package_dict, projection))
+        elif result_fl:
             for package in query.results:
                 if isinstance(package, str):
                     package = {result_fl[0]: package}
@@ -1943,6 +2016,7 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
 
         count = query.count
         facets = query.facets
+        next_cursor = query.next_cursor
 
     search_results: dict[str, Any] = {
         'count': count,
@@ -1950,18 +2024,17 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
         'results': results,
         'sort': data_dict['sort']
     }
-
-    # create a lookup table of group name to title for all the groups and
-    # organizations in the current search's facets.
-    group_names = []
-    for field_name in ('groups', 'organization'):
-        group_names.extend(facets.get(field_name, {}).keys())
-
-    groups = (session.query(model.Group.name, model.Group.title)
-              .filter(model.Group.name.in_(group_names))
-              .all()
-              if group_names else [])
-    group_titles_by_name = dict(groups)
+    if cursor is not None:
+        search_results['next_cursor'] = next_cursor
+
+    # lookup tables of group name to title and license id to title, only
+    # loaded when needed
+    group_titles_by_name: dict[str, str] = {}
+    if facets.get('groups') or facets.get('organization'):
+        group_titles_by_name = facet_titles.group_titles()
+    license_titles_by_id: dict[str, str] = {}
+    if facets.get('license_id'):
+        license_titles_by_id = facet_titles.license_titles()
 
     # Transform facets into a more useful data structure.
     restructured_facets: dict[str, Any] = {}
@@ -1979,11 +2052,8 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
                     if display_name and display_name.strip() else key_
                 new_facet_dict['display_name'] = display_name
             elif key == 'license_id':
-                license = model.Package.get_license_register().get(key_)
-                if license:
-                    new_facet_dict['display_name'] = license.title
-                else:
-                    new_facet_dict['display_name'] = key_
+                new_facet_dict['display_name'] = license_titles_by_id.get(
+                    key_, key_)
             else:
                 new_facet_dict['display_name'] = key_
             new_facet_dict['count'] = value_
@@ -2001,6 +2071,9 @@ def package_search(context: Context, data_dict: DataDict) -> ActionResult.Packag
             search_results['search_facets'][facet]['items'],
             key=lambda facet: facet['display_name'], reverse=True)
 
+    if cache_key:
+        result_cache.store(cache_key, search_results, generation)
+
     return search_results
 
 
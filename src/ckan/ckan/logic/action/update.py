@@ -335,6 +335,9 @@ def package_update(
         resource['id'] = pkg.resources[index].id
 
         upload.upload(resource['id'], uploader.get_max_resource_size())
+        checksum = getattr(upload, 'checksum', None)
+        if checksum:
+            pkg.resources[index].hash = resource['hash'] = checksum
 
     for item in plugins.PluginImplementations(plugins.IPackageController):
         item.edit(pkg)
@@ -684,6 +684,9 @@ def default_package_search_schema(
                  limit_to_configured_maximum('ckan.search.rows_max', 1000)],
         'sort': [ignore_missing, unicode_safe],
         'start': [ignore_missing, natural_number_validator],
+        'cursor': [ignore_missing, unicode_safe],
+        'fields': [ignore_missing, convert_to_list_if_string,
+                   list_of_strings],
         'qf': [ignore_missing, unicode_safe],
         'facet': [ignore_missing, unicode_safe],
         'facet.mincount': [ignore_missing, natural_number_validator],
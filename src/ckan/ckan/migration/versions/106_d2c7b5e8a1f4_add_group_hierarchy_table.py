@@ -0,0 +1,52 @@
+# encoding: utf-8
+
+"""add group_hierarchy table
+
+Revision ID: d2c7b5e8a1f4
+Revises: 4a5e3465beb6
+Create Date: 2026-10-19 10:12:41.502317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2c7b5e8a1f4'
+down_revision = '4a5e3465beb6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'group_hierarchy',
+        sa.Column('ancestor_id', sa.UnicodeText, primary_key=True),
+        sa.Column('descendant_id', sa.UnicodeText, primary_key=True),
+        sa.Column('depth', sa.Integer, nullable=False),
+    )
+    op.create_index(
+        'idx_group_hierarchy_descendant_id', 'group_hierarchy',
+        ['descendant_id']
+    )
+    op.execute(
+        """INSERT INTO group_hierarchy (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS
+        (
+            SELECT table_id, group_id, 1 FROM member
+            WHERE table_name = 'group' AND state = 'active'
+            UNION
+            SELECT c.ancestor_id, m.group_id, c.depth + 1
+            FROM closure AS c, member AS m
+            WHERE m.table_id = c.descendant_id AND m.table_name = 'group'
+                  AND m.state = 'active' AND c.depth <= 8
+        )
+        SELECT ancestor_id, descendant_id, min(depth) FROM closure
+            WHERE ancestor_id != descendant_id
+            GROUP BY ancestor_id, descendant_id"""
+    )
+
+
+def downgrade():
+    op.drop_index('idx_group_hierarchy_descendant_id')
+    op.drop_table('group_hierarchy')
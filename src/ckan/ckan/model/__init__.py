@@ -55,6 +55,7 @@ from ckan.model.group import (
     Group,
     group_table,
     member_table,
+    group_hierarchy_table,
 )
 from ckan.model.group_extra import (
     GroupExtra,
@@ -123,7 +124,7 @@ __all__ = [
     "PACKAGE_VERSION_MAX_LENGTH", "package_table", "package_member_table",
     "Tag", "PackageTag", "MAX_TAG_LENGTH", "MIN_TAG_LENGTH", "tag_table",
     "package_tag_table", "User", "user_table", "AnonymousUser", "Member", "Group",
-    "group_table", "member_table",
+    "group_table", "member_table", "group_hierarchy_table",
     "GroupExtra", "group_extra_table", "PackageExtra", "package_extra_table",
     "Resource", "DictProxy", "resource_table",
     "ResourceView", "resource_view_table",
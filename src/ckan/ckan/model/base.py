@@ -9,11 +9,17 @@ import sqlalchemy as sa
 from sqlalchemy import orm
 from typing_extensions import Self
 
+from ckan.lib import request_cache
+
 from .meta import registry, Session
 
 
 BaseModel = registry.generate_base()
 
+# Namespace of ckan.lib.request_cache for the objects returned by the
+# ``get()`` methods of the models
+IDENTITY_MAP_NAMESPACE = 'model_identity_map'
+
 
 class SessionMixin:
     """Attach session to the model class.
@@ -93,6 +99,39 @@ class NameMixin(SessionMixin):
 
         return q.first()
 
+    @classmethod
+    def from_identity_map(cls, reference: str) -> Optional[Self]:
+        """Return the object already returned by ``get()`` during the
+        current request for the id or name ``reference``.
+
+        Objects that were renamed, deleted or detached from the session
+        since then are ignored.
+        """
+        obj = request_cache.peek(
+            IDENTITY_MAP_NAMESPACE, (cls.__name__, reference))
+        if obj is None:
+            return None
+        state = sa.inspect(obj)
+        if not state.persistent or state.session is not cls.Session():
+            return None
+        try:
+            if reference not in (getattr(obj, 'id'), obj.name):
+                return None
+        except orm.exc.ObjectDeletedError:
+            return None
+        return obj
+
+    @classmethod
+    def add_to_identity_map(cls, obj: Optional[Self]) -> Optional[Self]:
+        """Remember ``obj`` by id and name until the end of the current
+        request, and return it.
+        """
+        if obj is not None:
+            for reference in (getattr(obj, 'id'), obj.name):
+                request_cache.store(
+                    IDENTITY_MAP_NAMESPACE, (cls.__name__, reference), obj)
+        return obj
+
 
 class TextSearchMixin:
     """Provide base text-search functionality via LIKE SQL operator.
@@ -2,13 +2,14 @@
 from __future__ import annotations
 
 import datetime
+import itertools
 from typing import (
     Any, Optional, Union, overload
 )
 from typing_extensions import Literal, Self
 
-from sqlalchemy import (column, orm, types, Column, Table, ForeignKey, or_,
-                        and_, text, Index)
+from sqlalchemy import (column, event, orm, types, Column, Table, ForeignKey,
+                        or_, and_, text, Index)
 from sqlalchemy.ext.associationproxy import AssociationProxy
 
 import ckan.model.meta as meta
@@ -22,7 +23,7 @@ from ckan.types import Context, Query
 
 __all__ = ['group_table', 'Group',
            'Member',
-           'member_table']
+           'member_table', 'group_hierarchy_table']
 
 Mapped = orm.Mapped
 
@@ -55,6 +56,18 @@ group_table = Table('group', meta.metadata,
 )
 
 
+# Closure of the group hierarchy: a row for each group and every group above
+# it, at any depth (1 for its parents). It is derived from the members with
+# table_name 'group' and rebuilt whenever they change, see
+# rebuild_group_hierarchy()
+group_hierarchy_table = Table('group_hierarchy', meta.metadata,
+    Column('ancestor_id', types.UnicodeText, primary_key=True),
+    Column('descendant_id', types.UnicodeText, primary_key=True),
+    Column('depth', types.Integer, nullable=False),
+    Index('idx_group_hierarchy_descendant_id', 'descendant_id'),
+)
+
+
 class Member(core.StatefulObjectMixin,
              domain_object.DomainObject):
     '''A Member object represents any other object being a 'member' of a
@@ -186,11 +199,16 @@ class Group(core.StatefulObjectMixin,
     @classmethod
     def get(cls, reference: Optional[str]) -> Optional[Self]:
         '''Returns a group object referenced by its id or name.'''
+        if reference:
+            group = cls.from_identity_map(reference)
+            if group is not None:
+                return group
+
         query = meta.Session.query(cls).filter(cls.id == reference)
         group = query.first()
         if group is None:
             group = cls.by_name(reference)
-        return group
+        return cls.add_to_identity_map(group)
     # Todo: Make sure group names can't be changed to look like group IDs?
 
     @classmethod
@@ -251,10 +269,35 @@ class Group(core.StatefulObjectMixin,
         '''
         results: list[tuple[str, str, str, str]] = meta.Session.query(
             Group.id, Group.name, Group.title,  column('parent_id')
-        ).from_statement(text(HIERARCHY_DOWNWARDS_CTE)).params(
+        ).from_statement(text(HIERARCHY_DOWNWARDS_SQL)).params(
             id=self.id, type=type).all()
         return results
 
+    @classmethod
+    def get_children_group_ids(
+            cls, group_ids: list[str],
+            type: str='group') -> dict[str, list[str]]:
+        '''Returns the ids of the groups in all levels underneath each of the
+        groups passed, in a single query.
+
+        :rtype: a dict with the ids of the groups passed that have children
+            as keys, and the lists of the ids of their children as values
+        '''
+        children: dict[str, list[str]] = {}
+        if not group_ids:
+            return children
+        q = meta.Session.query(
+            group_hierarchy_table.c.ancestor_id,
+            group_hierarchy_table.c.descendant_id
+        ).join(Group, Group.id == group_hierarchy_table.c.descendant_id).\
+            filter(group_hierarchy_table.c.ancestor_id.in_(group_ids)).\
+            filter(Group.type == type).\
+            filter(Group.state == 'active').\
+            order_by(group_hierarchy_table.c.depth)
+        for ancestor_id, descendant_id in q:
+            children.setdefault(ancestor_id, []).append(descendant_id)
+        return children
+
     def get_parent_groups(self, type: str='group') -> list[Group]:
         '''Returns this group's parent groups.
         Returns a list. Will have max 1 value for organizations.
@@ -275,7 +318,7 @@ class Group(core.StatefulObjectMixin,
         '''Returns this group's parent, parent's parent, parent's parent's
         parent etc.. Sorted with the top level parent first.'''
         result: list[Group] =  meta.Session.query(Group).\
-            from_statement(text(HIERARCHY_UPWARDS_CTE)).\
+            from_statement(text(HIERARCHY_UPWARDS_SQL)).\
             params(id=self.id, type=type).all()
         return result
 
@@ -300,8 +343,7 @@ class Group(core.StatefulObjectMixin,
             self, type: str='group') -> list[Self]:
         '''Returns a list of the groups (of the specified type) which are
         allowed to be this group's parent. It excludes ones which would
-        create a loop in the hierarchy, causing the recursive CTE to
-        be in an infinite loop.
+        create a loop in the hierarchy.
 
         :returns: A list of group objects ordered by group title
 
@@ -442,34 +484,63 @@ meta.registry.map_imperatively(Member, member_table, properties={
 # limit on recursion.
 MAX_RECURSES: int = 8
 
-HIERARCHY_DOWNWARDS_CTE: str = """WITH RECURSIVE child(depth) AS
+REBUILD_HIERARCHY_SQL: str = """INSERT INTO group_hierarchy
+    (ancestor_id, descendant_id, depth)
+WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS
 (
-    -- non-recursive term
-    SELECT 0, * FROM member
-    WHERE table_id = :id AND table_name = 'group' AND state = 'active'
-    UNION ALL
-    -- recursive term
-    SELECT c.depth + 1, m.* FROM member AS m, child AS c
-    WHERE m.table_id = c.group_id AND m.table_name = 'group'
-          AND m.state = 'active' AND c.depth < {max_recurses}
-)
-SELECT G.id, G.name, G.title, child.depth, child.table_id as parent_id FROM child
-    INNER JOIN public.group G ON G.id = child.group_id
-    WHERE G.type = :type AND G.state='active'
-    ORDER BY child.depth ASC;""".format(max_recurses=MAX_RECURSES)
-
-HIERARCHY_UPWARDS_CTE: str = """WITH RECURSIVE parenttree(depth) AS (
-    -- non-recursive term
-    SELECT 0, M.* FROM public.member AS M
-    WHERE group_id = :id AND M.table_name = 'group' AND M.state = 'active'
+    -- non-recursive term: parents
+    SELECT table_id, group_id, 1 FROM member
+    WHERE table_name = 'group' AND state = 'active'
     UNION
     -- recursive term
-    SELECT PG.depth + 1, M.* FROM parenttree PG, public.member M
-    WHERE PG.table_id = M.group_id AND M.table_name = 'group'
-          AND M.state = 'active' AND PG.depth < {max_recurses}
-    )
-
-SELECT G.*, PT.depth FROM parenttree AS PT
-    INNER JOIN public.group G ON G.id = PT.table_id
-    WHERE G.type = :type AND G.state='active'
-    ORDER BY PT.depth DESC;""".format(max_recurses=MAX_RECURSES)
+    SELECT c.ancestor_id, m.group_id, c.depth + 1 FROM closure AS c, member AS m
+    WHERE m.table_id = c.descendant_id AND m.table_name = 'group'
+          AND m.state = 'active' AND c.depth <= {max_recurses}
+)
+SELECT ancestor_id, descendant_id, min(depth) FROM closure
+    WHERE ancestor_id != descendant_id
+    GROUP BY ancestor_id, descendant_id;""".format(max_recurses=MAX_RECURSES)
+
+HIERARCHY_DOWNWARDS_SQL: str = """SELECT G.id, G.name, G.title,
+    M.table_id as parent_id FROM group_hierarchy H
+    INNER JOIN public.group G ON G.id = H.descendant_id
+    INNER JOIN member M ON M.group_id = G.id AND M.table_name = 'group'
+          AND M.state = 'active'
+    WHERE H.ancestor_id = :id AND G.type = :type AND G.state='active'
+          AND (M.table_id = :id OR M.table_id IN (
+              SELECT descendant_id FROM group_hierarchy
+              WHERE ancestor_id = :id))
+    ORDER BY H.depth ASC;"""
+
+HIERARCHY_UPWARDS_SQL: str = """SELECT G.*, H.depth FROM group_hierarchy H
+    INNER JOIN public.group G ON G.id = H.ancestor_id
+    WHERE H.descendant_id = :id AND G.type = :type AND G.state='active'
+    ORDER BY H.depth DESC;"""
+
+
+def rebuild_group_hierarchy(connection: Any) -> None:
+    '''Recompute the group_hierarchy table from the members of type group.
+
+    Writers are serialized by the table lock, so the closure always reflects
+    all the committed changes, while readers keep seeing the previous one
+    until the transaction is committed.
+    '''
+    connection.execute(text(
+        'LOCK TABLE group_hierarchy IN EXCLUSIVE MODE'))
+    connection.execute(text('DELETE FROM group_hierarchy'))
+    connection.execute(text(REBUILD_HIERARCHY_SQL))
+
+
+def _changes_hierarchy(session: Any, obj: Any) -> bool:
+    return isinstance(obj, Member) and obj.table_name == 'group' and (
+        obj not in session.dirty
+        or session.is_modified(obj, include_collections=False))
+
+
+@event.listens_for(meta.create_local_session, 'after_flush')
+@event.listens_for(meta.Session, 'after_flush')
+def _update_group_hierarchy(session: Any, flush_context: Any):
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if _changes_hierarchy(session, obj):
+            rebuild_group_hierarchy(session.connection())
+            return
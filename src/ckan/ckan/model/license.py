@@ -66,6 +66,8 @@ class License():
 class LicenseRegister(object):
     """Dictionary-like interface to a group of licenses."""
     licenses: list[License]
+    _licenses_by_id: dict[str, License]
+    _titles: dict[str, dict[str, str]]
 
     def __init__(self):
         group_url = config.get('licenses_group_url')
@@ -123,13 +125,16 @@ class LicenseRegister(object):
         else:
             msg = "Licenses at %s must be dictionary or list" % license_url
             raise ValueError(msg)
+        self._licenses_by_id = {}
+        for license in self.licenses:
+            self._licenses_by_id.setdefault(license.id, license)
+        self._titles = {}
 
     def __getitem__(
             self, key: str,
             default: Any=Exception) -> Union[License, Any]:
-        for license in self.licenses:
-            if key == license.id:
-                return license
+        if key in self._licenses_by_id:
+            return self._licenses_by_id[key]
         if default != Exception:
             return default
         else:
@@ -143,6 +148,17 @@ class LicenseRegister(object):
     def keys(self) -> list[str]:
         return [license.id for license in self.licenses]
 
+    def get_titles(self, language: str) -> dict[str, str]:
+        '''Returns the titles of the licenses by id, translated to the
+        current language, ``language``. They are only built once for each
+        language.'''
+        titles = self._titles.get(language)
+        if titles is None:
+            titles = {id_: license.title
+                      for id_, license in self._licenses_by_id.items()}
+            self._titles[language] = titles
+        return titles
+
     def values(self) -> list[License]:
         return self.licenses
 
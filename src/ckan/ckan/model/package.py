@@ -144,6 +144,10 @@ class Package(core.StatefulObjectMixin,
         '''Returns a package object referenced by its id or name.'''
         if not reference:
             return None
+        if not for_update:
+            pkg = cls.from_identity_map(reference)
+            if pkg is not None:
+                return pkg
 
         q = meta.Session.query(cls)
         if for_update:
@@ -151,7 +155,7 @@ class Package(core.StatefulObjectMixin,
         pkg = q.get(reference)
         if pkg == None:
             pkg = cls.by_name(reference, for_update=for_update)
-        return pkg
+        return cls.add_to_identity_map(pkg)
     # Todo: Make sure package names can't be changed to look like package IDs?
 
     @property
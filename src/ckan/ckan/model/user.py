@@ -95,10 +95,15 @@ class User(core.StatefulObjectMixin,
 
     @classmethod
     def get(cls, user_reference: Optional[str]) -> Optional[Self]:
+        if user_reference:
+            user = cls.from_identity_map(user_reference)
+            if user is not None:
+                return user
+
         query = meta.Session.query(cls).autoflush(False)
         query = query.filter(or_(cls.name == user_reference,
                                  cls.id == user_reference))
-        return query.first()
+        return cls.add_to_identity_map(query.first())
 
     @classmethod
     def all(cls) -> list[Self]:
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import os
+import time
+
 import pytest
 
 from ckan.cli.cli import ckan
+from ckan.lib.uploader import ResourceUpload
 from ckan.tests.helpers import call_action
 
 
@@ -87,3 +91,23 @@ class TestUserClean:
         assert f"Deleted user: {fake_user['name']}" in result.output
         assert len(users) == 1
         assert users[0]["name"] == "valid-user"
+
+
+class TestPartUploadsClean:
+    def test_abandoned_uploads_are_removed(
+        self, cli, ckan_config, monkeypatch, tmpdir
+    ):
+        monkeypatch.setitem(ckan_config, "ckan.storage_path", str(tmpdir))
+        resource_id = "8a3a874e-5ee1-4e43-bdaf-e2569cf72344"
+        upload = ResourceUpload({"url": "", "id": resource_id})
+        upload_id = upload.init_part_upload(
+            resource_id, "data.csv")["upload_id"]
+        part_path = upload.get_part_path(resource_id, upload_id)
+        an_hour_ago = time.time() - 3600
+        os.utime(part_path, (an_hour_ago, an_hour_ago))
+
+        result = cli.invoke(
+            ckan, ["clean", "part-uploads", "--max-age", "60"])
+
+        assert "Removed 1 abandoned uploads." in result.output
+        assert not os.path.exists(part_path)
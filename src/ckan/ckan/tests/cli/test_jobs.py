@@ -229,3 +229,16 @@ class TestJobsWorker(helpers.RQTestBase):
                 assert set(all_jobs) == {job1, job2}
                 assert not (os.path.isfile(f.name))
                 assert not (os.path.isfile(g.name))
+
+    def test_worker_scheduler_is_opt_in(self, cli, monkeypatch):
+        """
+        Test that only ``jobs worker --with-scheduler`` starts the
+        scheduler.
+        """
+        calls = []
+        monkeypatch.setattr(
+            jobs.Worker, u"work", lambda self, **kwargs: calls.append(kwargs)
+        )
+        cli.invoke(ckan, [u"jobs", u"worker", u"--burst"])
+        cli.invoke(ckan, [u"jobs", u"worker", u"--burst", u"--with-scheduler"])
+        assert [c[u"with_scheduler"] for c in calls] == [False, True]
@@ -159,6 +159,28 @@ class TestApiController(object):
             == "application/json;charset=utf-8"
         )
 
+    @pytest.mark.usefixtures("clean_db", "clean_index")
+    @pytest.mark.ckan_config("ckan.search.rows_max", 2)
+    def test_dataset_export(self, app):
+        datasets = [factories.Dataset() for _ in range(5)]
+        factories.Dataset(private=True, owner_org=factories.Organization()["id"])
+        url = url_for("api.dataset_export")
+        assert url == "/api/util/dataset/export"
+
+        response = app.get(url=url, query_string={"sort": "name asc"})
+
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        lines = response.body.splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [
+            dataset["id"]
+            for dataset in sorted(datasets, key=lambda d: d["name"])
+        ]
+
+    @pytest.mark.usefixtures("clean_index")
+    def test_dataset_export_invalid_sort(self, app):
+        url = url_for("api.dataset_export")
+        app.get(url=url, query_string={"sort": "invalid"}, status=400)
+
     def test_tag_autocomplete(self, app):
         factories.Dataset(tags=[{"name": "rivers ア"}])
         url = url_for("api.tag_autocomplete", ver=2)
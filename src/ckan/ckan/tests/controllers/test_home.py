@@ -8,6 +8,27 @@ from ckan.tests import factories
 
 
 class TestHome(object):
+    @pytest.mark.usefixtures("clean_db", "clean_index", "clean_redis")
+    def test_featured_organization_hides_private_datasets(
+            self, app, ckan_config, monkeypatch):
+        user = factories.User()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "member"}])
+        factories.Dataset(owner_org=org["id"], title="Public dataset")
+        factories.Dataset(
+            owner_org=org["id"], title="Private dataset", private=True)
+        monkeypatch.setitem(ckan_config, "ckan.featured_orgs", [org["name"]])
+        user_token = factories.APIToken(user=user["name"])
+
+        # computed and cached while a member of the organization is
+        # logged in
+        app.get(url_for("home.index"),
+                headers={"Authorization": user_token["token"]})
+        response = app.get(url_for("home.index"))
+
+        assert "Public dataset" in response.body
+        assert "Private dataset" not in response.body
+
     def test_home_renders(self, app):
         response = app.get(url_for("home.index"))
         assert "Welcome to CKAN" in response.body
@@ -1,5 +1,6 @@
 # encoding: utf-8
 
+import hashlib
 import uuid
 from bs4 import BeautifulSoup
 from werkzeug.routing import BuildError
@@ -1094,6 +1095,53 @@ class TestResourceDownload(object):
 
         assert response.headers[u"Content-Type"] == u"text/csv"
 
+    def test_resource_download_strong_etag_and_range(
+            self, create_with_upload, app):
+        dataset = factories.Dataset()
+        resource = create_with_upload(
+            u"hello,world", u"file.csv",
+            package_id=dataset[u"id"]
+        )
+        checksum = hashlib.sha256(b"hello,world").hexdigest()
+        assert resource[u"hash"] == checksum
+
+        url = url_for(
+            u"{}_resource.download".format(dataset[u"type"]),
+            id=dataset[u"id"],
+            resource_id=resource[u"id"],
+        )
+        response = app.get(url)
+        assert response.headers[u"ETag"] == u'"{}"'.format(checksum)
+
+        response = app.get(url, headers={u"Range": u"bytes=6-"}, status=206)
+        assert response.data == b"world"
+
+        app.get(
+            url, headers={u"If-None-Match": u'"{}"'.format(checksum)},
+            status=304)
+
+    @pytest.mark.ckan_config(u"ckan.download.offload", u"x-accel-redirect")
+    def test_resource_download_x_accel_redirect(
+            self, create_with_upload, app):
+        dataset = factories.Dataset()
+        resource = create_with_upload(
+            u"hello,world", u"file.csv",
+            package_id=dataset[u"id"]
+        )
+        url = url_for(
+            u"{}_resource.download".format(dataset[u"type"]),
+            id=dataset[u"id"],
+            resource_id=resource[u"id"],
+        )
+        response = app.get(url)
+
+        rid = resource[u"id"]
+        assert response.headers[u"X-Accel-Redirect"] == (
+            u"/_ckan_storage/resources/{}/{}/{}".format(
+                rid[:3], rid[3:6], rid[6:]))
+        assert response.data == b""
+        assert response.headers[u"Content-Type"] == u"text/csv"
+
 
 @pytest.mark.ckan_config("ckan.plugins", "image_view")
 @pytest.mark.usefixtures("non_clean_db", "with_plugins")
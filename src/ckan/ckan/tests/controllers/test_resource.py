@@ -1,5 +1,7 @@
 # encoding: utf-8
 
+import hashlib
+
 import pytest
 import ckan.lib.helpers as h
 import ckan.plugins as plugins
@@ -61,3 +63,101 @@ class TestPluggablePreviews:
 
         assert "mock-preview" in result
         assert "mock-preview.js" in result
+
+
+@pytest.mark.usefixtures("clean_db", "with_plugins")
+class TestChunkedUpload:
+    def _urls(self, dataset, resource, upload_id=None):
+        endpoint = "{}_resource.chunked_upload".format(dataset["type"])
+        kwargs = {"id": dataset["id"], "resource_id": resource["id"]}
+        if upload_id:
+            kwargs["upload_id"] = upload_id
+        return h.url_for(endpoint, **kwargs)
+
+    def test_upload_in_parts(self, app, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, "ckan.storage_path", str(tmpdir))
+        user = factories.UserWithToken()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "admin"}])
+        dataset = factories.Dataset(owner_org=org["id"])
+        resource = factories.Resource(package_id=dataset["id"])
+        headers = {"Authorization": user["token"]}
+        content = b"hello,world"
+
+        info = app.post(
+            self._urls(dataset, resource),
+            json={"filename": "data.csv", "size": len(content),
+                  "sha256": hashlib.sha256(content).hexdigest()},
+            headers=headers, status=201).json
+        url = self._urls(dataset, resource, info["upload_id"])
+
+        app.put(url + "?offset=0", data=content[:6],
+                headers=headers, status=200)
+        # resend the last part, as a client would after a failure
+        state = app.get(url, headers=headers, status=200).json
+        assert state["offset"] == 6
+        app.put(url + "?offset=6", data=content[6:],
+                headers=headers, status=200)
+        app.put(url + "?offset=6", data=content[6:],
+                headers=headers, status=200)
+
+        result = app.post(url, json={}, headers=headers, status=200).json
+
+        assert result["url_type"] == "upload"
+        assert result["size"] == len(content)
+        assert result["hash"] == hashlib.sha256(content).hexdigest()
+        download = h.url_for(
+            "{}_resource.download".format(dataset["type"]),
+            id=dataset["id"], resource_id=resource["id"])
+        assert app.get(download).data == content
+
+    def test_checksum_mismatch(self, app, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, "ckan.storage_path", str(tmpdir))
+        user = factories.UserWithToken()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "admin"}])
+        dataset = factories.Dataset(owner_org=org["id"])
+        resource = factories.Resource(package_id=dataset["id"])
+        headers = {"Authorization": user["token"]}
+
+        info = app.post(
+            self._urls(dataset, resource),
+            json={"filename": "data.csv", "sha256": "0" * 64},
+            headers=headers, status=201).json
+        url = self._urls(dataset, resource, info["upload_id"])
+        app.put(url + "?offset=0", data=b"hello", headers=headers, status=200)
+
+        result = app.post(url, json={}, headers=headers, status=400).json
+        assert "checksum" in result["errors"]
+
+    def test_offset_is_required(self, app, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, "ckan.storage_path", str(tmpdir))
+        user = factories.UserWithToken()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "admin"}])
+        dataset = factories.Dataset(owner_org=org["id"])
+        resource = factories.Resource(package_id=dataset["id"])
+        headers = {"Authorization": user["token"]}
+
+        info = app.post(
+            self._urls(dataset, resource), json={"filename": "data.csv"},
+            headers=headers, status=201).json
+        url = self._urls(dataset, resource, info["upload_id"])
+        app.put(url + "?offset=0", data=b"hello,", headers=headers,
+                status=200)
+
+        result = app.put(
+            url, data=b"world", headers=headers, status=400).json
+        assert "offset" in result["errors"]
+        state = app.get(url, headers=headers, status=200).json
+        assert state["offset"] == 6
+
+    def test_not_authorized(self, app, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, "ckan.storage_path", str(tmpdir))
+        user = factories.UserWithToken()
+        dataset = factories.Dataset()
+        resource = factories.Resource(package_id=dataset["id"])
+
+        app.post(
+            self._urls(dataset, resource), json={"filename": "data.csv"},
+            headers={"Authorization": user["token"]}, status=403)
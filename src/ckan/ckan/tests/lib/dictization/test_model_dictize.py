@@ -344,6 +344,52 @@ class TestGroupDictize:
         org = model_dictize.group_dictize(org_obj, context)
         assert org["package_count"] == 2
 
+    @pytest.mark.usefixtures("with_request_context")
+    def test_group_dictize_package_counts_share_one_search(
+        self, monkeypatch
+    ):
+        from ckan.lib.search.query import PackageSearchQuery
+
+        groups = [factories.Group.model() for _ in range(3)]
+        for group_obj in groups:
+            factories.Dataset(groups=[{"name": group_obj.name}])
+        context = {"model": model, "session": model.Session}
+
+        calls = []
+        run = PackageSearchQuery.run
+
+        def counting_run(self, *args, **kwargs):
+            calls.append(args)
+            return run(self, *args, **kwargs)
+
+        monkeypatch.setattr(PackageSearchQuery, "run", counting_run)
+
+        counts = [
+            model_dictize.group_dictize(
+                group_obj, context, packages_field="dataset_count"
+            )["package_count"]
+            for group_obj in groups
+        ]
+
+        assert counts == [1, 1, 1]
+        assert len(calls) == 1
+
+    @pytest.mark.usefixtures("with_request_context")
+    def test_group_dictize_package_counts_refreshed_after_indexing(self):
+        group_obj = factories.Group.model()
+        context = {"model": model, "session": model.Session}
+
+        group = model_dictize.group_dictize(
+            group_obj, context, packages_field="dataset_count"
+        )
+        assert group["package_count"] == 0
+
+        factories.Dataset(groups=[{"name": group_obj.name}])
+        group = model_dictize.group_dictize(
+            group_obj, context, packages_field="dataset_count"
+        )
+        assert group["package_count"] == 1
+
 
 @pytest.mark.usefixtures("non_clean_db")
 class TestPackageDictize:
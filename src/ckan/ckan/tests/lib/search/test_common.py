@@ -1,6 +1,11 @@
 # encoding: utf-8
+from unittest import mock
+
+import pysolr
 import pytest
+import requests
 
+import ckan.lib.search.common as search_common
 from ckan.common import config, g
 from ckan.lib.search import text_traceback
 
@@ -18,3 +23,86 @@ def test_text_traceback_dont_fail_on_runtime_error():
         _ = g.user
     except RuntimeError:
         assert text_traceback()
+
+
+@pytest.fixture
+def solr_session():
+    search_common.reset_session()
+    search_common.reset_metrics()
+    yield
+    search_common.reset_session()
+
+
+def _solr_response(*args, **kwargs):
+    response = mock.Mock(status_code=200)
+    response.content = b'{"response": {"numFound": 0, "docs": []}}'
+    return response
+
+
+@pytest.mark.usefixtures("solr_session")
+class TestPooledConnection(object):
+    def test_connections_share_the_session(self):
+        first = search_common.make_connection()
+        second = search_common.make_connection(decode_dates=False)
+
+        assert first.session is second.session
+
+    @pytest.mark.ckan_config("ckan.search.solr_pool_size", 3)
+    @pytest.mark.ckan_config("ckan.search.solr_retries", 4)
+    def test_pool_settings(self):
+        adapter = search_common.get_session().get_adapter("http://solr")
+
+        assert adapter._pool_maxsize == 3
+        assert adapter.max_retries.total == 4
+        assert adapter.max_retries.allowed_methods is None
+
+    @pytest.mark.ckan_config("ckan.search.solr_retries", 4)
+    def test_updates_are_not_sent_again_after_a_read_error(self):
+        session = search_common.get_session()
+        read = session.get_adapter("http://solr/solr/ckan/select/?q=*:*")
+        write = session.get_adapter("http://solr/solr/ckan/update/?commit=true")
+
+        assert read is not write
+        assert read.max_retries.read is None
+        assert write.max_retries.total == 4
+        assert write.max_retries.read == 0
+        assert write.max_retries.status_forcelist == (502, 503, 504)
+
+    @pytest.mark.ckan_config("solr_timeout", 30)
+    @pytest.mark.ckan_config("ckan.search.solr_read_timeout", 5)
+    def test_read_and_write_timeouts(self):
+        conn = search_common.make_connection()
+
+        with mock.patch.object(
+                requests.Session, "request",
+                side_effect=_solr_response) as request:
+            conn.search(q="*:*")
+            assert request.call_args[1]["timeout"] == 5
+
+            conn.commit()
+            assert request.call_args[1]["timeout"] == 30
+
+            conn.search(q="*:*")
+            assert request.call_args[1]["timeout"] == 5
+
+    def test_metrics(self):
+        conn = search_common.make_connection()
+
+        with mock.patch.object(
+                requests.Session, "request",
+                side_effect=_solr_response):
+            conn.search(q="*:*")
+            conn.search(q="*:*")
+            conn.commit()
+        with mock.patch.object(
+                requests.Session, "request",
+                side_effect=requests.exceptions.ConnectionError):
+            with pytest.raises(pysolr.SolrError):
+                conn.commit()
+
+        metrics = search_common.get_metrics()
+        assert metrics["read"]["count"] == 2
+        assert metrics["read"]["errors"] == 0
+        assert sum(count for _, count in metrics["read"]["buckets"]) == 2
+        assert metrics["write"]["count"] == 2
+        assert metrics["write"]["errors"] == 1
@@ -208,6 +208,17 @@ class TestSearchIndex(object):
         assert "test_empty_date" not in response.docs[0]
 
 
+@pytest.fixture
+def solr_schema_version(monkeypatch):
+    """Set the version of the schema of the Solr server, as read once by
+    schema_supports_partial_updates."""
+    def set_version(version):
+        monkeypatch.setattr(search, "_schema_versions", {
+            search.SolrSettings.get()[0]: version})
+    set_version("2.11.1")
+    return set_version
+
+
 class TestPackageSearchIndex:
     @staticmethod
     def _get_pkg_dict():
@@ -328,6 +339,176 @@ class TestPackageSearchIndex:
         # Resource types are indexed
         assert indexed_pkg["res_type"] == ["doc", "file"]
 
+    @pytest.mark.ckan_config("ckan.search.store_projection_fields", True)
+    def test_index_package_stores_projection_fields(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            index.index_package(pkg_dict)
+        doc = make_connection.return_value.add.call_args[1]["docs"][0]
+
+        validated_data_dict = json.loads(doc["validated_data_dict"])
+        assert json.loads(doc["validated_field_title"]) == "river-quality"
+        assert json.loads(
+            doc["validated_field_resources"]
+        ) == validated_data_dict["resources"]
+        assert set(
+            key[len("validated_field_"):] for key in doc
+            if key.startswith("validated_field_")
+        ) == set(validated_data_dict)
+
+    def test_index_package_does_not_store_projection_fields_by_default(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict()
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            index.index_package(pkg_dict)
+        doc = make_connection.return_value.add.call_args[1]["docs"][0]
+
+        assert not [key for key in doc if key.startswith("validated_field_")]
+
+    @staticmethod
+    def _indexed_doc(pkg_dict):
+        index = search.index.PackageSearchIndex()
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            index.index_package(dict(pkg_dict))
+        return make_connection.return_value.add.call_args[1]["docs"][0]
+
+    @pytest.mark.ckan_config("ckan.search.partial_updates", True)
+    @pytest.mark.usefixtures("solr_schema_version")
+    def test_update_dict_sets_changed_resource_fields(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+        doc = self._indexed_doc(pkg_dict)
+        pkg_dict["resources"][1]["format"] = "xls"
+        pkg_dict["metadata_modified"] = "2014-06-11T08:24:12.782257"
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            conn = make_connection.return_value
+            conn.search.return_value.docs = [doc]
+            index.update_dict(pkg_dict)
+
+        add = conn.add.call_args[1]
+        update = add["docs"][0]
+        assert update["index_id"] == doc["index_id"]
+        assert update["_version_"] == 1
+        assert update["res_format"] == ["pdf", "xls"]
+        assert update["metadata_modified"] == "2014-06-11T08:24:12.782257Z"
+        assert set(add["fieldUpdates"]) == set(update) - {
+            "index_id", "_version_"}
+        assert set(add["fieldUpdates"].values()) == {"set"}
+        assert json.loads(update["data_dict"]) == dict(
+            pkg_dict, validated_data_dict=update["validated_data_dict"])
+        # the same as when indexing the whole dataset
+        reindexed = self._indexed_doc(pkg_dict)
+        assert json.loads(update["validated_data_dict"]) == json.loads(
+            reindexed["validated_data_dict"])
+        assert "res_description" not in update
+
+    @pytest.mark.ckan_config("ckan.search.partial_updates", True)
+    @pytest.mark.usefixtures("solr_schema_version")
+    def test_update_dict_reindexes_other_changes(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+        doc = self._indexed_doc(pkg_dict)
+        pkg_dict["resources"][1]["format"] = "xls"
+        pkg_dict["notes"] = "Some notes"
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            conn = make_connection.return_value
+            conn.search.return_value.docs = [doc]
+            index.update_dict(pkg_dict)
+
+        add = conn.add.call_args[1]
+        assert "fieldUpdates" not in add
+        assert add["docs"][0]["notes"] == "Some notes"
+
+    @pytest.mark.ckan_config("ckan.search.partial_updates", True)
+    @pytest.mark.usefixtures("solr_schema_version")
+    def test_update_dict_reindexes_when_resources_are_removed(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+        doc = self._indexed_doc(pkg_dict)
+        pkg_dict["resources"] = []
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            conn = make_connection.return_value
+            conn.search.return_value.docs = [doc]
+            index.update_dict(pkg_dict)
+
+        # empty values can't be set with an atomic update
+        add = conn.add.call_args[1]
+        assert "fieldUpdates" not in add
+        assert "res_format" not in add["docs"][0]
+
+    def test_update_dict_reindexes_by_default(self):
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            index.update_dict(pkg_dict)
+
+        conn = make_connection.return_value
+        assert not conn.search.called
+        assert "fieldUpdates" not in conn.add.call_args[1]
+
+    @pytest.mark.ckan_config("ckan.search.partial_updates", True)
+    def test_update_dict_reindexes_with_an_older_schema(
+            self, solr_schema_version):
+        solr_schema_version("2.11")
+        index = search.index.PackageSearchIndex()
+        pkg_dict = self._get_pkg_dict_with_resources()
+        doc = self._indexed_doc(pkg_dict)
+        pkg_dict["resources"][1]["format"] = "xls"
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            conn = make_connection.return_value
+            conn.search.return_value.docs = [doc]
+            index.update_dict(pkg_dict)
+
+        assert not conn.search.called
+        assert "fieldUpdates" not in conn.add.call_args[1]
+
+    def test_update_fields_requires_a_supported_schema(
+            self, solr_schema_version):
+        solr_schema_version("2.11")
+        index = search.index.PackageSearchIndex()
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            with pytest.raises(search.SearchIndexError):
+                index.update_fields("some-id", {"views_total": 3})
+        assert not make_connection.return_value.add.called
+
+    def test_schema_version_is_read_once(self, monkeypatch):
+        monkeypatch.setattr(search, "_schema_versions", {})
+        with mock.patch(
+                "ckan.lib.search.get_solr_schema_version",
+                return_value="2.11.1") as get_version:
+            assert search.schema_supports_partial_updates()
+            assert search.schema_supports_partial_updates()
+        assert get_version.call_count == 1
+
+    @pytest.mark.usefixtures("solr_schema_version")
+    def test_update_fields_does_not_set_empty_values(self):
+        index = search.index.PackageSearchIndex()
+
+        with mock.patch(
+                "ckan.lib.search.index.make_connection") as make_connection:
+            with pytest.raises(search.SearchIndexError):
+                index.update_fields(
+                    "some-id", {"views_total": 3, "res_format": ["", ""]})
+        assert not make_connection.return_value.add.called
+
 
 @pytest.mark.usefixtures("clean_index")
 def test_index_only_called_once():
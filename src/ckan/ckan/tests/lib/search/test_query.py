@@ -332,8 +332,72 @@ def test_convert_legacy_params_to_solr():
         convert({"tags": {"tolstoy": 1}})
 
 
+def test_projection_tree():
+    assert search.query.projection_tree(
+        ["title", "resources.format,resources.url", "organization.title"]
+    ) == {
+        "title": None,
+        "resources": {"format": None, "url": None},
+        "organization": {"title": None},
+    }
+    assert search.query.projection_tree(
+        ["resources.format", "resources", "resources.url", "", "a..b"]
+    ) == {"resources": None}
+
+
+def test_project():
+    dataset = {
+        "title": "Rivers",
+        "notes": "About rivers",
+        "organization": {"name": "org", "title": "Org"},
+        "resources": [
+            {"format": "CSV", "url": "http://a"},
+            {"format": "PDF"},
+        ],
+    }
+    tree = search.query.projection_tree(
+        ["title", "organization.title", "resources.url", "missing"])
+
+    assert search.query.project(dataset, tree) == {
+        "title": "Rivers",
+        "organization": {"title": "Org"},
+        "resources": [{"url": "http://a"}, {}],
+    }
+
+
+def test_permission_labels_filter():
+    assert search.query.permission_labels_filter(
+        ["member-b", "public", "member-b", "creator-a"]
+    ) == "{!terms f=permission_labels}creator-a,member-b,public"
+    assert search.query.permission_labels_filter(
+        ["public", "custom,label"]
+    ) == '+permission_labels:("custom,label" OR "public")'
+
+
+def test_cursor_sort():
+    assert search.query.cursor_sort(None) == "index_id asc"
+    assert search.query.cursor_sort(
+        "score desc, metadata_modified desc"
+    ) == "score desc, metadata_modified desc, index_id asc"
+    assert search.query.cursor_sort("index_id desc") == "index_id desc"
+
+
 @pytest.mark.usefixtures("clean_db", "clean_index")
 class TestPackageQuery:
+    def test_permission_labels(self):
+        org = factories.Organization()
+        public = factories.Dataset()
+        private = factories.Dataset(owner_org=org["id"], private=True)
+        query = search.query_for(model.Package)
+
+        result = query.run({"q": "*:*"}, permission_labels=["public"])
+        assert result["results"] == [public["name"]]
+        result = query.run(
+            {"q": "*:*"}, permission_labels=["member-" + org["id"]])
+        assert result["results"] == [private["name"]]
+        result = query.run({"q": "*:*"}, permission_labels=[])
+        assert result["results"] == []
+
     def test_all_records_by_shared_notes(self):
         pkg1 = factories.Dataset(notes="shared")
         pkg2 = factories.Dataset(notes="shared")
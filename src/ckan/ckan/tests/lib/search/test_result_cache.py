@@ -0,0 +1,91 @@
+# encoding: utf-8
+
+from unittest import mock
+
+import pytest
+
+import ckan.model as model
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+from ckan.lib.search import result_cache
+from ckan.lib.search.query import PackageSearchQuery
+
+
+def _anonymous_search(**kwargs):
+    context = {
+        "user": "",
+        "ignore_auth": False,
+        "auth_user_obj": model.AnonymousUser(),
+    }
+    return helpers.call_action("package_search", context=context, **kwargs)
+
+
+def test_make_key_ignores_parameters_order():
+    assert result_cache.make_key(
+        {"q": "rivers", "rows": 10}, ["public"]
+    ) == result_cache.make_key({"rows": 10, "q": "rivers"}, ["public"])
+    assert result_cache.make_key(
+        {"q": "rivers"}, ["public"]
+    ) != result_cache.make_key({"q": "rivers"}, ["public"], for_view=True)
+
+
+@pytest.mark.usefixtures("clean_db", "clean_index", "clean_redis")
+@pytest.mark.ckan_config("ckan.search.result_cache.size", 10)
+class TestResultCache(object):
+    def setup_method(self):
+        result_cache.clear()
+
+    def test_anonymous_searches_are_cached(self):
+        dataset = factories.Dataset()
+
+        with mock.patch.object(
+                PackageSearchQuery, "run",
+                autospec=True, side_effect=PackageSearchQuery.run) as run:
+            first = _anonymous_search(q=dataset["name"])
+            second = _anonymous_search(q=dataset["name"])
+            assert run.call_count == 1
+
+        assert first == second
+        assert second["results"][0]["id"] == dataset["id"]
+
+    def test_cached_results_are_copies(self):
+        factories.Dataset()
+
+        _anonymous_search()["results"].clear()
+        assert _anonymous_search()["count"] == 1
+        assert len(_anonymous_search()["results"]) == 1
+
+    def test_index_changes_invalidate_the_cache(self):
+        factories.Dataset()
+        assert _anonymous_search()["count"] == 1
+
+        dataset = factories.Dataset()
+        assert _anonymous_search()["count"] == 2
+
+        helpers.call_action("package_delete", id=dataset["id"])
+        assert _anonymous_search()["count"] == 1
+
+    def test_searches_with_other_labels_are_not_cached(self):
+        user = factories.User()
+        factories.Dataset()
+        context = {"user": user["name"], "ignore_auth": False}
+
+        with mock.patch.object(
+                PackageSearchQuery, "run",
+                autospec=True, side_effect=PackageSearchQuery.run) as run:
+            helpers.call_action("package_search", context=dict(context))
+            helpers.call_action("package_search", context=dict(context))
+            helpers.call_action("package_search")
+            helpers.call_action("package_search")
+            assert run.call_count == 4
+
+    @pytest.mark.ckan_config("ckan.search.result_cache.size", 0)
+    def test_disabled(self):
+        factories.Dataset()
+
+        with mock.patch.object(
+                PackageSearchQuery, "run",
+                autospec=True, side_effect=PackageSearchQuery.run) as run:
+            _anonymous_search()
+            _anonymous_search()
+            assert run.call_count == 2
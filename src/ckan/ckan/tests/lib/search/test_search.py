@@ -25,6 +25,12 @@ def test_check_valid_schema():
     assert check_solr_schema_version(schema_file)
 
 
+def test_current_schema_supports_partial_updates():
+    schema_file = os.path.join(root_dir, "schema.xml")
+    assert search.get_solr_schema_version(schema_file) in \
+        search.PARTIAL_UPDATE_SCHEMA_VERSIONS
+
+
 def test_check_invalid_schema():
     schema_file = os.path.join(data_dir, "schema-no-version.xml")
     with pytest.raises(SearchError) as e:
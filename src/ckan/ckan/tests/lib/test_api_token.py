@@ -1,5 +1,13 @@
+import datetime
+from unittest import mock
+
 import pytest
+from freezegun import freeze_time
 
+import ckan.lib.api_token as api_token
+import ckan.lib.jobs as jobs
+import ckan.model as model
+import ckan.tests.factories as factories
 from ckan.lib.api_token import _get_secret
 
 
@@ -9,3 +17,96 @@ from ckan.lib.api_token import _get_secret
 def test_secrets_default_to_SECRET_KEY():
     assert _get_secret(True) == "super_secret"  # Encode
     assert _get_secret(False) == "super_secret"  # Decode
+
+
+@pytest.mark.usefixtures("non_clean_db", "clean_redis")
+class TestLastAccess(object):
+    def _token(self):
+        token = factories.APIToken()
+        return token["token"], api_token.decode(token["token"])["jti"]
+
+    def _last_access(self, jti):
+        model.Session.expire_all()
+        return model.ApiToken.get(jti).last_access
+
+    def test_first_access_is_recorded(self):
+        token, jti = self._token()
+        api_token.get_user_from_token(token)
+        assert self._last_access(jti) is not None
+
+    def test_access_within_precision_is_not_written(self):
+        token, jti = self._token()
+        now = datetime.datetime.utcnow()
+        with freeze_time(now):
+            api_token.get_user_from_token(token)
+        with freeze_time(now + datetime.timedelta(seconds=30)):
+            api_token.get_user_from_token(token)
+        assert self._last_access(jti) == now
+
+    def test_accesses_are_flushed_in_bulk(self, monkeypatch):
+        first, first_jti = self._token()
+        second, second_jti = self._token()
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        with freeze_time(now):
+            api_token.get_user_from_token(first)
+            api_token.get_user_from_token(second)
+
+        later = now + datetime.timedelta(minutes=5)
+        flushes = []
+        monkeypatch.setattr(
+            api_token, "flush_last_access",
+            lambda: flushes.append(1) or 0)
+        with freeze_time(later):
+            api_token._buffered_access.clear()
+            api_token.get_user_from_token(first)
+            api_token.get_user_from_token(second)
+        monkeypatch.undo()
+
+        # buffered, but not written yet
+        assert self._last_access(first_jti) == now
+        assert len(flushes) == 1
+
+        assert api_token.flush_last_access() == 2
+        assert self._last_access(first_jti) == later
+        assert self._last_access(second_jti) == later
+
+    def test_flush_is_scheduled_for_accesses_within_the_interval(
+            self, monkeypatch):
+        first, first_jti = self._token()
+        second, second_jti = self._token()
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        with freeze_time(now):
+            api_token.get_user_from_token(first)
+            api_token.get_user_from_token(second)
+
+        queue = mock.Mock()
+        monkeypatch.setattr(jobs, "get_queue", lambda: queue)
+        later = now + datetime.timedelta(minutes=5)
+        with freeze_time(later):
+            api_token._buffered_access.clear()
+            # flushed right away
+            api_token.get_user_from_token(first)
+            # buffered until the end of the interval
+            api_token.get_user_from_token(second)
+            api_token._buffered_access.clear()
+            api_token.get_user_from_token(second)
+
+        assert queue.enqueue_in.call_count == 1
+        delay, func = queue.enqueue_in.call_args[0]
+        assert 0 < delay.total_seconds() <= 60
+        assert func is api_token.flush_last_access
+
+        assert self._last_access(second_jti) == now
+        func()
+        assert self._last_access(second_jti) == later
+
+    @pytest.mark.ckan_config("api_token.last_access_precision", 0)
+    def test_every_access_is_written_without_precision(self):
+        token, jti = self._token()
+        now = datetime.datetime.utcnow()
+        with freeze_time(now):
+            api_token.get_user_from_token(token)
+        later = now + datetime.timedelta(seconds=1)
+        with freeze_time(later):
+            api_token.get_user_from_token(token)
+        assert self._last_access(jti) == later
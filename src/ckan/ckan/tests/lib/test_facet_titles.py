@@ -0,0 +1,89 @@
+# encoding: utf-8
+
+from unittest import mock
+
+import pytest
+import sqlalchemy as sa
+
+import ckan.lib.facet_titles as facet_titles
+import ckan.model as model
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+from ckan.lib.search.query import PackageSearchQuery
+
+
+@pytest.mark.usefixtures("clean_db", "clean_redis")
+class TestFacetTitles(object):
+    def test_group_titles(self):
+        org = factories.Organization(title="An organization")
+        group = factories.Group(title="A group")
+
+        titles = facet_titles.group_titles()
+        assert titles[org["name"]] == "An organization"
+        assert titles[group["name"]] == "A group"
+
+    def test_group_titles_are_reloaded_after_changes(self):
+        org = factories.Organization(title="Old title")
+        assert facet_titles.group_titles()[org["name"]] == "Old title"
+
+        helpers.call_action(
+            "organization_patch", id=org["id"], title="New title")
+        assert facet_titles.group_titles()[org["name"]] == "New title"
+
+        group = factories.Group(title="A group")
+        assert facet_titles.group_titles()[group["name"]] == "A group"
+
+    def test_group_titles_are_loaded_once(self):
+        factories.Organization()
+        facet_titles.group_titles()
+
+        with mock.patch.object(model, "Session") as session:
+            facet_titles.group_titles()
+            assert not session.query.called
+
+    def test_license_titles(self):
+        register = model.Package.get_license_register()
+
+        assert facet_titles.license_titles() == {
+            license.id: license.title for license in register.values()}
+
+    def test_package_search_facets_without_queries(self):
+        organizations = [factories.Organization() for _ in range(55)]
+        register = model.Package.get_license_register()
+        facets = {
+            "organization": {org["name"]: 1 for org in organizations},
+            "license_id": {id_: 1 for id_ in register.keys()},
+        }
+        assert len(facets["organization"]) + len(facets["license_id"]) > 50
+
+        def run(query, *args, **kwargs):
+            query.count = 0
+            query.results = []
+            query.facets = dict(facets)
+            return {"results": [], "count": 0}
+
+        statements = []
+
+        def log_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with mock.patch.object(
+                PackageSearchQuery, "run", autospec=True, side_effect=run):
+            helpers.call_action("package_search")
+            sa.event.listen(
+                model.meta.engine, "before_cursor_execute", log_statement)
+            try:
+                result = helpers.call_action("package_search")
+            finally:
+                sa.event.remove(
+                    model.meta.engine, "before_cursor_execute",
+                    log_statement)
+
+        # the user is loaded for the context, but not the groups
+        assert not [s for s in statements if '"group"' in s]
+        items = result["search_facets"]["organization"]["items"]
+        assert sorted(item["display_name"] for item in items) == sorted(
+            org["title"] for org in organizations)
+        items = result["search_facets"]["license_id"]["items"]
+        assert sorted(item["display_name"] for item in items) == sorted(
+            license.title for license in register.values())
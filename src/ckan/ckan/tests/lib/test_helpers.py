@@ -908,3 +908,18 @@ def test_decode_view_request_filters(test_request_context):
 def test_get_translated(data_dict, locale, result, monkeypatch):
     monkeypatch.setattr(flask_app, "get_locale", lambda: locale)
     assert h.get_translated(data_dict, 'notes') == result
+
+
+@pytest.mark.parametrize("ttl, anonymous", [(0, False), (300, True)])
+@pytest.mark.usefixtures("clean_redis")
+def test_featured_groups_are_anonymous_only_when_cached(
+        ttl, anonymous, ckan_config, monkeypatch):
+    monkeypatch.setitem(ckan_config, "ckan.home.cache_ttl", ttl)
+    calls = []
+    monkeypatch.setattr(
+        h, "featured_group_org", lambda *args: calls.append(args) or [])
+
+    h.get_featured_groups()
+    h.get_featured_organizations()
+
+    assert [args[-1] for args in calls] == [anonymous, anonymous]
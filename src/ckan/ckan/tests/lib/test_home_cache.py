@@ -0,0 +1,83 @@
+# encoding: utf-8
+
+import pytest
+
+import ckan.lib.home_cache as home_cache
+import ckan.lib.jobs as jobs
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+
+_calls = []
+
+
+def _compute(value):
+    _calls.append(value)
+    return {"value": value, "calls": len(_calls)}
+
+
+@pytest.fixture
+def calls():
+    del _calls[:]
+    return _calls
+
+
+@pytest.mark.usefixtures("clean_redis")
+class TestHomeCache(object):
+    def test_value_is_computed_once(self, calls):
+        assert home_cache.get("test", _compute, 1) == {
+            "value": 1, "calls": 1}
+        assert home_cache.get("test", _compute, 1) == {
+            "value": 1, "calls": 1}
+        assert len(calls) == 1
+
+    @pytest.mark.ckan_config("ckan.home.cache_ttl", 0)
+    def test_cache_disabled(self, calls):
+        home_cache.get("test", _compute, 1)
+        home_cache.get("test", _compute, 1)
+        assert len(calls) == 2
+
+    def test_stale_value_is_refreshed_in_background(
+            self, calls, monkeypatch):
+        enqueued = []
+        monkeypatch.setattr(
+            jobs, "enqueue", lambda fn, args, **kw: enqueued.append(args))
+        home_cache.get("test", _compute, 1)
+
+        home_cache.invalidate()
+
+        # the stale value is served, and only one refresh is scheduled
+        assert home_cache.get("test", _compute, 1)["calls"] == 1
+        assert home_cache.get("test", _compute, 1)["calls"] == 1
+        assert enqueued == [["test", _compute, 1]]
+
+        home_cache.refresh(*enqueued[0])
+        assert home_cache.get("test", _compute, 1)["calls"] == 2
+
+    @pytest.mark.ckan_config("ckan.home.cache_background_refresh", False)
+    def test_stale_value_is_refreshed_inline(self, calls):
+        home_cache.get("test", _compute, 1)
+        home_cache.invalidate()
+
+        home_cache.get("test", _compute, 1)
+
+        assert home_cache.get("test", _compute, 1)["calls"] == 2
+
+    @pytest.mark.usefixtures("non_clean_db")
+    @pytest.mark.ckan_config("ckan.home.cache_background_refresh", False)
+    def test_dataset_changes_invalidate_the_cache(self, calls):
+        home_cache.get("test", _compute, 1)
+        factories.Dataset()
+
+        home_cache.get("test", _compute, 1)
+
+        assert len(calls) == 2
+
+    @pytest.mark.usefixtures("non_clean_db")
+    def test_read_actions_do_not_invalidate_the_cache(self, calls):
+        dataset = factories.Dataset()
+        home_cache.get("test", _compute, 1)
+
+        helpers.call_action("package_show", id=dataset["id"])
+
+        home_cache.get("test", _compute, 1)
+        assert len(calls) == 1
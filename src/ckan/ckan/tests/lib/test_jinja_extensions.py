@@ -0,0 +1,93 @@
+# encoding: utf-8
+
+import os
+
+import pytest
+from jinja2 import Environment
+from jinja2.exceptions import TemplateNotFound
+
+from ckan.lib.jinja_extensions import CkanFileSystemLoader
+
+
+@pytest.fixture
+def searchpath(tmp_path):
+    paths = []
+    for name in ["extension", "core"]:
+        folder = tmp_path / name
+        (folder / "snippets").mkdir(parents=True)
+        (folder / "page.html").write_text(name)
+        paths.append(str(folder))
+    (tmp_path / "core" / "snippets" / "item.html").write_text("item")
+    return paths
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_template_found_in_first_path(searchpath, use_index):
+    loader = CkanFileSystemLoader(
+        searchpath, use_index=use_index, auto_reload=not use_index)
+    source, filename, _ = loader.get_source(Environment(), "page.html")
+    assert source == "extension"
+    assert filename == os.path.join(searchpath[0], "page.html")
+
+    source, _, _ = loader.get_source(Environment(), "snippets/item.html")
+    assert source == "item"
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_extended_template_found_in_next_paths(searchpath, use_index):
+    loader = CkanFileSystemLoader(
+        searchpath, use_index=use_index, auto_reload=not use_index)
+    source, _, _ = loader.get_source(
+        Environment(), "*{}*page.html".format(searchpath[0]))
+    assert source == "core"
+
+    with pytest.raises(TemplateNotFound):
+        loader.get_source(
+            Environment(), "*{}*page.html".format(searchpath[1]))
+
+
+def test_index(searchpath):
+    loader = CkanFileSystemLoader(
+        searchpath, use_index=True, auto_reload=False)
+    assert loader.index == {
+        "page.html": [0, 1],
+        "snippets/item.html": [1],
+    }
+
+
+def test_index_not_used_with_auto_reload(searchpath):
+    loader = CkanFileSystemLoader(searchpath, use_index=True)
+    assert loader.index is None
+    source, _, _ = loader.get_source(Environment(), "snippets/item.html")
+    assert source == "item"
+
+    # a new template overriding one of a later path
+    with open(os.path.join(searchpath[0], "snippets", "item.html"), "w") as f:
+        f.write("new item")
+    source, _, _ = loader.get_source(Environment(), "snippets/item.html")
+    assert source == "new item"
+
+
+def test_index_is_final_without_auto_reload(searchpath):
+    loader = CkanFileSystemLoader(
+        searchpath, use_index=True, auto_reload=False)
+    with open(os.path.join(searchpath[0], "new.html"), "w") as f:
+        f.write("new")
+    with pytest.raises(TemplateNotFound):
+        loader.get_source(Environment(), "new.html")
+
+
+def test_modified_templates_are_reloaded(searchpath):
+    loader = CkanFileSystemLoader(searchpath)
+    _, filename, uptodate = loader.get_source(Environment(), "page.html")
+    assert uptodate()
+    os.utime(filename, (0, 0))
+    assert not uptodate()
+
+
+def test_modification_time_not_checked_without_auto_reload(
+        searchpath, monkeypatch):
+    loader = CkanFileSystemLoader(searchpath, auto_reload=False)
+    monkeypatch.setattr(os.path, "getmtime", pytest.fail)
+    _, _, uptodate = loader.get_source(Environment(), "page.html")
+    assert uptodate()
@@ -0,0 +1,147 @@
+# encoding: utf-8
+
+from unittest import mock
+
+import pytest
+
+import ckan.lib.permission_labels as permission_labels
+import ckan.model as model
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+
+
+def _labels(user):
+    return sorted(
+        permission_labels.get_user_labels(model.User.get(user["id"])))
+
+
+def _org_labels(user):
+    orgs = helpers.call_action(
+        "organization_list_for_user", {"user": user["name"]},
+        permission="read")
+    return sorted("member-" + org["id"] for org in orgs)
+
+
+@pytest.mark.usefixtures("clean_db", "clean_redis")
+class TestPermissionLabels(object):
+    def test_matches_organization_list_for_user(self):
+        user = factories.User()
+        admin = dict(user, capacity="admin")
+        member = dict(user, capacity="member")
+        top = factories.Organization(users=[admin])
+        middle = factories.Organization()
+        bottom = factories.Organization()
+        factories.Organization(users=[member])
+        factories.Organization()
+        helpers.call_action(
+            "member_create", id=bottom["id"], object=middle["id"],
+            object_type="group", capacity="parent")
+        helpers.call_action(
+            "member_create", id=middle["id"], object=top["id"],
+            object_type="group", capacity="parent")
+
+        assert len(_labels(user)) == 4
+        assert _labels(user) == _org_labels(user)
+
+    def test_member_role_does_not_cascade(self):
+        user = factories.User()
+        parent = factories.Organization(users=[dict(user, capacity="member")])
+        child = factories.Organization()
+        helpers.call_action(
+            "member_create", id=child["id"], object=parent["id"],
+            object_type="group", capacity="parent")
+
+        assert _labels(user) == ["member-" + parent["id"]]
+        assert _labels(user) == _org_labels(user)
+
+    def test_sysadmin(self):
+        orgs = [factories.Organization(), factories.Organization()]
+        sysadmin = factories.Sysadmin()
+
+        assert _labels(sysadmin) == sorted(
+            "member-" + org["id"] for org in orgs)
+
+    @pytest.mark.ckan_config("ckan.auth.allow_dataset_collaborators", True)
+    def test_collaborators(self):
+        user = factories.User()
+        dataset = factories.Dataset()
+        helpers.call_action(
+            "package_collaborator_create", id=dataset["id"],
+            user_id=user["id"], capacity="editor")
+
+        assert _labels(user) == ["collaborator-" + dataset["id"]]
+
+    def test_labels_are_cached(self):
+        user = factories.User()
+        org = factories.Organization(users=[dict(user, capacity="member")])
+
+        with mock.patch.object(
+                permission_labels, "query_user_labels",
+                wraps=permission_labels.query_user_labels) as query:
+            assert _labels(user) == ["member-" + org["id"]]
+            assert _labels(user) == ["member-" + org["id"]]
+            assert query.call_count == 1
+
+    def test_cache_is_invalidated_on_membership_changes(self):
+        user = factories.User()
+        org = factories.Organization()
+        assert _labels(user) == []
+
+        helpers.call_action(
+            "organization_member_create", id=org["id"],
+            username=user["name"], role="member")
+        assert _labels(user) == ["member-" + org["id"]]
+
+        helpers.call_action(
+            "organization_member_delete", id=org["id"],
+            username=user["name"])
+        assert _labels(user) == []
+
+    def test_cache_is_invalidated_on_hierarchy_changes(self):
+        user = factories.User()
+        parent = factories.Organization(users=[dict(user, capacity="admin")])
+        child = factories.Organization()
+        assert _labels(user) == ["member-" + parent["id"]]
+
+        helpers.call_action(
+            "member_create", id=child["id"], object=parent["id"],
+            object_type="group", capacity="parent")
+        assert _labels(user) == sorted(
+            ["member-" + parent["id"], "member-" + child["id"]])
+
+    def test_cache_is_kept_when_datasets_are_added_to_groups(self):
+        user = factories.User()
+        org = factories.Organization(users=[dict(user, capacity="member")])
+        group = factories.Group()
+        dataset = factories.Dataset()
+        assert _labels(user) == ["member-" + org["id"]]
+
+        with mock.patch.object(permission_labels, "invalidate") as invalidate:
+            helpers.call_action(
+                "member_create", id=group["id"], object=dataset["id"],
+                object_type="package", capacity="public")
+        assert not invalidate.called
+
+    @pytest.mark.ckan_config("ckan.auth.allow_dataset_collaborators", True)
+    def test_cache_is_invalidated_on_collaborator_changes(self):
+        user = factories.User()
+        dataset = factories.Dataset()
+        assert _labels(user) == []
+
+        helpers.call_action(
+            "package_collaborator_create", id=dataset["id"],
+            user_id=user["id"], capacity="member")
+        assert _labels(user) == ["collaborator-" + dataset["id"]]
+
+        helpers.call_action(
+            "package_collaborator_delete", id=dataset["id"],
+            user_id=user["id"])
+        assert _labels(user) == []
+
+    def test_cache_is_invalidated_when_an_organization_is_deleted(self):
+        user = factories.User()
+        org = factories.Organization(users=[dict(user, capacity="member")])
+        assert _labels(user) == ["member-" + org["id"]]
+
+        helpers.call_action("organization_delete", id=org["id"])
+        assert _labels(user) == []
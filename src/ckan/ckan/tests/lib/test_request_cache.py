@@ -0,0 +1,66 @@
+# encoding: utf-8
+
+import pytest
+
+import ckan.lib.request_cache as request_cache
+
+
+def test_values_are_not_cached_without_app_context():
+    calls = []
+    for _ in range(2):
+        request_cache.get("test", "key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_store_without_app_context():
+    request_cache.store("test", "key", 1)
+    assert request_cache.peek("test", "key") is None
+
+
+def test_cache_does_not_outlive_request(test_request_context):
+    with test_request_context():
+        request_cache.get("test", "key", lambda: 1)
+    with test_request_context():
+        assert request_cache.get("test", "key", lambda: 2) == 2
+
+
+@pytest.mark.usefixtures("with_request_context")
+class TestRequestCache(object):
+    def test_factory_is_called_once(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return len(calls)
+
+        assert request_cache.get("test", "key", factory) == 1
+        assert request_cache.get("test", "key", factory) == 1
+        assert request_cache.get("test", "other", factory) == 2
+
+    def test_invalidate_namespace(self):
+        request_cache.get("test", "key", lambda: 1)
+        request_cache.get("other", "key", lambda: 1)
+
+        request_cache.invalidate("test")
+
+        assert request_cache.get("test", "key", lambda: 2) == 2
+        assert request_cache.get("other", "key", lambda: 2) == 1
+
+    def test_invalidate_all(self):
+        request_cache.get("test", "key", lambda: 1)
+        request_cache.get("other", "key", lambda: 1)
+
+        request_cache.invalidate()
+
+        assert request_cache.get("test", "key", lambda: 2) == 2
+        assert request_cache.get("other", "key", lambda: 2) == 2
+
+    def test_peek_and_store(self):
+        assert request_cache.peek("test", "key") is None
+
+        request_cache.store("test", "key", 1)
+        assert request_cache.peek("test", "key") == 1
+        assert request_cache.get("test", "key", lambda: 2) == 1
+
+        request_cache.store("test", "key", 3)
+        assert request_cache.peek("test", "key") == 3
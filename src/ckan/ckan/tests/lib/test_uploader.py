@@ -1,10 +1,17 @@
 # encoding: utf-8
 
+import fcntl
+import hashlib
+import os
+import time
+from collections import OrderedDict
 import pytest
 from io import BytesIO
+from unittest import mock
 from werkzeug.datastructures import FileStorage
 
-from ckan.logic import ValidationError
+import ckan.lib.uploader as uploader
+from ckan.logic import NotFound, ValidationError
 from ckan.lib.uploader import ResourceUpload, Upload
 
 
@@ -78,6 +85,182 @@ class TestInitResourceUpload(object):
         with pytest.raises(ValidationError):
             res_upload.upload(resource_id)
 
+    def test_resource_upload_checksum(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+
+        resource_id = u'8a3a874e-5ee1-4e43-bdaf-e2569cf72344'
+        res = {u'url': u'',
+               u'upload': FileStorage(
+                   BytesIO(b'hello,world'), filename=u'data.csv'),
+               u'package_id': u'dataset1',
+               u'id': resource_id}
+        res_upload = ResourceUpload(res)
+        assert res_upload.checksum is None
+
+        res_upload.upload(resource_id)
+
+        assert res_upload.checksum == hashlib.sha256(b'hello,world').hexdigest()
+
+
+class TestChunkedResourceUpload(object):
+    resource_id = u'8a3a874e-5ee1-4e43-bdaf-e2569cf72344'
+
+    def test_parts_are_written_in_place(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+
+        info = upload.init_part_upload(self.resource_id, u'data.csv', 11)
+        upload_id = info[u'upload_id']
+        upload.write_part(
+            self.resource_id, upload_id, BytesIO(b'hello,'), 0)
+        upload.write_part(
+            self.resource_id, upload_id, BytesIO(b'XXXXX'), 6)
+        # a part can be sent again after a failure
+        info = upload.write_part(
+            self.resource_id, upload_id, BytesIO(b'world'), 6)
+        assert info[u'offset'] == 11
+
+        upload.complete_part_upload(
+            self.resource_id, upload_id,
+            hashlib.sha256(b'hello,world').hexdigest())
+
+        with open(upload.get_path(self.resource_id), u'rb') as f:
+            assert f.read() == b'hello,world'
+        assert upload.filesize == 11
+        assert upload.filename == u'data.csv'
+        assert upload.mimetype == u'text/csv'
+        with pytest.raises(NotFound):
+            upload.get_part_upload(self.resource_id, upload_id)
+
+    def test_gaps_are_rejected(self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+
+        with pytest.raises(ValidationError):
+            upload.write_part(
+                self.resource_id, upload_id, BytesIO(b'world'), 6)
+
+    def test_checksum_is_verified(self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv', checksum=u'0' * 64)[u'upload_id']
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'hello'), 0)
+
+        with pytest.raises(ValidationError):
+            upload.complete_part_upload(self.resource_id, upload_id)
+        assert not os.path.exists(upload.get_path(self.resource_id))
+
+    def test_checksum_is_computed_while_writing(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'hello,'), 0)
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'world'), 6)
+
+        with mock.patch.object(uploader, u'_hash_file') as hash_file:
+            upload.complete_part_upload(self.resource_id, upload_id)
+        assert not hash_file.called
+        assert upload.checksum == hashlib.sha256(b'hello,world').hexdigest()
+
+    def test_checksum_of_resent_parts_is_read_from_the_file(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'hello,'), 0)
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'XXXXX'), 6)
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'world'), 3)
+
+        upload.complete_part_upload(self.resource_id, upload_id)
+        assert upload.checksum == hashlib.sha256(b'helworld').hexdigest()
+
+    def test_checksum_is_read_from_the_file_written_by_another_process(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'hello,'), 0)
+        upload.write_part(self.resource_id, upload_id, BytesIO(b'world'), 6)
+        # another process rewrites the data hashed by this one, ending at
+        # the same offset
+        with mock.patch.object(uploader, u'_part_hashers', OrderedDict()):
+            upload.write_part(
+                self.resource_id, upload_id, BytesIO(b'HELLO,'), 0)
+            upload.write_part(
+                self.resource_id, upload_id, BytesIO(b'WORLD'), 6)
+
+        upload.complete_part_upload(
+            self.resource_id, upload_id,
+            hashlib.sha256(b'HELLO,WORLD').hexdigest())
+        assert upload.checksum == hashlib.sha256(b'HELLO,WORLD').hexdigest()
+
+    def test_concurrent_writes_are_rejected(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        upload_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        part_path = upload.get_part_path(self.resource_id, upload_id)
+
+        with open(part_path, u'rb') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with pytest.raises(ValidationError):
+                upload.write_part(
+                    self.resource_id, upload_id, BytesIO(b'hello'), 0)
+        assert upload.get_part_upload(
+            self.resource_id, upload_id)[u'offset'] == 0
+
+    def test_expired_uploads_are_discarded(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        monkeypatch.setitem(ckan_config, u'ckan.upload.part_upload_ttl', 60)
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        old_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        new_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        old_path = upload.get_part_path(self.resource_id, old_id)
+        an_hour_ago = time.time() - 3600
+        os.utime(old_path, (an_hour_ago, an_hour_ago))
+
+        with pytest.raises(NotFound):
+            upload.get_part_upload(self.resource_id, old_id)
+        assert not os.path.exists(old_path + u'.json')
+        upload.get_part_upload(self.resource_id, new_id)
+
+    def test_clean_part_uploads(self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+        old_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        new_id = upload.init_part_upload(
+            self.resource_id, u'data.csv')[u'upload_id']
+        old_path = upload.get_part_path(self.resource_id, old_id)
+        an_hour_ago = time.time() - 3600
+        os.utime(old_path, (an_hour_ago, an_hour_ago))
+
+        assert upload.clean_part_uploads(60) == 1
+
+        assert not os.path.exists(old_path)
+        assert not os.path.exists(old_path + u'.json')
+        upload.get_part_upload(self.resource_id, new_id)
+
+    def test_invalid_upload_id(self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u'ckan.storage_path', str(tmpdir))
+        upload = ResourceUpload({u'url': u'', u'id': self.resource_id})
+
+        with pytest.raises(NotFound):
+            upload.get_part_upload(self.resource_id, u'../../etc/passwd')
+
 
 class TestUpload(object):
     def test_group_upload(self, monkeypatch, tmpdir, make_app, ckan_config, faker):
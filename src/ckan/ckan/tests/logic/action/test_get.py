@@ -2,6 +2,7 @@
 
 import datetime
 import re
+from unittest import mock
 
 import pytest
 
@@ -11,7 +12,7 @@ import ckan.logic.schema as schema
 import ckan.tests.factories as factories
 import ckan.tests.helpers as helpers
 from ckan import __version__
-from ckan.lib.search.common import SearchError
+from ckan.lib.search.common import SearchError, SearchQueryError
 
 
 @pytest.mark.usefixtures("non_clean_db")
@@ -1532,6 +1533,71 @@ class TestPackageSearch(object):
         result_names = [result["name"] for result in search_result["results"]]
         assert result_names == ["test2", "test1", "test0"]
 
+    def test_fields(self):
+        org = factories.Organization(title="Rivers org")
+        dataset = factories.Dataset(
+            title="Rivers", owner_org=org["id"],
+            resources=[{"url": "http://a", "format": "CSV"}])
+
+        search_result = helpers.call_action(
+            "package_search",
+            fields=["title", "organization.title", "resources.format"])
+
+        assert search_result["results"] == [{
+            "title": "Rivers",
+            "organization": {"title": "Rivers org"},
+            "resources": [{"format": "CSV"}],
+        }]
+
+        search_result = helpers.call_action(
+            "package_search", fields="id,name")
+        assert search_result["results"] == [
+            {"id": dataset["id"], "name": dataset["name"]}]
+
+    @pytest.mark.ckan_config("ckan.search.store_projection_fields", True)
+    def test_fields_not_stored_are_not_sent_to_solr(self):
+        with mock.patch("ckan.lib.search.query.make_connection") as conn:
+            conn.return_value.search.return_value = mock.Mock(
+                docs=[], hits=0, facets={})
+            helpers.call_action(
+                "package_search", fields=["title", "x:y", "a b"])
+
+        assert conn.return_value.search.call_args[1]["fl"] == (
+            "id validated_field_title")
+
+    def test_fields_with_fl(self):
+        with pytest.raises(logic.ValidationError):
+            helpers.call_action(
+                "package_search", fields=["title"], fl=["name"])
+
+    def test_cursor(self):
+        for i in range(5):
+            factories.Dataset(name="test{}".format(i))
+
+        names = []
+        cursor = "*"
+        while cursor:
+            search_result = helpers.call_action(
+                "package_search", sort="name asc", rows=2, cursor=cursor)
+            assert search_result["count"] == 5
+            names.extend(result["name"] for result in search_result["results"])
+            cursor = search_result["next_cursor"]
+
+        assert names == ["test0", "test1", "test2", "test3", "test4"]
+
+    def test_cursor_not_returned_without_cursor(self):
+        factories.Dataset()
+
+        assert "next_cursor" not in helpers.call_action("package_search")
+
+    def test_cursor_with_start(self):
+        with pytest.raises(SearchQueryError):
+            helpers.call_action("package_search", cursor="*", start=2)
+
+    def test_cursor_invalid(self):
+        with pytest.raises(SearchQueryError):
+            helpers.call_action("package_search", cursor="not-a-cursor")
+
     @pytest.mark.ckan_config(
         "ckan.search.default_package_sort", "metadata_created asc"
     )
@@ -3,7 +3,7 @@
 import pytest
 
 import ckan.model as model
-from ckan.tests import factories
+from ckan.tests import factories, helpers
 
 
 @pytest.mark.usefixtures("non_clean_db")
@@ -284,3 +284,43 @@ class TestHierarchy:
         assert hierarchy["top_single"].name in names
         assert hierarchy["tree"]["tree"][0].name not in names
         assert hierarchy["tree"]["tree"][1].name not in names
+
+    def test_get_children_group_ids(self, hierarchy):
+        top = hierarchy["top_branch"]
+        mid = hierarchy["tree"]["mid_branch"]
+        children = model.Group.get_children_group_ids(
+            [top.id, mid.id, hierarchy["top_single"].id], type=group_type)
+        assert set(children) == {top.id, mid.id}
+        assert set(children[mid.id]) == {
+            child.id for child in hierarchy["tree"]["tree"]}
+        assert len(children[top.id]) == 4
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestGroupHierarchyTable:
+    def _closure(self):
+        return set(model.Session.query(
+            model.group_hierarchy_table.c.ancestor_id,
+            model.group_hierarchy_table.c.descendant_id,
+            model.group_hierarchy_table.c.depth))
+
+    def test_member_create_and_delete(self):
+        top = factories.Organization()
+        middle = factories.Organization()
+        bottom = factories.Organization()
+        helpers.call_action(
+            "member_create", id=bottom["id"], object=middle["id"],
+            object_type="group", capacity="parent")
+        helpers.call_action(
+            "member_create", id=middle["id"], object=top["id"],
+            object_type="group", capacity="parent")
+        assert self._closure() == {
+            (top["id"], middle["id"], 1),
+            (middle["id"], bottom["id"], 1),
+            (top["id"], bottom["id"], 2),
+        }
+
+        helpers.call_action(
+            "member_delete", id=middle["id"], object=top["id"],
+            object_type="group")
+        assert self._closure() == {(middle["id"], bottom["id"], 1)}
@@ -0,0 +1,173 @@
+# encoding: utf-8
+
+import contextlib
+from unittest import mock
+
+import pytest
+import sqlalchemy as sa
+
+import ckan.lib.request_cache as request_cache
+import ckan.model as model
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+from ckan.lib.helpers import url_for
+
+
+@contextlib.contextmanager
+def _count_statements():
+    statements = []
+
+    def log_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    sa.event.listen(model.meta.engine, "before_cursor_execute", log_statement)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(
+            model.meta.engine, "before_cursor_execute", log_statement)
+
+
+@pytest.mark.usefixtures("clean_db", "with_request_context")
+class TestIdentityMap(object):
+    @pytest.mark.parametrize("factory, model_class", [
+        (factories.Dataset, model.Package),
+        (factories.Group, model.Group),
+        (factories.Organization, model.Group),
+        (factories.User, model.User),
+    ])
+    def test_get_by_id_and_name(self, factory, model_class):
+        obj = model_class.get(factory()["id"])
+
+        with _count_statements() as statements:
+            assert model_class.get(obj.id) is obj
+            assert model_class.get(obj.name) is obj
+        assert statements == []
+
+    def test_renamed_objects_are_not_returned_by_old_name(self):
+        dataset = factories.Dataset()
+        pkg = model.Package.get(dataset["name"])
+
+        helpers.call_action(
+            "package_patch", id=dataset["id"], name="new-name")
+
+        assert model.Package.get(dataset["name"]) is None
+        assert model.Package.get("new-name") is pkg
+
+    def test_purged_objects_are_not_returned(self):
+        dataset = factories.Dataset()
+        assert model.Package.get(dataset["name"])
+
+        helpers.call_action("dataset_purge", id=dataset["id"])
+
+        assert model.Package.get(dataset["name"]) is None
+        assert model.Package.get(dataset["id"]) is None
+
+    def test_detached_objects_are_not_returned(self):
+        user = factories.User()
+        obj = model.User.get(user["name"])
+
+        model.Session.remove()
+
+        assert model.User.get(user["name"]) is not obj
+        assert model.User.get(user["name"]).id == user["id"]
+
+    def test_missing_objects_are_not_cached(self):
+        assert model.Group.get("new-group") is None
+
+        group = factories.Group(name="new-group")
+
+        assert model.Group.get("new-group").id == group["id"]
+
+    def test_for_update_queries_the_database(self):
+        dataset = factories.Dataset()
+        model.Package.get(dataset["id"])
+
+        with _count_statements() as statements:
+            model.Package.get(dataset["id"], for_update=True)
+        assert len(statements) == 1
+
+
+@pytest.mark.usefixtures("clean_db", "clean_index")
+class TestIdentityMapQueryCounts(object):
+    """Number of SQL statements of common requests, with and without
+    the identity map."""
+
+    @staticmethod
+    def _logged_get(model_class, statements, calls):
+        get = model_class.get.__func__
+        from_identity_map = model_class.from_identity_map.__func__
+
+        def logged_get(cls, reference, *args, **kwargs):
+            for_update = args[0] if args else kwargs.get("for_update")
+            cached = bool(reference) and not for_update and \
+                from_identity_map(cls, reference) is not None
+            start = len(statements)
+            obj = get(cls, reference, *args, **kwargs)
+            calls.append(
+                (cls.__name__, reference, cached, len(statements) - start))
+            return obj
+
+        return classmethod(logged_get)
+
+    def _count(self, func, identity_map):
+        """Return the number of statements run by func, and its calls to
+        Package.get and User.get as (class name, reference, found in the
+        identity map, number of statements) tuples."""
+        calls = []
+        with contextlib.ExitStack() as stack:
+            if not identity_map:
+                stack.enter_context(
+                    mock.patch.object(request_cache, "peek", return_value=None))
+            statements = stack.enter_context(_count_statements())
+            for model_class in (model.Package, model.User):
+                stack.enter_context(mock.patch.object(
+                    model_class, "get",
+                    self._logged_get(model_class, statements, calls)))
+            func()
+        return len(statements), calls
+
+    def _assert_saving(self, func):
+        # the first run fills the caches that outlive the request
+        func()
+        without, calls_without = self._count(func, identity_map=False)
+        with_, calls_with = self._count(func, identity_map=True)
+
+        assert [call[:2] for call in calls_with] == [
+            call[:2] for call in calls_without]
+        cached = [i for i, call in enumerate(calls_with) if call[2]]
+        assert cached
+        assert [calls_with[i][3] for i in cached] == [0] * len(cached)
+        # the statements of the lookups found in the identity map are the
+        # only ones saved
+        assert without - with_ == sum(calls_without[i][3] for i in cached)
+        assert with_ < without
+
+    def test_dataset_read(self, app):
+        user = factories.User()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "editor"}])
+        dataset = factories.Dataset(owner_org=org["id"])
+        url = url_for("dataset.read", id=dataset["name"])
+        token = factories.APIToken(user=user["name"])
+        headers = {"Authorization": token["token"]}
+
+        def read():
+            app.get(url, headers=headers)
+
+        self._assert_saving(read)
+
+    def test_package_update(self, test_request_context):
+        org = factories.Organization()
+        dataset = factories.Dataset(owner_org=org["id"])
+        factories.Resource(package_id=dataset["id"])
+        dataset = helpers.call_action("package_show", id=dataset["id"])
+        user = factories.Sysadmin()
+        context = {"user": user["name"], "ignore_auth": False}
+
+        def update():
+            with test_request_context():
+                helpers.call_action(
+                    "package_update", context=dict(context), **dataset)
+
+        self._assert_saving(update)
@@ -15,7 +15,9 @@ from werkzeug.exceptions import BadRequest
 from werkzeug.datastructures import MultiDict
 
 import ckan.model as model
-from ckan.common import json, _, g, request, current_user
+from ckan.common import (
+    json, _, g, config, request, current_user, streaming_response
+)
 from ckan.lib.helpers import url_for
 from ckan.lib.base import render
 from ckan.lib.i18n import get_locales_from_config, get_js_translations_dir
@@ -43,6 +45,11 @@ API_REST_DEFAULT_VERSION = 1
 API_DEFAULT_VERSION = 3
 API_MAX_VERSION = 3
 
+# package_search parameters accepted by the dataset export
+EXPORT_PARAMETERS = (
+    u'q', u'fq', u'sort', u'include_private', u'include_drafts',
+)
+
 api = Blueprint(u'api', __name__, url_prefix=u'/api')
 
 
@@ -461,6 +468,68 @@ def organization_autocomplete(ver: int = API_REST_DEFAULT_VERSION) -> Response:
     return _finish_ok(organization_list)
 
 
+def dataset_export(ver: int = API_REST_DEFAULT_VERSION) -> Response:
+    u'''Streams all the datasets matching a search as newline delimited JSON,
+    one dataset per line.
+
+    Accepts the ``q``, ``fq``, ``sort``, ``include_private`` and
+    ``include_drafts`` parameters of ``package_search``. The datasets are
+    read with a search cursor, :ref:`ckan.search.rows_max` at a time, and
+    written as they are stored in the search index, so exporting the whole
+    catalog takes linear time.
+    '''
+    context: Context = {
+        u'user': current_user.name,
+        u'auth_user_obj': current_user,
+    }
+    data_dict: dict[str, Any] = {
+        key: value for key, value in request.args.items()
+        if key in EXPORT_PARAMETERS}
+    data_dict.update({
+        u'fl': u'validated_data_dict',
+        u'facet': u'false',
+        u'rows': config.get(u'ckan.search.rows_max'),
+        u'cursor': u'*',
+    })
+    package_search = get_action(u'package_search')
+
+    error: dict[str, Any]
+    try:
+        page = package_search(dict(context), dict(data_dict))
+    except NotAuthorized:
+        error = {u'__type': u'Authorization Error',
+                 u'message': _(u'Access denied')}
+        return _finish(403, {u'success': False, u'error': error},
+                       content_type=u'json')
+    except ValidationError as e:
+        error = dict(e.error_dict, __type=u'Validation Error')
+        return _finish(409, {u'success': False, u'error': error},
+                       content_type=u'json')
+    except SearchQueryError as e:
+        error = {u'__type': u'Search Query Error',
+                 u'message': u'Search Query is invalid: %r' % e.args}
+        return _finish(400, {u'success': False, u'error': error},
+                       content_type=u'json')
+    except SearchError as e:
+        error = {u'__type': u'Search Error',
+                 u'message': u'Search error: %r' % e.args}
+        return _finish(409, {u'success': False, u'error': error},
+                       content_type=u'json')
+
+    def lines(page: dict[str, Any]):
+        while True:
+            for result in page[u'results']:
+                if result.get(u'validated_data_dict'):
+                    yield result[u'validated_data_dict'] + u'\n'
+            if not page[u'results'] or not page[u'next_cursor']:
+                return
+            page = package_search(
+                dict(context), dict(data_dict, cursor=page[u'next_cursor']))
+
+    return streaming_response(
+        lines(page), mimetype=u'application/x-ndjson', with_context=True)
+
+
 def snippet(snippet_path: str, ver: int = API_REST_DEFAULT_VERSION) -> str:
     u'''Renders and returns a snippet used by ajax calls
 
@@ -512,6 +581,7 @@ api.add_url_rule(u'/<int(min=3, max={0}):ver>/action/<logic_function>'.format(
 
 util_rules: list[tuple[str, Callable[..., Union[str, Response]]]] = [
     (u'/util/dataset/autocomplete', dataset_autocomplete),
+    (u'/util/dataset/export', dataset_export),
     (u'/util/user/autocomplete', user_autocomplete),
     (u'/util/tag/autocomplete', tag_autocomplete),
     (u'/util/group/autocomplete', group_autocomplete),
@@ -2,8 +2,11 @@
 from __future__ import annotations
 
 import cgi
+import datetime
 import json
 import logging
+import mimetypes
+import os
 from typing import Any, Optional, Union
 
 from werkzeug.wrappers.response import Response as WerkzeugResponse
@@ -167,7 +170,13 @@ def download(package_type: str,
     if rsc.get(u'url_type') == u'upload':
         upload = uploader.get_resource_uploader(rsc)
         filepath = upload.get_path(rsc[u'id'])
-        resp = flask.send_file(filepath, download_name=filename)
+        # the checksum computed while the file was uploaded is a strong
+        # validator for conditional and range requests
+        etag = rsc.get(u'hash') or True
+        resp = _offload_download(filepath, filename, etag)
+        if resp is None:
+            resp = flask.send_file(
+                filepath, download_name=filename, etag=etag)
 
         if rsc.get('mimetype'):
             resp.headers['Content-Type'] = rsc['mimetype']
@@ -179,6 +188,177 @@ def download(package_type: str,
     return h.redirect_to(rsc[u'url'])
 
 
+def _offload_download(
+        filepath: str, filename: Optional[str],
+        etag: Union[str, bool]) -> Optional[Response]:
+    """Build a response that delegates the file transfer to the web server.
+
+    Returns ``None`` if offloading is disabled or the file is not located
+    inside the storage path, in which case it should be served by CKAN.
+    """
+    mode = config.get(u'ckan.download.offload')
+    storage_path = uploader.get_storage_path()
+    if mode == u'none' or not storage_path:
+        return None
+
+    filepath = os.path.realpath(filepath)
+    relpath = os.path.relpath(filepath, os.path.realpath(storage_path))
+    if relpath.startswith(os.pardir) or not os.path.isfile(filepath):
+        return None
+
+    resp = flask.make_response(u'')
+    if mode == u'x-sendfile':
+        resp.headers[u'X-Sendfile'] = filepath
+    else:
+        prefix = config.get(u'ckan.download.x_accel_redirect_prefix')
+        resp.headers[u'X-Accel-Redirect'] = (
+            prefix.rstrip(u'/') + u'/' + relpath.replace(os.sep, u'/'))
+
+    resp.content_type = (
+        mimetypes.guess_type(filename or filepath)[0]
+        or u'application/octet-stream')
+    if filename:
+        resp.headers.set(u'Content-Disposition', u'inline', filename=filename)
+    if isinstance(etag, str):
+        resp.set_etag(etag)
+    return resp
+
+
+def _chunked_upload_prepare(
+        resource_id: str) -> tuple[Context, uploader.ResourceUpload]:
+    context: Context = {
+        u'user': current_user.name,
+        u'auth_user_obj': current_user
+    }
+    check_access(u'resource_update', context, {u'id': resource_id})
+    rsc = get_action(u'resource_show')(context, {u'id': resource_id})
+    upload = uploader.get_resource_uploader(rsc)
+    if not isinstance(upload, uploader.ResourceUpload):
+        raise ValidationError({
+            u'upload': [u'Chunked uploads are not supported']
+        })
+    return context, upload
+
+
+def _chunked_upload_error(
+        status: int, message: str,
+        errors: Optional[dict[str, Any]] = None) -> Response:
+    body: dict[str, Any] = {u'message': message}
+    if errors:
+        body[u'errors'] = errors
+    resp = flask.jsonify(body)
+    resp.status_code = status
+    return resp
+
+
+class ChunkedUploadView(MethodView):
+    u"""Upload the file of a resource in several requests.
+
+    ``POST /<resource_id>/upload`` starts an upload, accepting ``filename``
+    and optionally the total ``size`` and the ``sha256`` checksum of the
+    file. The response includes the ``upload_id``.
+
+    ``PUT /<resource_id>/upload/<upload_id>?offset=N`` writes the raw
+    request body as a part starting at byte ``N``, and ``GET`` on the same
+    URL returns the ``offset`` where the next part must start, so an
+    interrupted upload can be resumed.
+
+    ``POST /<resource_id>/upload/<upload_id>`` verifies the checksum and
+    attaches the file to the resource, and ``DELETE`` discards it.
+
+    Parts are written directly next to the final location of the file,
+    without being spooled by the web framework.
+    """
+
+    def _dispatch(self, method: Any, *args: Any) -> Response:
+        try:
+            context, upload = _chunked_upload_prepare(args[0])
+            return method(context, upload, *args)
+        except NotAuthorized:
+            return _chunked_upload_error(
+                403, _(u'Unauthorized to update resource'))
+        except NotFound:
+            return _chunked_upload_error(404, _(u'Upload not found'))
+        except ValidationError as e:
+            return _chunked_upload_error(
+                400, _(u'Invalid upload'), e.error_dict)
+
+    def get(self, package_type: str, id: str, resource_id: str,
+            upload_id: str) -> Response:
+        return self._dispatch(self._status, resource_id, upload_id)
+
+    def post(self, package_type: str, id: str, resource_id: str,
+             upload_id: Optional[str] = None) -> Response:
+        if upload_id is None:
+            return self._dispatch(self._init, resource_id)
+        return self._dispatch(self._complete, resource_id, upload_id)
+
+    def put(self, package_type: str, id: str, resource_id: str,
+            upload_id: str) -> Response:
+        return self._dispatch(self._write, resource_id, upload_id)
+
+    def delete(self, package_type: str, id: str, resource_id: str,
+               upload_id: str) -> Response:
+        return self._dispatch(self._abort, resource_id, upload_id)
+
+    def _init(self, context: Context, upload: uploader.ResourceUpload,
+              resource_id: str) -> Response:
+        data = request.get_json(silent=True) or request.form
+        filename = data.get(u'filename')
+        if not filename:
+            raise ValidationError({u'filename': [_(u'Missing value')]})
+        try:
+            size = int(data[u'size']) if data.get(u'size') else None
+        except ValueError:
+            raise ValidationError({u'size': [_(u'Invalid integer')]})
+        info = upload.init_part_upload(
+            resource_id, filename, size, data.get(u'sha256'),
+            uploader.get_max_resource_size())
+        resp = flask.jsonify(info)
+        resp.status_code = 201
+        return resp
+
+    def _status(self, context: Context, upload: uploader.ResourceUpload,
+                resource_id: str, upload_id: str) -> Response:
+        return flask.jsonify(upload.get_part_upload(resource_id, upload_id))
+
+    def _write(self, context: Context, upload: uploader.ResourceUpload,
+               resource_id: str, upload_id: str) -> Response:
+        # without an offset a part would overwrite the data received
+        if not request.args.get(u'offset'):
+            raise ValidationError({u'offset': [_(u'Missing value')]})
+        try:
+            offset = int(request.args[u'offset'])
+        except ValueError:
+            raise ValidationError({u'offset': [_(u'Invalid integer')]})
+        info = upload.write_part(
+            resource_id, upload_id, request.stream, offset,
+            uploader.get_max_resource_size())
+        return flask.jsonify(info)
+
+    def _complete(self, context: Context, upload: uploader.ResourceUpload,
+                  resource_id: str, upload_id: str) -> Response:
+        data = request.get_json(silent=True) or request.form
+        upload.complete_part_upload(
+            resource_id, upload_id, data.get(u'sha256'))
+        rsc = get_action(u'resource_patch')(context, {
+            u'id': resource_id,
+            u'url': upload.filename,
+            u'url_type': u'upload',
+            u'size': upload.filesize,
+            u'mimetype': upload.mimetype,
+            u'hash': upload.checksum,
+            u'last_modified': datetime.datetime.utcnow().isoformat(),
+        })
+        return flask.jsonify(rsc)
+
+    def _abort(self, context: Context, upload: uploader.ResourceUpload,
+               resource_id: str, upload_id: str) -> Response:
+        upload.get_part_upload(resource_id, upload_id)
+        upload.abort_part_upload(resource_id, upload_id)
+        return flask.jsonify({u'upload_id': upload_id})
+
+
 class CreateView(MethodView):
     def post(self, package_type: str, id: str) -> Union[str, Response]:
         save_action = request.form.get(u'save')
@@ -796,6 +976,13 @@ def register_dataset_plugin_rules(blueprint: Blueprint) -> None:
     )
 
     blueprint.add_url_rule(u'/<resource_id>/download', view_func=download)
+    chunked_upload = ChunkedUploadView.as_view(str(u'chunked_upload'))
+    blueprint.add_url_rule(
+        u'/<resource_id>/upload', view_func=chunked_upload,
+        methods=[u'POST'])
+    blueprint.add_url_rule(
+        u'/<resource_id>/upload/<upload_id>', view_func=chunked_upload,
+        methods=[u'GET', u'PUT', u'POST', u'DELETE'])
     blueprint.add_url_rule(u'/<resource_id>/views', view_func=views)
     blueprint.add_url_rule(u'/<resource_id>/view', view_func=view)
     blueprint.add_url_rule(u'/<resource_id>/view/<view_id>', view_func=view)
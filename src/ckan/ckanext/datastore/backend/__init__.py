@@ -4,7 +4,7 @@ from __future__ import annotations
 from ckan.types import Context
 import re
 import logging
-from typing import Any, Container
+from typing import Any, Container, Optional
 
 import ckan.plugins as plugins
 from ckan.common import CKANConfig, config
@@ -233,3 +233,19 @@ class DatastoreBackend:
 
     def resource_plugin_data(self, resource_id: str) -> dict[str, Any]:
         raise NotImplementedError()
+
+    def table_write_count(self, resource_id: str) -> Optional[int]:
+        """Return a number that changes when records of the resource's
+        table are inserted, updated or deleted, including by writes that
+        don't go through the DataStore actions, or None if the backend
+        can't tell.
+        """
+        return None
+
+    def finish_bulk_load(self, resource_id: str) -> None:
+        """Called by `datastore_create` and `datastore_upsert` actions when
+        `calculate_record_count` marks the last request of a load started
+        with `bulk_load`. Backends without a bulk load mode have nothing to
+        do.
+        """
+        pass
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import base64
+import csv
 import itertools
+import re
+import threading
 
 from typing_extensions import TypeAlias
 
@@ -11,6 +15,7 @@ from ckan.types import Context, ErrorDict
 import copy
 import logging
 import sys
+import time
 from typing import (
     Any, Callable, Container, Dict, Iterable, Optional, Set, Union,
     cast)
@@ -56,6 +61,13 @@ log = logging.getLogger(__name__)
 _pg_types: dict[str, str] = {}
 _type_names: Set[str] = set()
 _engines: Dict[str, Engine] = {}
+# time, in seconds, spent preparing the datastore when the process started
+startup_timings: dict[str, float] = {}
+# tables and functions used by datastore_search_sql statements, keyed by
+# DataStore schema version and statement, see _get_sql_names
+_sql_names: 'OrderedDict[tuple[int, str], tuple[list[str], list[str]]]' = \
+    OrderedDict()
+_sql_names_lock = threading.Lock()
 WhereClauses: TypeAlias = "list[tuple[str, dict[str, Any]] | tuple[str]]"
 
 _TIMEOUT = 60000  # milliseconds
@@ -134,18 +146,42 @@ def _get_engine_from_url(connection_url: str, **kwargs: Any) -> Engine:
         engine = sa.engine_from_config(config,
                                        'ckan.datastore.sqlalchemy.',
                                        **extras)
+        sa.event.listen(engine, 'connect', _on_connect)
         _engines[connection_url] = engine
 
+    return engine
+
+
+def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    '''Prepare every new connection of the datastore engines.'''
     # don't automatically convert to python objects
     # when using native json types in 9.2+
     # http://initd.org/psycopg/docs/extras.html#adapt-json
     _loads: Callable[[Any], Any] = lambda x: x
     register_default_json(
-        conn_or_curs=engine.raw_connection().connection,  # type: ignore
+        conn_or_curs=dbapi_connection,
         globally=False,
         loads=_loads)
 
-    return engine
+    if not _pg_types:
+        _load_types(dbapi_connection)
+    if 'nested' in _type_names:
+        register_composite('nested', dbapi_connection)
+
+
+def _load_types(dbapi_connection: Any) -> None:
+    '''Cache the names of all the types of the database, by oid.'''
+    start = time.monotonic()
+    with dbapi_connection.cursor() as cursor:
+        cursor.execute('SELECT oid, typname FROM pg_type;')
+        for oid, typname in cursor:
+            _pg_types[oid] = typname
+            _type_names.add(typname)
+    # don't leave a transaction open on a connection about to be pooled
+    dbapi_connection.rollback()
+    startup_timings['load_types'] = time.monotonic() - start
+    log.debug('Loaded %d datastore types in %.3fs',
+              len(_pg_types), startup_timings['load_types'])
 
 
 def _dispose_engines():
@@ -218,6 +254,17 @@ def _result_fields(fields_types: 'OrderedDict[str, str]',
 
 def _get_type(engine: Engine, oid: str) -> str:
     _cache_types(engine)
+    if oid not in _pg_types:
+        # type created after the cache was loaded, only look this one up
+        with engine.connect() as conn:
+            typname = conn.execute(
+                sa.text('SELECT typname FROM pg_type WHERE oid = :oid'),
+                {'oid': oid}
+            ).scalar()
+        if typname is None:
+            raise KeyError(oid)
+        _pg_types[oid] = typname
+        _type_names.add(typname)
     return _pg_types[oid]
 
 
@@ -345,32 +392,29 @@ def _get_fields(connection: Any, resource_id: str):
 
 def _cache_types(engine: Engine) -> None:
     if not _pg_types:
+        # types are loaded by the first connection of the process
+        with engine.connect() as conn:
+            if not _pg_types:
+                _load_types(conn.connection.connection)
+    if 'nested' not in _type_names:
         with engine.begin() as conn:
-            results = conn.execute(sa.text(
-                'SELECT oid, typname FROM pg_type;'
-            ))
-        for result in results:
-            _pg_types[result[0]] = result[1]
-            _type_names.add(result[1])
-        if 'nested' not in _type_names:
-            with engine.begin() as conn:
-                native_json = _pg_version_is_at_least(conn, '9.2')
-
-            log.info("Create nested type. Native JSON: {0!r}".format(
-                native_json))
+            native_json = _pg_version_is_at_least(conn, '9.2')
 
-            backend = DatastorePostgresqlBackend.get_active_backend()
-            write_engine: Engine = backend._get_write_engine()  # type: ignore
-            with write_engine.begin() as write_connection:
-                write_connection.execute(sa.text(
-                    'CREATE TYPE "nested" AS (json {0}, extra text)'.format(
-                        'json' if native_json else 'text')))
-            _pg_types.clear()
+        log.info("Create nested type. Native JSON: {0!r}".format(
+            native_json))
 
-            # redo cache types with json now available.
-            return _cache_types(engine)
+        backend = DatastorePostgresqlBackend.get_active_backend()
+        write_engine: Engine = backend._get_write_engine()  # type: ignore
+        with write_engine.begin() as write_connection:
+            write_connection.execute(sa.text(
+                'CREATE TYPE "nested" AS (json {0}, extra text)'.format(
+                    'json' if native_json else 'text')))
 
+        # redo cache types with nested now available, and register it for
+        # the connections that were opened before it existed
         with engine.connect() as conn:
+            _pg_types.clear()
+            _load_types(conn.connection.connection)
             register_composite(
                 'nested',
                 conn.connection.connection,
@@ -606,6 +650,110 @@ def _sort(sort: Union[None, str, list[str]], fields_types: Container[str],
     return clause_parsed
 
 
+def _keyset(sort: Union[None, str, list[str]],
+            fields_types: Container[str]) -> list[tuple[str, bool, bool]]:
+    u'''
+    :param sort: string or list sort parameter passed to datastore_search,
+        use None if not given
+    :param fields_types: OrderedDict returned from _get_fields_types(..)
+
+    returns the columns that order the records for cursor pagination as
+    (field, descending, nulls_first) tuples. The unique _id column is
+    added as the last key so every record has a distinct position.
+    '''
+    keys: list[tuple[str, bool, bool]] = []
+    for clause in datastore_helpers.get_list(sort, False) or []:
+        parsed = _parse_sort_clause(clause, fields_types)
+        if not parsed:
+            continue
+        field, direction = parsed
+        descending = direction.startswith('desc')
+        nulls = re.search('nulls +(first|last)', direction)
+        # without an explicit NULLS clause PostgreSQL puts nulls first
+        # only for descending order
+        nulls_first = nulls.group(1) == 'first' if nulls else descending
+        keys.append((field, descending, nulls_first))
+        if field == '_id':
+            return keys
+    keys.append(('_id', False, False))
+    return keys
+
+
+def _keyset_sort(keys: list[tuple[str, bool, bool]]) -> list[str]:
+    return [
+        u'{0} {1} {2}'.format(
+            identifier(field),
+            u'DESC' if descending else u'ASC',
+            u'NULLS FIRST' if nulls_first else u'NULLS LAST')
+        for field, descending, nulls_first in keys]
+
+
+def _encode_cursor(keys: list[tuple[str, bool, bool]], values: str) -> str:
+    u'''
+    returns an opaque cursor for the record with the key values given as
+    a JSON array string
+    '''
+    payload = u'{{"k": {0}, "v": {1}}}'.format(json.dumps(keys), values)
+    return base64.urlsafe_b64encode(
+        payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str,
+                   keys: list[tuple[str, bool, bool]]) -> list[Any]:
+    u'''
+    returns the key values stored in a cursor created by _encode_cursor
+    for the same sort order
+    '''
+    try:
+        payload = json.loads(
+            base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)),
+            parse_float=decimal.Decimal)
+        cursor_keys = [tuple(k) for k in payload['k']]
+        values = payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': [u'Invalid cursor']})
+    if cursor_keys != keys or len(values) != len(keys):
+        raise ValidationError({
+            'cursor': [u'Cursor does not match the sort parameter']})
+    return values
+
+
+def _keyset_where(keys: list[tuple[str, bool, bool]], values: list[Any],
+                  fields_types: dict[str, str]) -> tuple[str, dict[str, Any]]:
+    u'''
+    returns a where clause and its values matching only the records that
+    come after the record with the key values given, in keys order
+    '''
+    after: list[str] = []
+    equal: list[str] = []
+    params: dict[str, Any] = {}
+    for i, ((field, descending, nulls_first), value) in enumerate(
+            zip(keys, values)):
+        column = identifier(field)
+        if value is None:
+            # nulls come first: any value is after, otherwise nothing is
+            following = u'{0} IS NOT NULL'.format(column) if nulls_first \
+                else None
+            same = u'{0} IS NULL'.format(column)
+        else:
+            placeholder = u'cursor_{0}'.format(i)
+            params[placeholder] = value
+            typed = u'CAST(:{0} AS {1})'.format(
+                placeholder, identifier(fields_types[field]))
+            following = u'{0} {1} {2}'.format(
+                column, u'<' if descending else u'>', typed)
+            if not nulls_first:
+                following = u'{0} OR {1} IS NULL'.format(following, column)
+            same = u'{0} = {1}'.format(column, typed)
+        if following:
+            after.append(u' AND '.join(
+                equal + [u'({0})'.format(following)]))
+        equal.append(same)
+    if not after:
+        return u'false', params
+    return u' OR '.join(u'({0})'.format(a) for a in after), params
+
+
 def _ts_query_alias(field: Optional[str] = None):
     query_alias = u'query'
     if field:
@@ -767,6 +915,34 @@ def _get_index_names(connection: Any, resource_id: str):
     return [result[0] for result in results]
 
 
+def _get_invalid_index_names(connection: Any, resource_id: str):
+    '''Names of the indexes of the table that can't be used, because they
+    are being built concurrently or their concurrent build failed'''
+    sql = sa.text("""
+        SELECT i.relname
+        FROM pg_index idx
+        JOIN pg_class i ON i.oid = idx.indexrelid
+        WHERE idx.indrelid = CAST(:table AS regclass)
+            AND NOT idx.indisvalid
+        """)
+    return [row[0] for row in connection.execute(
+        sql, {"table": identifier(resource_id)})]
+
+
+def _get_failed_index_names(connection: Any, resource_id: str):
+    '''Names of the invalid indexes of the table, unless an index is being
+    built concurrently on it'''
+    invalid = _get_invalid_index_names(connection, resource_id)
+    if invalid and connection.scalar(sa.text(
+            u'''SELECT 1 FROM pg_locks
+            WHERE relation = CAST(:table AS regclass) AND granted
+                AND mode = 'ShareUpdateExclusiveLock' '''),
+            {'table': identifier(resource_id)}):
+        # concurrent builds hold this lock on the table until they are done
+        return []
+    return invalid
+
+
 def _is_valid_pg_type(context: Context, type_name: str):
     if type_name in _type_names:
         return True
@@ -843,6 +1019,62 @@ def _insert_links(data_dict: dict[str, Any], limit: int, offset: int):
         data_dict['_links']['prev'] = urlunparse(parsed_prev)
 
 
+def _insert_cursor_links(data_dict: dict[str, Any]):
+    '''Adds link to the start and, if there are more records, to the next
+    part (same limit, cursor=next_cursor) for cursor pagination.'''
+    data_dict['_links'] = {}
+
+    try:
+        urlstring = toolkit.request.environ['CKAN_CURRENT_URL']
+    except (KeyError, TypeError, RuntimeError):
+        return  # no links required for local actions
+
+    parsed = list(urlparse(urlstring))
+    arguments = dict(parse_qsl(parsed[4]))
+    arguments.pop('offset', None)
+
+    arguments['cursor'] = ''
+    parsed[4] = urlencode(arguments)
+    data_dict['_links']['start'] = urlunparse(parsed)
+    if data_dict.get('next_cursor'):
+        arguments['cursor'] = data_dict['next_cursor']
+        parsed[4] = urlencode(arguments)
+        data_dict['_links']['next'] = urlunparse(parsed)
+
+
+def _next_cursor(
+        context: Context, keys: list[tuple[str, bool, bool]],
+        resource_id: str, ts_query: str, where_clause: str,
+        where_values: list[dict[str, Any]], sort_clause: str,
+        limit: int) -> Optional[str]:
+    '''Return the cursor for the part following the current one, or None
+    when there are no more records. Only used for the csv and tsv formats,
+    for the others the cursor is returned by the query of the records.'''
+    if not limit:
+        return None
+    # the cursor is built from the last record returned, only if there is
+    # at least one more after it
+    sql_string = u'''
+        SELECT json_build_array({keys})::text, count(*) OVER ()
+        FROM (
+            SELECT * FROM {resource} {ts_query}
+            {where} {sort} LIMIT {limit}
+        ) AS z
+        {sort} OFFSET {offset} LIMIT 1'''.format(
+        keys=u', '.join(identifier(field) for field, _d, _n in keys),
+        resource=identifier(resource_id),
+        ts_query=ts_query,
+        where=where_clause,
+        sort=sort_clause,
+        limit=int(limit) + 1,
+        offset=int(limit) - 1)
+    rows = _execute_single_statement(
+        context, sql_string, where_values).fetchall()
+    if not rows or rows[0][1] <= int(limit):
+        return None
+    return _encode_cursor(keys, rows[0][0])
+
+
 def _where(
         where_clauses_and_values: WhereClauses
 ) -> tuple[str, list[dict[str, Any]]]:
@@ -926,7 +1158,8 @@ def create_indexes(context: Context, data_dict: dict[str, Any]):
 
     fts_indexes, fts_noindexes = _build_fts_indexes(
         data_dict, sql_index_string_method, fields)
-    sql_index_strings = sql_index_strings + fts_indexes
+    if not data_dict.get('bulk_load'):
+        sql_index_strings = sql_index_strings + fts_indexes
 
     if indexes is not None:
         _drop_indexes(context, data_dict, False)
@@ -967,7 +1200,9 @@ def create_indexes(context: Context, data_dict: dict[str, Any]):
                                        data_dict['resource_id'])
 
     for fts_idx in current_indexes:
-        if fts_idx in fts_noindexes:
+        # full-text indexes are built once a bulk load is finished
+        if fts_idx in fts_noindexes or data_dict.get('bulk_load') and any(
+                fts_idx in fts_index for fts_index in fts_indexes):
             connection.execute(sa.text(
                 'DROP INDEX {0} CASCADE'.format(sa.column(fts_idx))))
     for sql_index_string in sql_index_strings:
@@ -1442,6 +1677,11 @@ def search_data(context: Context, data_dict: dict[str, Any]):
                                              fields_types, query_dict)
 
     where_clause, where_values = _where(query_dict['where'])
+    # the cursor only restricts the records returned, not the total
+    page_where_clause, page_where_values = _where(
+        query_dict['where'] + (
+            [query_dict['cursor_where']] if 'cursor_where' in query_dict
+            else []))
 
     # FIXME: Remove duplicates on select columns
     select_columns = ', '.join(query_dict['select'])
@@ -1465,7 +1705,40 @@ def search_data(context: Context, data_dict: dict[str, Any]):
         sort_clause = ''
 
     records_format = data_dict['records_format']
-    if records_format == u'objects':
+    cursor_keys = query_dict.get('cursor_keys')
+    next_cursor = None
+    # with a cursor one more record than requested is fetched: the cursor
+    # for the next part is built from the last record returned, only if
+    # that one follows it
+    cursor_page_fmt = u'''
+        FROM (
+            SELECT *, json_build_array({keys})::text AS "_cursor_keys",
+                row_number() OVER ({sort}) AS "_cursor_row"
+            FROM (
+                SELECT * FROM {resource} {ts_query}
+                {where} {sort} LIMIT {next_limit}
+            ) AS z
+        ) AS z'''
+    cursor_next_fmt = u'''
+        CASE WHEN count(*) > {limit} THEN min(z."_cursor_keys")
+            FILTER (WHERE z."_cursor_row" = {limit}) END'''
+    if cursor_keys and records_format == u'objects':
+        sql_fmt = u'''
+            SELECT array_to_json(array_agg(j ORDER BY z."_cursor_row")
+                    FILTER (WHERE z."_cursor_row" <= {limit}))::text,
+                ''' + cursor_next_fmt + cursor_page_fmt + u'''
+            CROSS JOIN LATERAL (SELECT {select}) AS j'''
+    elif cursor_keys and records_format == u'lists':
+        select_columns = u" || ',' || ".join(
+            s for s in query_dict['select']
+        )
+        sql_fmt = u'''
+            SELECT '[' || array_to_string(
+                    array_agg(j.v ORDER BY z."_cursor_row")
+                    FILTER (WHERE z."_cursor_row" <= {limit}), ',') || ']',
+                ''' + cursor_next_fmt + cursor_page_fmt + u'''
+            CROSS JOIN LATERAL (SELECT '[' || {select} || ']' v) AS j'''
+    elif records_format == u'objects':
         sql_fmt = u'''
             SELECT array_to_json(array_agg(j))::text FROM (
                 SELECT {distinct} {select}
@@ -1511,18 +1784,29 @@ def search_data(context: Context, data_dict: dict[str, Any]):
         select=select_columns,
         resource=identifier(resource_id),
         ts_query=ts_query,
-        where=where_clause,
+        where=page_where_clause,
         sort=sort_clause,
         limit=limit,
-        offset=offset)
+        offset=offset,
+        keys=u', '.join(
+            identifier(field) for field, _d, _n in cursor_keys or []),
+        next_limit=int(limit) + 1)
     if records_format == u'csv' or records_format == u'tsv':
         buf = StringIO()
         _execute_single_statement_copy_to(
-            context, sql_string, where_values, buf)
+            context, sql_string, page_where_values, buf)
         records = buf.getvalue()
+        if cursor_keys:
+            # COPY only returns the records
+            next_cursor = _next_cursor(
+                context, cursor_keys, resource_id, ts_query,
+                page_where_clause, page_where_values, sort_clause, limit)
     else:
-        v = list(_execute_single_statement(
-            context, sql_string, where_values))[0][0]
+        row = list(_execute_single_statement(
+            context, sql_string, page_where_values))[0]
+        v = row[0]
+        if cursor_keys and row[1]:
+            next_cursor = _encode_cursor(cursor_keys, row[1])
         if v is None or v == '[]':
             records = []
         elif 'api_version' in context:
@@ -1540,7 +1824,11 @@ def search_data(context: Context, data_dict: dict[str, Any]):
 
     _unrename_json_field(data_dict)
 
-    _insert_links(data_dict, limit, offset)
+    if cursor_keys:
+        data_dict['next_cursor'] = next_cursor
+        _insert_cursor_links(data_dict)
+    else:
+        _insert_links(data_dict, limit, offset)
 
     if data_dict.get('include_total', True):
         total_estimation_threshold = \
@@ -1616,25 +1904,54 @@ def _execute_single_statement_copy_to(
     cursor.close()
 
 
-def format_results(context: Context, results: Any, data_dict: dict[str, Any]):
+def format_results(context: Context, results: Any, data_dict: dict[str, Any],
+                   rows_max: Optional[int] = None):
+    '''Convert the rows of results to the requested records_format while
+    they are fetched, stopping after rows_max rows and raising a
+    ValidationError as soon as the records grow larger than
+    ckan.datastore.sqlsearch.max_result_bytes.'''
     result_fields: list[dict[str, Any]] = []
     for field in results.cursor.description:
         result_fields.append({
             'id': str(field[0]),
             'type': _get_type(context['connection'].engine, field[1])
         })
-
-    records = []
-
-    for row in results:
-        converted_row = {}
-        for field in result_fields:
-            converted_row[field['id']] = convert(
-                row._mapping[field['id']], field['type'])
-        records.append(converted_row)
-    data_dict['records'] = records
-    if data_dict.get('records_truncated', False):
-        data_dict['records'].pop()
+    field_ids = [field['id'] for field in result_fields]
+    field_types = [field['type'] for field in result_fields]
+
+    records_format = data_dict.get('records_format', 'objects')
+    max_bytes = config.get('ckan.datastore.sqlsearch.max_result_bytes')
+    size = 0
+    records: list[Any] = []
+    buf = StringIO()
+    writer = csv.writer(
+        buf, delimiter='\t' if records_format == 'tsv' else ',')
+
+    for count, row in enumerate(results, 1):
+        if rows_max is not None and count > rows_max:
+            data_dict['records_truncated'] = True
+            break
+        values = [convert(value, typ) for value, typ in zip(row, field_types)]
+        if records_format in ('csv', 'tsv'):
+            writer.writerow([
+                json.dumps(v) if isinstance(v, (list, dict)) else v
+                for v in values])
+            size = buf.tell()
+        else:
+            record = values if records_format == 'lists' \
+                else dict(zip(field_ids, values))
+            records.append(record)
+            if max_bytes:
+                size += len(msgspec.json.encode(record))
+        if max_bytes and size > max_bytes:
+            raise ValidationError({'query': [
+                'Query results are larger than {0} bytes'.format(max_bytes)
+            ]})
+
+    if records_format in ('csv', 'tsv'):
+        data_dict['records'] = buf.getvalue()
+    else:
+        data_dict['records'] = records
     data_dict['fields'] = result_fields
 
     return _unrename_json_field(data_dict)
@@ -1713,6 +2030,89 @@ def _create_fulltext_trigger(connection: Any, resource_id: str):
             table=identifier(resource_id))))
 
 
+def _set_fulltext_trigger(connection: Any, resource_id: str, enabled: bool):
+    connection.execute(sa.text(
+        u'ALTER TABLE {table} {action} TRIGGER zfulltext'.format(
+            table=identifier(resource_id),
+            action=u'ENABLE' if enabled else u'DISABLE')))
+
+
+def _is_bulk_loading(connection: Any, resource_id: str) -> bool:
+    '''True while the full-text trigger of the table is disabled by a bulk
+    load that hasn't been finished yet'''
+    return bool(connection.scalar(sa.text(
+        u'''SELECT 1 FROM pg_trigger
+        WHERE tgrelid = CAST(:table AS regclass) AND tgname = 'zfulltext'
+            AND tgenabled = 'D' '''), {'table': identifier(resource_id)}))
+
+
+def finish_bulk_load(resource_id: str):
+    '''Compute _full_text again for all the records of the table with a
+    single UPDATE, enable the full-text trigger again and build the
+    full-text indexes without blocking writes to the table.
+
+    Full-text indexes left invalid by a failed concurrent build are built
+    again.
+    '''
+    engine = get_write_engine()
+    with engine.begin() as conn:
+        if _is_bulk_loading(conn, resource_id):
+            # enabling the trigger locks out writes until the update is
+            # committed, so no record is left with stale _full_text. All the
+            # records are updated, as any writer may have changed them
+            # while the trigger was disabled
+            _set_fulltext_trigger(conn, resource_id, True)
+            conn.execute(sa.text(
+                u'''UPDATE {table} AS t SET _full_text = (
+                    SELECT to_tsvector(string_agg(value, ' '))
+                    FROM json_each_text(row_to_json(t.*))
+                    WHERE key NOT LIKE '\\_%')'''.format(
+                    table=identifier(resource_id))))
+        fields = _get_fields(conn, resource_id)
+        current_indexes = _get_index_names(conn, resource_id)
+        failed_indexes = _get_failed_index_names(conn, resource_id)
+
+    fts_indexes, _noindexes = _build_fts_indexes(
+        {'resource_id': resource_id},
+        u'CREATE {unique} INDEX CONCURRENTLY "{name}" ON "{res_id}" '
+        u'USING {method}({fields})',
+        fields)
+    # concurrent index builds can't run inside a transaction
+    with engine.connect().execution_options(
+            isolation_level='AUTOCOMMIT') as conn:
+        for sql_index_string in fts_indexes:
+            failed = [c for c in failed_indexes if c in sql_index_string]
+            for index_name in failed:
+                conn.execute(sa.text(
+                    u'DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(
+                        identifier(index_name))))
+            if failed or not any(
+                    c in sql_index_string for c in current_indexes):
+                conn.execute(sa.text(sql_index_string))
+
+
+def _full_text_status(connection: Any, resource_id: str) -> dict[str, Any]:
+    '''Return the state of the full-text search data of the table: loading
+    while a bulk load is unfinished, indexing while full-text indexes are
+    being built concurrently (with the progress reported by PostgreSQL, if
+    the role of the connection can see it), failed if a concurrent build
+    left an invalid index, or ready.'''
+    if _is_bulk_loading(connection, resource_id):
+        return {'state': 'loading'}
+    building = connection.execute(sa.text(
+        u'''SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total
+        FROM pg_stat_progress_create_index
+        WHERE relid = CAST(:table AS regclass)'''),
+        {'table': identifier(resource_id)}).fetchone()
+    if building:
+        return dict(building._mapping, state='indexing')
+    if _get_failed_index_names(connection, resource_id):
+        return {'state': 'failed'}
+    if _get_invalid_index_names(connection, resource_id):
+        return {'state': 'indexing'}
+    return {'state': 'ready'}
+
+
 def upsert(context: Context, data_dict: dict[str, Any]):
     '''
     This method combines upsert insert and update on the datastore. The method
@@ -1796,6 +2196,29 @@ def search(context: Context, data_dict: dict[str, Any]):
         context['connection'].close()
 
 
+def _get_sql_names(context: Context, sql: str):
+    '''Return the table and function names used by sql, reusing the result
+    of parsing the same statement before unless DataStore tables or aliases
+    were created, changed or dropped since.'''
+    get_names = datastore_helpers.get_table_and_function_names_from_sql
+    cache_size = config.get('ckan.datastore.sqlsearch.parse_cache_size')
+    if not cache_size:
+        return get_names(context, sql)
+
+    key = (datastore_helpers.get_schema_version(), sql)
+    with _sql_names_lock:
+        names = _sql_names.get(key)
+        if names is not None:
+            _sql_names.move_to_end(key)
+    if names is None:
+        names = get_names(context, sql)
+        with _sql_names_lock:
+            _sql_names[key] = names
+            while len(_sql_names) > cache_size:
+                _sql_names.popitem(last=False)
+    return list(names[0]), list(names[1])
+
+
 def search_sql(context: Context, data_dict: dict[str, Any]):
     backend = DatastorePostgresqlBackend.get_active_backend()
     engine = backend._get_read_engine()  # type: ignore
@@ -1817,8 +2240,7 @@ def search_sql(context: Context, data_dict: dict[str, Any]):
             f"SET LOCAL statement_timeout TO {timeout}"
         ))
 
-        get_names = datastore_helpers.get_table_and_function_names_from_sql
-        table_names, function_names = get_names(context, sql)
+        table_names, function_names = _get_sql_names(context, sql)
         log.debug('Tables involved in input SQL: {0!r}'.format(table_names))
         log.debug('Functions involved in input SQL: {0!r}'.format(
             function_names))
@@ -1839,12 +2261,12 @@ def search_sql(context: Context, data_dict: dict[str, Any]):
                     'Not authorized to call function {}'.format(f)
                 )
 
-        results: Any = context['connection'].execute(sa.text(sql))
-
-        if results.rowcount == rows_max + 1:
-            data_dict['records_truncated'] = True
+        # use a server side cursor, so rows are converted as they arrive
+        # instead of holding the whole result set in memory
+        results: Any = context['connection'].execution_options(
+            stream_results=True).execute(sa.text(sql))
 
-        return format_results(context, results, data_dict)
+        return format_results(context, results, data_dict, rows_max)
 
     except ProgrammingError as e:
         if e.orig.pgcode == _PG_ERR_CODE['permission_denied']:
@@ -2029,6 +2451,19 @@ class DatastorePostgresqlBackend(DatastoreBackend):
         else:
             self._check_urls_and_permissions()
 
+        self._warm_up()
+
+    def _warm_up(self):
+        '''Open a first connection, which loads the database types, so
+        the first request using the datastore doesn't have to.'''
+        start = time.monotonic()
+        with self._get_read_engine().connect():
+            pass
+        startup_timings['warm_up'] = time.monotonic() - start
+        log.info('Datastore ready in %.3fs (types loaded in %.3fs)',
+                 startup_timings['warm_up'],
+                 startup_timings.get('load_types', 0))
+
     def datastore_delete(
             self, context: Context, data_dict: dict[str, Any],  # noqa
             fields_types: dict[str, Any], query_dict: dict[str, Any]):
@@ -2067,10 +2502,27 @@ class DatastorePostgresqlBackend(DatastoreBackend):
         limit = data_dict.get('limit', 100)
         offset = data_dict.get('offset', 0)
 
-        sort = _sort(
-            data_dict.get('sort'),
-            fields_types,
-            rank_columns)
+        if 'cursor' in data_dict:
+            keys = _keyset(data_dict.get('sort'), fields_types)
+            if data_dict.get('distinct') or offset:
+                raise ValidationError({'cursor': [
+                    u'cursor can not be combined with distinct or offset']})
+            if rank_columns and not data_dict.get('sort') or any(
+                    field in rank_columns or fields_types[field] == 'nested'
+                    for field, _desc, _nulls in keys):
+                raise ValidationError({'cursor': [
+                    u'cursor requires a sort on table columns']})
+            sort = _keyset_sort(keys)
+            query_dict['cursor_keys'] = keys
+            if data_dict['cursor']:
+                query_dict['cursor_where'] = _keyset_where(
+                    keys, _decode_cursor(data_dict['cursor'], keys),
+                    fields_types)
+        else:
+            sort = _sort(
+                data_dict.get('sort'),
+                fields_types,
+                rank_columns)
         where = _where_clauses(data_dict, fields_types)
         select_cols = []
         records_format = data_dict.get('records_format')
@@ -2167,6 +2619,9 @@ class DatastorePostgresqlBackend(DatastoreBackend):
                     data_dict['resource_id'])
             else:
                 alter_table(context, data_dict, plugin_data)
+            if data_dict.get('bulk_load'):
+                _set_fulltext_trigger(
+                    context['connection'], data_dict['resource_id'], False)
             if 'triggers' in data_dict:
                 _create_triggers(
                     context['connection'],
@@ -2245,6 +2700,20 @@ class DatastorePostgresqlBackend(DatastoreBackend):
             real_id = row[0]
         return res_exists, real_id
 
+    def table_write_count(self, resource_id: str) -> Optional[int]:
+        '''
+        Return the number of rows inserted, updated and deleted in the
+        table as counted in pg_stat_user_tables, so writes made with COPY,
+        triggers or plain SQL are noticed too. The statistics are reported
+        by PostgreSQL shortly after each transaction commits.
+        '''
+        sql = sa.text(
+            '''SELECT n_tup_ins + n_tup_upd + n_tup_del
+            FROM pg_stat_user_tables WHERE relid = to_regclass(:table)''')
+        with self._get_read_engine().connect() as conn:
+            return conn.execute(
+                sql, {'table': identifier(resource_id)}).scalar()
+
     def resource_plugin_data(self, id: str) -> dict[str, Any]:
         engine = self._get_read_engine()
         with engine.connect() as conn:
@@ -2321,6 +2790,10 @@ class DatastorePostgresqlBackend(DatastoreBackend):
                 aliases.append(alias[0])
             info['meta']['aliases'] = aliases
 
+            # progress of bulk loads and full-text index builds
+            with engine.connect() as conn:
+                info['meta']['full_text'] = _full_text_status(conn, id)
+
             # get the data dictionary for the resource
             with engine.connect() as conn:
                 data_dictionary = _result_fields(
@@ -2403,6 +2876,20 @@ class DatastorePostgresqlBackend(DatastoreBackend):
         # to avoid sharing them between parent and child processes.
         _dispose_engines()
 
+    def finish_bulk_load(self, resource_id: str):
+        with get_write_engine().connect() as conn:
+            if not _is_bulk_loading(conn, resource_id) and \
+                    not _get_failed_index_names(conn, resource_id):
+                return
+        if not config.get('ckan.datastore.bulk_load.background'):
+            finish_bulk_load(resource_id)
+            return
+
+        import ckan.lib.jobs as jobs
+        jobs.enqueue(
+            finish_bulk_load, [resource_id],
+            title='Finish DataStore bulk load: {}'.format(resource_id))
+
     def calculate_record_count(self, resource_id: str):
         '''
         Calculate an estimate of the record/row count and store it in
@@ -1,14 +1,17 @@
 # encoding: utf-8
 from __future__ import annotations
 
-from typing import Any, Optional, cast, Union
-from itertools import zip_longest
+import codecs
+import csv
+import json
+from typing import IO, Any, Iterable, Iterator, Optional, cast, Union
+from itertools import islice, zip_longest
 
-from flask import Blueprint, Response
+from flask import Blueprint, Response, jsonify
 from flask.views import MethodView
 
 import ckan.lib.navl.dictization_functions as dict_fns
-from ckan.common import current_user
+from ckan.common import config, current_user
 from ckan.logic import (
     check_access,
     tuplize_dict,
@@ -41,6 +44,11 @@ unicode_only = get_validator(u'unicode_only')
 DUMP_FORMATS = u'csv', u'tsv', u'json', u'xml'
 PAGINATE_BY = 32000
 
+UPSERT_FORMATS = u'ndjson', u'csv'
+UPSERT_METHODS = u'upsert', u'insert', u'update'
+# longest line accepted in the body of a streamed upsert
+UPSERT_MAX_LINE = 16 * 1024 * 1024
+
 datastore = Blueprint(u'datastore', __name__)
 
 
@@ -311,7 +319,157 @@ def dump_to(
     return stream_dump(offset, limit, paginate_by, result)
 
 
+def upsert_schema() -> Schema:
+    return {
+        u'method': [default(u'upsert'), one_of(UPSERT_METHODS)],
+        u'format': [ignore_missing, one_of(UPSERT_FORMATS)],
+        u'force': [default(False), boolean_validator],
+        u'calculate_record_count': [default(False), boolean_validator],
+    }
+
+
+def upsert(resource_id: str):
+    u'''Add or update the records of a DataStore table from the request
+    body, which is read as a stream.
+
+    The body contains one JSON object per line (``format=ndjson``, the
+    default) or CSV with a header row (``format=csv``, or a ``text/csv``
+    content type). Records are passed to ``datastore_upsert`` in batches of
+    ``ckan.datastore.upsert.batch_size`` as they are read, so the size of
+    the body doesn't matter. Each batch is committed separately: on error,
+    the response includes the number of records already written.
+
+    The ``method``, ``force`` and ``calculate_record_count`` query string
+    parameters are the same as the ones of ``datastore_upsert``.
+    '''
+    data, errors = dict_fns.validate(request.args.to_dict(), upsert_schema())
+    if errors:
+        return _upsert_error(400, _(u'Invalid parameters'), errors)
+
+    fmt = data.get(u'format')
+    if not fmt:
+        fmt = u'csv' if request.mimetype == u'text/csv' else u'ndjson'
+    reader = _read_csv if fmt == u'csv' else _read_ndjson
+
+    data_dict = {
+        u'resource_id': resource_id,
+        u'method': data[u'method'],
+        u'force': data[u'force'],
+    }
+    count = 0
+    try:
+        check_access(u'datastore_upsert', {u'user': current_user.name},
+                     data_dict)
+        pending: list[dict[str, Any]] = []
+        batches = _batches(
+            reader(request.stream), config.get(
+                u'ckan.datastore.upsert.batch_size'))
+        # the record count is calculated with the last batch only
+        for batch in batches:
+            if pending:
+                _upsert_batch(data_dict, pending, False)
+                count += len(pending)
+            pending = batch
+        _upsert_batch(
+            data_dict, pending, data[u'calculate_record_count'])
+        count += len(pending)
+    except NotAuthorized:
+        return _upsert_error(403, _(u'Not authorized'), records=count)
+    except ObjectNotFound:
+        return _upsert_error(
+            404, _(u'DataStore resource not found'), records=count)
+    except ValidationError as e:
+        return _upsert_error(
+            409, _(u'Validation error'), e.error_dict, records=count)
+
+    return jsonify({u'success': True, u'result': {
+        u'resource_id': resource_id,
+        u'method': data[u'method'],
+        u'records': count,
+    }})
+
+
+def _upsert_batch(data_dict: dict[str, Any], records: list[dict[str, Any]],
+                  calculate_record_count: bool):
+    get_action(u'datastore_upsert')(
+        {u'user': current_user.name},
+        dict(data_dict, records=records,
+             calculate_record_count=calculate_record_count))
+
+
+def _upsert_error(status: int, message: str,
+                  errors: Optional[dict[str, Any]] = None,
+                  records: int = 0) -> Response:
+    body: dict[str, Any] = {
+        u'success': False, u'message': message, u'records': records}
+    if errors:
+        body[u'errors'] = errors
+    resp = jsonify(body)
+    resp.status_code = status
+    return resp
+
+
+def _lines(stream: IO[bytes]) -> Iterator[str]:
+    u'''Decode the lines of the stream, refusing unreasonably long
+    ones.'''
+    decoder = codecs.getincrementaldecoder(u'utf-8-sig')()
+    number = 0
+    while True:
+        line = stream.readline(UPSERT_MAX_LINE + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > UPSERT_MAX_LINE:
+            raise ValidationError({u'records': [
+                u'Line {0} is too long'.format(number)]})
+        try:
+            yield decoder.decode(line)
+        except UnicodeDecodeError:
+            raise ValidationError({u'records': [
+                u'Line {0} is not valid UTF-8'.format(number)]})
+
+
+def _read_ndjson(stream: IO[bytes]) -> Iterator[dict[str, Any]]:
+    for number, line in enumerate(_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            raise ValidationError({u'records': [
+                u'Line {0} is not a JSON object'.format(number)]})
+        yield record
+
+
+def _read_csv(stream: IO[bytes]) -> Iterator[dict[str, Any]]:
+    reader = csv.DictReader(_lines(stream))
+    for row in reader:
+        if None in row:
+            raise ValidationError({u'records': [
+                u'Line {0} has more values than the header'.format(
+                    reader.line_num)]})
+        # empty values are nulls
+        yield {
+            key: value if value != u'' else None
+            for key, value in row.items()
+        }
+
+
+def _batches(records: Iterable[dict[str, Any]],
+             size: int) -> Iterator[list[dict[str, Any]]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
 datastore.add_url_rule(u'/datastore/dump/<resource_id>', view_func=dump)
+datastore.add_url_rule(
+    u'/datastore/upsert/<resource_id>', view_func=upsert, methods=[u'POST'])
 datastore.add_url_rule(
     u'/dataset/<id>/dictionary/<resource_id>',
     view_func=DictionaryView.as_view(str(u'dictionary'))
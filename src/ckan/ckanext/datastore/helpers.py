@@ -12,6 +12,7 @@ import sqlparse
 import sqlalchemy as sa
 import ckan.common as converters
 import ckan.plugins.toolkit as tk
+from ckan.lib.redis import connect_to_redis
 from ckan.types import Context
 
 
@@ -246,3 +247,47 @@ def datastore_rw_resource_url_types() -> list[str]:
     datastore_delete
     """
     return ["datastore"]
+
+
+def _get_write_version_key() -> str:
+    return 'ckan:{}:datastore:write_version'.format(
+        tk.config['ckan.site_id'])
+
+
+def get_write_version(resource_id: str) -> int:
+    """
+    Return a number that changes every time the DataStore table of the
+    resource is created, modified or deleted, so values computed from the
+    table can be cached until the next write
+    """
+    version = connect_to_redis().hget(_get_write_version_key(), resource_id)
+    return int(version or 0)
+
+
+def bump_write_version(resource_id: str) -> int:
+    """
+    Record that the DataStore table of the resource was written to
+    """
+    return connect_to_redis().hincrby(
+        _get_write_version_key(), resource_id, 1)
+
+
+def _get_schema_version_key() -> str:
+    return 'ckan:{}:datastore:schema_version'.format(
+        tk.config['ckan.site_id'])
+
+
+def get_schema_version() -> int:
+    """
+    Return a number that changes every time a DataStore table or alias is
+    created, altered or dropped, so values derived from the database schema
+    can be cached until the next change
+    """
+    return int(connect_to_redis().get(_get_schema_version_key()) or 0)
+
+
+def bump_schema_version() -> int:
+    """
+    Record that DataStore tables or aliases were created, altered or dropped
+    """
+    return connect_to_redis().incr(_get_schema_version_key())
@@ -85,6 +85,14 @@ def datastore_create(context: Context, data_dict: dict[str, Any]):
         to change a resource, you only need to set this to True on the last
         request.
     :type calculate_record_count: bool (optional, default: False)
+    :param bulk_load: speed up loading many records with a series of
+        requests: the full-text search data is not maintained while records
+        are written, and is computed and indexed at once after the request
+        with ``calculate_record_count`` set to True. Until then full-text
+        searches don't match the records loaded. The progress is reported in
+        the ``full_text`` key of
+        :meth:`~ckanext.datastore.logic.action.datastore_info`.
+    :type bulk_load: bool (optional, default: False)
 
     Please note that setting the ``aliases``, ``indexes`` or ``primary_key``
     replaces the existing aliases or constraints. Setting ``records`` appends
@@ -168,9 +176,12 @@ def datastore_create(context: Context, data_dict: dict[str, Any]):
             })
 
     result = backend.create(context, data_dict, plugin_data)
+    datastore_helpers.bump_write_version(data_dict['resource_id'])
+    datastore_helpers.bump_schema_version()
 
     if data_dict.get('calculate_record_count', False):
         backend.calculate_record_count(data_dict['resource_id'])  # type: ignore
+        backend.finish_bulk_load(data_dict['resource_id'])
 
     # Set the datastore_active flag on the resource if necessary
     resobj = model.Resource.get(data_dict['resource_id'])
@@ -261,6 +272,7 @@ def datastore_run_triggers(context: Context, data_dict: dict[str, Any]) -> int:
         message = str(err.args[0].split('\n')[0])
         raise p.toolkit.ValidationError({
                 u'records': [message.split(u') ', 1)[-1]]})
+    datastore_helpers.bump_write_version(res_id)
     return results.rowcount
 
 
@@ -334,6 +346,7 @@ def datastore_upsert(context: Context, data_dict: dict[str, Any]):
         ))
 
     result = backend.upsert(context, data_dict)
+    datastore_helpers.bump_write_version(resource_id)
     p.toolkit.signals.datastore_upsert.send(resource_id, records=records)
 
     result.pop('id', None)
@@ -341,6 +354,7 @@ def datastore_upsert(context: Context, data_dict: dict[str, Any]):
 
     if data_dict.get('calculate_record_count', False):
         backend.calculate_record_count(data_dict['resource_id'])  # type: ignore
+        backend.finish_bulk_load(data_dict['resource_id'])
 
     return result
 
@@ -367,6 +381,14 @@ def datastore_info(context: Context, data_dict: dict[str, Any]
         - idx_size - size of all indices for the resource (bytes)
         - size - size of resource (bytes)
         - table_type - BASE TABLE, VIEW, FOREIGN TABLE or MATERIALIZED VIEW
+        - full_text - state of the full-text search data: ``{"state":
+          "loading"}`` until a bulk load is finished, ``{"state":
+          "indexing", ...}`` with the phase, blocks and tuples done and in
+          total while full-text indexes are built (the progress is only
+          visible to privileged database roles), ``{"state": "failed"}``
+          when building a full-text index failed, until it is built again
+          by a request with ``calculate_record_count``, or
+          ``{"state": "ready"}``
 
         **fields**: A list of dictionaries based on :ref:`fields`, with an
         additional nested dictionary per field called **schema**, with the
@@ -478,6 +500,9 @@ def datastore_delete(context: Context, data_dict: dict[str, Any]):
         ))
 
     result = backend.delete(context, data_dict)
+    datastore_helpers.bump_write_version(res_id)
+    if 'filters' not in data_dict:
+        datastore_helpers.bump_schema_version()
     p.toolkit.signals.datastore_delete.send(
         res_id, result=result, data_dict=data_dict)
     if data_dict.get('calculate_record_count', False):
@@ -570,6 +595,13 @@ def datastore_search(context: Context, data_dict: dict[str, Any]):
     :type limit: int
     :param offset: offset this number of rows (optional)
     :type offset: int
+    :param cursor: use keyset pagination instead of ``offset``: pass an
+        empty string for the first part, then the ``next_cursor`` value
+        returned with each part to get the following one. Records are
+        ordered by ``sort`` and then by ``_id``. Unlike ``offset``, this
+        stays fast for parts far into large tables. Can't be used with
+        ``offset`` or ``distinct`` (optional)
+    :type cursor: string
     :param fields: fields to return
                    (optional, default: all fields in original order)
     :type fields: list or comma separated string
@@ -629,6 +661,9 @@ def datastore_search(context: Context, data_dict: dict[str, Any]):
     :type total_was_estimated: bool
     :param records: list of matching results
     :type records: depends on records_format value passed
+    :param next_cursor: when ``cursor`` was passed, the cursor for the
+        following part or None if there are no more records
+    :type next_cursor: string
 
     '''
     backend = DatastoreBackend.get_active_backend()
@@ -684,6 +719,12 @@ def datastore_search_sql(context: Context, data_dict: dict[str, Any]):
 
     :param sql: a single SQL select statement
     :type sql: string
+    :param records_format: the format for the records return value:
+        'objects' (default) list of {fieldname1: value1, ...} dicts,
+        'lists' list of [value1, value2, ...] lists,
+        'csv' string containing comma-separated values with no header,
+        'tsv' string containing tab-separated values with no header
+    :type records_format: controlled list
 
     **Results:**
 
@@ -704,6 +745,12 @@ def datastore_search_sql(context: Context, data_dict: dict[str, Any]):
     '''
     backend = DatastoreBackend.get_active_backend()
 
+    if data_dict.get('records_format', 'objects') not in (
+            'objects', 'lists', 'csv', 'tsv'):
+        raise p.toolkit.ValidationError({
+            'records_format': [p.toolkit._('Value must be one of {}').format(
+                'objects, lists, csv, tsv')]})
+
     def check_access(table_names: list[str]):
         '''
         Raise NotAuthorized if current user is not allowed to access
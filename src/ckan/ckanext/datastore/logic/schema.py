@@ -136,6 +136,7 @@ def datastore_create_schema() -> Schema:
         },
         'calculate_record_count': [ignore_missing, default(False),
                                    boolean_validator],
+        'bulk_load': [ignore_missing, boolean_validator],
         '__junk': [empty],
         '__before': [rename('id', 'resource_id')]
     }
@@ -199,6 +200,7 @@ def datastore_search_schema() -> Schema:
             limit_to_configured_maximum('ckan.datastore.search.rows_max',
                                         32000)],
         'offset': [ignore_missing, int_validator],
+        'cursor': [ignore_missing, unicode_safe],
         'fields': [ignore_missing, list_of_strings_or_string],
         'sort': [ignore_missing, list_of_strings_or_string],
         'distinct': [ignore_missing, boolean_validator],
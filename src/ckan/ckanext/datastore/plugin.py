@@ -230,6 +230,9 @@ class DatastorePlugin(p.SingletonPlugin):
             if is_positive_int:
                 del data_dict['offset']
 
+        if isinstance(data_dict.get('cursor'), str):
+            del data_dict['cursor']
+
         full_text = data_dict.get('full_text')
         if full_text:
             if isinstance(full_text, str):
@@ -310,6 +310,108 @@ class TestDatastoreCreateNewTests(object):
         last_analyze = when_was_last_analyze(resource["id"])
         assert last_analyze is not None
 
+    @pytest.mark.ckan_config("ckan.datastore.bulk_load.background", False)
+    def test_bulk_load(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            fields=[{"id": "book", "type": "text"}], bulk_load=True,
+            records=[{"book": "annakarenina"}])
+        helpers.call_action(
+            "datastore_upsert", resource_id=resource["id"], force=True,
+            method="insert", records=[{"book": "warandpeace"}])
+
+        # full-text data is left out until the load is finished
+        assert not self._has_index_on_field(resource["id"], '"_full_text"')
+        info = helpers.call_action("datastore_info", id=resource["id"])
+        assert info["meta"]["full_text"] == {"state": "loading"}
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"], q="warandpeace")
+        assert result["records"] == []
+
+        helpers.call_action(
+            "datastore_upsert", resource_id=resource["id"], force=True,
+            method="insert", records=[{"book": "resurrection"}],
+            calculate_record_count=True)
+
+        assert self._has_index_on_field(resource["id"], '"_full_text"')
+        info = helpers.call_action("datastore_info", id=resource["id"])
+        assert info["meta"]["full_text"] == {"state": "ready"}
+        for book in ["annakarenina", "warandpeace", "resurrection"]:
+            result = helpers.call_action(
+                "datastore_search", resource_id=resource["id"], q=book)
+            assert [r["book"] for r in result["records"]] == [book]
+
+        # the trigger maintains the data again
+        helpers.call_action(
+            "datastore_upsert", resource_id=resource["id"], force=True,
+            method="insert", records=[{"book": "childhood"}])
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"], q="childhood")
+        assert len(result["records"]) == 1
+
+    @pytest.mark.ckan_config("ckan.datastore.bulk_load.background", False)
+    def test_bulk_load_updates_records_changed_by_other_writers(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            fields=[{"id": "book", "type": "text"}],
+            records=[{"book": "annakarenina"}])
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            bulk_load=True, records=[{"book": "warandpeace"}])
+        # the full-text trigger is disabled for every writer of the table
+        with db.get_write_engine().begin() as conn:
+            conn.execute(sa.text(
+                u'''UPDATE "{0}" SET book = 'resurrection'
+                WHERE book = 'annakarenina' '''.format(resource["id"])))
+
+        helpers.call_action(
+            "datastore_upsert", resource_id=resource["id"], force=True,
+            method="insert", records=[{"book": "childhood"}],
+            calculate_record_count=True)
+
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"], q="annakarenina")
+        assert result["records"] == []
+        for book in ["resurrection", "warandpeace", "childhood"]:
+            result = helpers.call_action(
+                "datastore_search", resource_id=resource["id"], q=book)
+            assert [r["book"] for r in result["records"]] == [book]
+
+    @pytest.mark.ckan_config("ckan.datastore.bulk_load.background", False)
+    def test_failed_full_text_index_is_built_again(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            fields=[{"id": "book", "type": "text"}],
+            records=[{"book": "annakarenina"}, {"book": "annakarenina"}])
+        index_name = db._generate_index_name(resource["id"], '"_full_text"')
+        # a unique index can't be built on duplicates, the failed concurrent
+        # build leaves an invalid index behind
+        engine = db.get_write_engine()
+        with engine.begin() as conn:
+            conn.execute(sa.text(u'DROP INDEX "{0}"'.format(index_name)))
+        with engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT") as conn:
+            with pytest.raises(sa.exc.IntegrityError):
+                conn.execute(sa.text(
+                    u'''CREATE UNIQUE INDEX CONCURRENTLY "{0}"
+                    ON "{1}" (book)'''.format(index_name, resource["id"])))
+        info = helpers.call_action("datastore_info", id=resource["id"])
+        assert info["meta"]["full_text"] == {"state": "failed"}
+
+        helpers.call_action(
+            "datastore_upsert", resource_id=resource["id"], force=True,
+            method="insert", records=[{"book": "childhood"}],
+            calculate_record_count=True)
+
+        info = helpers.call_action("datastore_info", id=resource["id"])
+        assert info["meta"]["full_text"] == {"state": "ready"}
+        with engine.connect() as conn:
+            assert db._get_invalid_index_names(conn, resource["id"]) == []
+        assert self._has_index_on_field(resource["id"], '"_full_text"')
+
     def test_delete_fields(self):
         resource = factories.Resource()
         data = {
@@ -520,6 +520,116 @@ class TestDatastoreSearch(object):
         result = helpers.call_action("datastore_search", **data)
         assert len(result["records"]) == 1
 
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_cursor(self):
+        resource = factories.Resource()
+        records = [
+            {"a": 2, "b": "one"}, {"a": None, "b": "two"},
+            {"a": 1, "b": "three"}, {"a": 2, "b": "four"},
+            {"a": 1.5, "b": "five"}, {"a": None, "b": "six"},
+            {"a": 3, "b": "seven"},
+        ]
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            fields=[{"id": "a", "type": "numeric"}, {"id": "b"}],
+            records=records)
+
+        for sort, expected in [
+                ("a", ["three", "five", "one", "four", "seven", "two",
+                       "six"]),
+                ("a desc", ["two", "six", "seven", "one", "four", "five",
+                            "three"]),
+                ("a desc nulls last", ["seven", "one", "four", "five",
+                                       "three", "two", "six"])]:
+            names = []
+            cursor = ""
+            while cursor is not None:
+                result = helpers.call_action(
+                    "datastore_search", resource_id=resource["id"],
+                    sort=sort, limit=2, cursor=cursor)
+                assert result["total"] == 7
+                names += [r["b"] for r in result["records"]]
+                cursor = result["next_cursor"]
+            assert names == expected
+
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_cursor_with_filters(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": i % 2, "b": i} for i in range(5)])
+
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"],
+            filters={"a": 0}, sort="b desc", limit=2, cursor="")
+        assert [r["b"] for r in result["records"]] == [4, 2]
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"],
+            filters={"a": 0}, sort="b desc", limit=2,
+            cursor=result["next_cursor"])
+        assert [r["b"] for r in result["records"]] == [0]
+        assert result["total"] == 3
+        assert result["next_cursor"] is None
+
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_cursor_invalid(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": i} for i in range(5)])
+        result = helpers.call_action(
+            "datastore_search", resource_id=resource["id"], sort="a",
+            limit=2, cursor="")
+
+        for params in [
+                {"sort": "a desc", "cursor": result["next_cursor"]},
+                {"sort": "a", "cursor": "not a cursor"},
+                {"sort": "a", "cursor": "", "offset": 2},
+                {"sort": "a", "cursor": "", "distinct": True}]:
+            with pytest.raises(logic.ValidationError):
+                helpers.call_action(
+                    "datastore_search", resource_id=resource["id"],
+                    **params)
+
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    @pytest.mark.parametrize("records_format", ["objects", "lists", "csv"])
+    def test_search_cursor_runs_no_extra_query(self, records_format):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": i} for i in range(5)])
+        engine = db.get_read_engine()
+        statements = []
+
+        def log_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        def count(**params):
+            del statements[:]
+            sa.event.listen(engine, "before_cursor_execute", log_statement)
+            try:
+                result = helpers.call_action(
+                    "datastore_search", resource_id=resource["id"],
+                    sort="a", limit=2, records_format=records_format,
+                    **params)
+            finally:
+                sa.event.remove(
+                    engine, "before_cursor_execute", log_statement)
+            return result, len(statements)
+
+        _result, with_offset = count(offset=2)
+        result, with_cursor = count(cursor="")
+        assert result["next_cursor"]
+        if records_format == "csv":
+            # COPY only returns the records, the cursor is queried apart
+            assert with_cursor == with_offset + 1
+        else:
+            assert with_cursor == with_offset
+
 
 class TestDatastoreSearchLegacyTests(object):
     sysadmin_user = None
@@ -908,6 +1018,27 @@ class TestDatastoreSearchLegacyTests(object):
         assert result["total"] == 2
         assert result["records"] == [self.expected_records[1]]
 
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_cursor_links(self, app):
+        headers = {"Authorization": self.normal_user_token}
+        res = app.get(
+            "/api/action/datastore_search?resource_id={0}"
+            "&sort=published&limit=1&cursor=".format(
+                self.data["resource_id"]),
+            headers=headers,
+        )
+        result = json.loads(res.data)["result"]
+        assert result["records"] == [self.expected_records[0]]
+        assert "offset" not in result["_links"]["next"]
+        assert "prev" not in result["_links"]
+
+        res = app.get(result["_links"]["next"], headers=headers)
+        result = json.loads(res.data)["result"]
+        assert result["records"] == [self.expected_records[1]]
+        assert result["next_cursor"] is None
+        assert "next" not in result["_links"]
+
     @pytest.mark.ckan_config("ckan.plugins", "datastore")
     @pytest.mark.usefixtures("clean_datastore", "with_plugins")
     def test_search_invalid_offset(self, app):
@@ -1894,6 +2025,72 @@ class TestDatastoreSQLFunctional(object):
         record_new = result["records"]
         assert (isinstance(record_new[0]["foo"], decimal.Decimal))
 
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_sql_records_format(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": 1, "b": "x,y"}, {"a": 2, "b": None}])
+        sql = 'SELECT a, b FROM "{0}" ORDER BY a'.format(resource["id"])
+
+        result = helpers.call_action(
+            "datastore_search_sql", sql=sql, records_format="lists")
+        assert result["records"] == [[1, "x,y"], [2, None]]
+        result = helpers.call_action(
+            "datastore_search_sql", sql=sql, records_format="csv")
+        assert result["records"] == '1,"x,y"\r\n2,\r\n'
+        result = helpers.call_action(
+            "datastore_search_sql", sql=sql, records_format="tsv")
+        assert result["records"] == '1\tx,y\r\n2\t\r\n'
+        with pytest.raises(p.toolkit.ValidationError):
+            helpers.call_action(
+                "datastore_search_sql", sql=sql, records_format="xml")
+
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.ckan_config("ckan.datastore.sqlsearch.max_result_bytes", 100)
+    @pytest.mark.usefixtures("clean_datastore", "with_plugins")
+    def test_search_sql_max_result_bytes(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": "x" * 40} for _ in range(3)])
+
+        sql = 'SELECT a FROM "{0}" LIMIT 2'.format(resource["id"])
+        result = helpers.call_action("datastore_search_sql", sql=sql)
+        assert len(result["records"]) == 2
+        sql = 'SELECT a FROM "{0}"'.format(resource["id"])
+        with pytest.raises(p.toolkit.ValidationError, match="100 bytes"):
+            helpers.call_action("datastore_search_sql", sql=sql)
+
+    @pytest.mark.ckan_config("ckan.plugins", "datastore")
+    @pytest.mark.usefixtures("clean_datastore", "clean_redis", "with_plugins")
+    def test_search_sql_reuses_parsed_statement(self):
+        resource = factories.Resource()
+        helpers.call_action(
+            "datastore_create", resource_id=resource["id"], force=True,
+            records=[{"a": 1}])
+        sql = 'SELECT a FROM "{0}"'.format(resource["id"])
+
+        get_names = db.datastore_helpers.get_table_and_function_names_from_sql
+        with mock.patch(
+                "ckanext.datastore.helpers."
+                "get_table_and_function_names_from_sql",
+                side_effect=get_names) as parse:
+            helpers.call_action("datastore_search_sql", sql=sql)
+            helpers.call_action("datastore_search_sql", sql=sql)
+            assert parse.call_count == 1
+
+            # changing tables or aliases discards the parsed statements
+            helpers.call_action(
+                "datastore_create", resource_id=resource["id"], force=True,
+                aliases="spam")
+            result = helpers.call_action(
+                "datastore_search_sql", sql='SELECT a FROM "spam"')
+            assert result["records"] == [{"a": 1}]
+            helpers.call_action("datastore_search_sql", sql=sql)
+            assert parse.call_count == 3
+
 
 class TestDatastoreSearchRecordsFormat(object):
     @pytest.mark.ckan_config("ckan.plugins", "datastore")
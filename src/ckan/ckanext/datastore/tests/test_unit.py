@@ -1,5 +1,7 @@
 # encoding: utf-8
 
+import sqlalchemy as sa
+
 import ckanext.datastore.backend.postgres as backend
 import ckanext.datastore.backend.postgres as db
 import ckanext.datastore.helpers as helpers
@@ -37,3 +39,41 @@ def test_pg_version_check():
     connection = engine.connect()
     assert db._pg_version_is_at_least(connection, "8.0")
     assert not db._pg_version_is_at_least(connection, "20.0")
+
+
+def test_types_are_loaded_on_connect(monkeypatch):
+    assert "warm_up" in db.startup_timings
+    monkeypatch.setattr(db, "_engines", {})
+    monkeypatch.setattr(db, "_pg_types", {})
+    monkeypatch.setattr(db, "_type_names", set())
+    lookups = []
+
+    def log_lookup(conn, cursor, statement, *args):
+        if "FROM pg_type WHERE oid" in statement:
+            lookups.append(statement)
+
+    engine = db.get_read_engine()
+    sa.event.listen(engine, "before_cursor_execute", log_lookup)
+    try:
+        with engine.connect() as connection:
+            # filled by _on_connect, before any statement of the connection
+            assert "int4" in db._type_names
+            num_types = len(db._pg_types)
+            oid = connection.execute(
+                sa.text("SELECT 'int4'::regtype::oid")).scalar()
+        assert num_types == len(db._pg_types)
+        assert db._pg_types[oid] == "int4"
+        assert db._get_type(engine, oid) == "int4"
+        assert lookups == []
+    finally:
+        engine.dispose()
+
+
+def test_unknown_types_are_looked_up_once(monkeypatch):
+    engine = db.get_read_engine()
+    with engine.connect() as connection:
+        oid = connection.execute(
+            db.sa.text("SELECT 'text'::regtype::oid")).scalar()
+    monkeypatch.delitem(db._pg_types, oid)
+    assert db._get_type(engine, oid) == "text"
+    assert db._pg_types[oid] == "text"
@@ -4,6 +4,7 @@ import pytest
 
 import ckan.tests.factories as factories
 import ckan.tests.helpers as helpers
+from ckan.lib.helpers import url_for
 from ckan.plugins.toolkit import ValidationError, NotAuthorized
 from ckanext.datastore.tests.helpers import when_was_last_analyze
 
@@ -1009,3 +1010,79 @@ class TestDatastoreUpdate(object):
         assert search_result["total"] == 1
         rec = search_result["records"][0]
         assert rec == {'_id': 1, 'pk': '1000', 'n': None, 'd': None}
+
+
+@pytest.mark.ckan_config("ckan.plugins", "datastore")
+@pytest.mark.usefixtures("clean_datastore", "with_plugins")
+class TestDatastoreUpsertEndpoint(object):
+    def _create(self):
+        resource = factories.Resource(url_type=u"datastore")
+        helpers.call_action(
+            "datastore_create",
+            resource_id=resource["id"],
+            force=True,
+            primary_key="id",
+            fields=[
+                {"id": "id", "type": "int"},
+                {"id": "book", "type": "text"},
+            ],
+            records=[{"id": 1, "book": "El Quijote"}],
+        )
+        return resource
+
+    def _post(self, app, resource_id, body, user, status=200, **params):
+        return app.post(
+            url=url_for("datastore.upsert", resource_id=resource_id,
+                        **params),
+            data=body,
+            headers={"Authorization": user["token"]},
+            status=status,
+        )
+
+    @pytest.mark.ckan_config("ckan.datastore.upsert.batch_size", 2)
+    def test_ndjson(self, app):
+        resource = self._create()
+        sysadmin = factories.SysadminWithToken()
+        body = "\n".join([
+            '{"id": 1, "book": "Don Quixote"}',
+            '{"id": 2, "book": "Moby Dick"}',
+            '',
+            '{"id": 3, "book": "Ulysses"}',
+        ])
+        resp = self._post(app, resource["id"], body, sysadmin, force=True)
+        assert resp.json["result"]["records"] == 3
+
+        records = _search(resource["id"])["records"]
+        assert [(r["id"], r["book"]) for r in records] == [
+            (1, "Don Quixote"), (2, "Moby Dick"), (3, "Ulysses")]
+
+    def test_csv(self, app):
+        resource = self._create()
+        sysadmin = factories.SysadminWithToken()
+        body = 'id,book\n2,"Moby\nDick"\n3,\n'
+        resp = self._post(
+            app, resource["id"], body, sysadmin,
+            method="insert", format="csv", force=True)
+        assert resp.json["result"]["records"] == 2
+
+        records = _search(resource["id"])["records"]
+        assert [(r["id"], r["book"]) for r in records] == [
+            (1, "El Quijote"), (2, "Moby\nDick"), (3, None)]
+
+    @pytest.mark.ckan_config("ckan.datastore.upsert.batch_size", 1)
+    def test_invalid_line(self, app):
+        resource = self._create()
+        sysadmin = factories.SysadminWithToken()
+        body = '{"id": 2, "book": "Moby Dick"}\n[1, 2]\n'
+        resp = self._post(
+            app, resource["id"], body, sysadmin, force=True, status=409)
+        assert resp.json["records"] == 1
+        assert resp.json["errors"] == {
+            "records": ["Line 2 is not a JSON object"]}
+
+    def test_requires_auth(self, app):
+        resource = self._create()
+        user = factories.UserWithToken()
+        resp = self._post(
+            app, resource["id"], '{"id": 2}', user, force=True, status=403)
+        assert not resp.json["success"]
@@ -1,7 +1,7 @@
 # encoding: utf-8
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Optional
 from urllib.parse import urlencode
 from html import escape
 
@@ -10,17 +10,27 @@ from flask import Blueprint
 
 from ckan.common import json
 from ckan.lib.helpers import decode_view_request_filters
+from ckan.lib.redis import connect_to_redis
 from ckan.plugins.toolkit import (
+    check_access,
+    config,
     get_action,
     h,
     NotAuthorized,
     ObjectNotFound,
     request,
 )
+from ckanext.datastore.backend import DatastoreBackend
+from ckanext.datastore.helpers import get_write_version
 import re
 
 datatablesview = Blueprint(u'datatablesview', __name__)
 
+# unfiltered totals are cached for a day at most, they are invalidated
+# anyway when the DataStore table is written to, by the DataStore actions
+# or by anything else changing the rows of the table
+UNFILTERED_CACHE_EXPIRATION = 24 * 60 * 60
+
 
 def merge_filters(view_filters: dict[str, Any],
                   user_filters: dict[str, Any] | None) -> dict[str, Any]:
@@ -51,6 +61,60 @@ def merge_filters(view_filters: dict[str, Any],
     return filters
 
 
+def _get_total_estimation_threshold() -> Optional[int]:
+    threshold = config.get(u'ckan.datatables.total_estimation_threshold')
+    return threshold if threshold > 0 else None
+
+
+def unfiltered_search(resource_view: dict[str, Any]) -> dict[str, Any]:
+    u'''
+    Return the fields and the total number of records of the resource
+    matching the filters of the view, as returned by datastore_search.
+
+    The result is cached until the view filters change or the DataStore
+    table is written to, so paging or sorting the table does not count
+    all the records every time. Writes made outside the DataStore actions,
+    e.g. COPY by loaders or plain SQL, are detected with the write count
+    of the table reported by the DataStore backend.
+    '''
+    resource_id = resource_view[u'resource_id']
+    view_filters = resource_view.get(u'filters', {})
+    check_access(u'datastore_search', {}, {u'resource_id': resource_id})
+
+    redis = connect_to_redis()
+    key = u'ckan:{}:datatables:{}:unfiltered'.format(
+        config[u'ckan.site_id'], resource_view[u'id'])
+    version = [
+        get_write_version(resource_id),
+        DatastoreBackend.get_active_backend().table_write_count(resource_id),
+    ]
+    cached = redis.get(key)
+    if cached:
+        cached = json.loads(cached)
+        if (cached[u'version'] == version
+                and cached[u'filters'] == view_filters):
+            return cached[u'response']
+
+    response = get_action(u'datastore_search')(
+        {}, {
+            u"resource_id": resource_id,
+            u"limit": 0,
+            u"filters": view_filters,
+            u"total_estimation_threshold": _get_total_estimation_threshold(),
+        }
+    )
+    response = {
+        u'fields': response[u'fields'],
+        u'total': response.get(u'total', 0),
+    }
+    redis.set(key, json.dumps({
+        u'version': version,
+        u'filters': view_filters,
+        u'response': response,
+    }), ex=UNFILTERED_CACHE_EXPIRATION)
+    return response
+
+
 def ajax(resource_view_id: str):
     resource_view = get_action(u'resource_view_show'
                                )({}, {
@@ -67,13 +131,7 @@ def ajax(resource_view_id: str):
 
     datastore_search = get_action(u'datastore_search')
     try:
-        unfiltered_response = datastore_search(
-            {}, {
-                u"resource_id": resource_view[u'resource_id'],
-                u"limit": 0,
-                u"filters": view_filters,
-            }
-        )
+        unfiltered_response = unfiltered_search(resource_view)
     except ObjectNotFound:
         return json.dumps({'error': 'Object not found'}), 404
     except NotAuthorized:
@@ -127,6 +185,8 @@ def ajax(resource_view_id: str):
                 u"limit": limit,
                 u"sort": u', '.join(sort_list),
                 u"filters": filters,
+                u"total_estimation_threshold":
+                    _get_total_estimation_threshold(),
             }
         )
     except Exception:
@@ -168,14 +228,7 @@ def filtered_download(resource_view_id: str):
     user_filters = decode_view_request_filters()
     filters = merge_filters(view_filters, user_filters)
 
-    datastore_search = get_action(u'datastore_search')
-    unfiltered_response = datastore_search(
-        {}, {
-            u"resource_id": resource_view[u'resource_id'],
-            u"limit": 0,
-            u"filters": view_filters,
-        }
-    )
+    unfiltered_response = unfiltered_search(resource_view)
 
     cols = [f[u'id'] for f in unfiltered_response[u'fields']]
     if u'show_fields' in resource_view:
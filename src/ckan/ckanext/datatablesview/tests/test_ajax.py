@@ -50,3 +50,87 @@ def test_ajax_data(app, user):
             },
         ]
     }
+
+
+def _ajax(app, view_id, **data):
+    data = dict({'draw': 1, 'search[value]': '', 'start': 0, 'length': 50},
+                **data)
+    resp = app.post(
+        url=url_for('datatablesview.ajax', resource_view_id=view_id),
+        data=data,
+    )
+    return json.loads(b''.join(resp.response).decode('utf-8'))
+
+
+@pytest.mark.ckan_config("ckan.plugins", "datastore datatables_view")
+@pytest.mark.usefixtures("with_plugins", "clean_redis")
+def test_ajax_unfiltered_total_is_cached(app, monkeypatch):
+    dataset = factories.Dataset()
+    ds = helpers.call_action(
+        'datastore_create',
+        resource={'package_id': dataset['id']},
+        fields=[{'id': 'a', 'type': 'text'}],
+        records=[{'a': 'one'}, {'a': 'two'}],
+    )
+    view = factories.ResourceView(
+        view_type='datatables_view',
+        resource_id=ds['resource_id']
+    )
+    assert _ajax(app, view['id'])['recordsTotal'] == 2
+
+    searches = []
+    from ckanext.datatablesview import blueprint
+    get_action = blueprint.get_action
+
+    def datastore_search(context, data_dict):
+        searches.append(data_dict)
+        return get_action('datastore_search')(context, data_dict)
+    monkeypatch.setattr(
+        blueprint, 'get_action',
+        lambda name: datastore_search if name == 'datastore_search'
+        else get_action(name))
+
+    ajax = _ajax(app, view['id'], **{'search[value]': 'one'})
+    assert ajax['recordsTotal'] == 2
+    assert ajax['recordsFiltered'] == 1
+    # only the filtered search was run
+    assert [search['q'] for search in searches] == ['one:*']
+
+    helpers.call_action(
+        'datastore_upsert',
+        resource_id=ds['resource_id'],
+        records=[{'a': 'three'}],
+        method='insert',
+    )
+    assert _ajax(app, view['id'])['recordsTotal'] == 3
+    assert searches[-2]['limit'] == 0
+
+
+@pytest.mark.ckan_config("ckan.plugins", "datastore datatables_view")
+@pytest.mark.usefixtures("with_plugins", "clean_redis")
+def test_ajax_unfiltered_total_notices_writes_outside_actions(
+        app, monkeypatch):
+    dataset = factories.Dataset()
+    ds = helpers.call_action(
+        'datastore_create',
+        resource={'package_id': dataset['id']},
+        fields=[{'id': 'a', 'type': 'text'}],
+        records=[{'a': 'one'}, {'a': 'two'}],
+    )
+    view = factories.ResourceView(
+        view_type='datatables_view',
+        resource_id=ds['resource_id']
+    )
+    assert _ajax(app, view['id'])['recordsTotal'] == 2
+
+    from ckanext.datastore.backend import postgres
+    engine = postgres.get_write_engine()
+    with engine.begin() as conn:
+        conn.execute(postgres.sa.text(
+            'INSERT INTO {} (a) VALUES (:a)'.format(
+                postgres.identifier(ds['resource_id']))), {'a': 'three'})
+    # the statistics of the table may be reported a bit later
+    monkeypatch.setattr(
+        postgres.DatastorePostgresqlBackend, 'table_write_count',
+        lambda self, resource_id: 3)
+    assert _ajax(app, view['id'])['recordsTotal'] == 3
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed storage for uploaded resource files.
+
+Every uploaded file is stored once, as a blob named after its SHA-256
+digest::
+
+    {ckan.storage_path}/blobs/{digest[0:2]}/{digest[2:]}
+
+and the per-resource path returned by ``get_path``
+(``{ckan.storage_path}/resources/{id[0:3]}/{id[3:6]}/{id[6:]}``) is a
+hard link to that blob, so the storage must support hard links. The link
+count of the blob is its reference count: a blob with a single link is
+not used by any resource and is removed as soon as the last resource
+referencing it is replaced or cleared.
+
+Changes to the links of the blobs are serialized between processes with
+an exclusive ``flock`` on a ``.lock`` file in each blob directory.
+
+Uploading content that is already known only reads the incoming file to
+compute its digest, the bytes are not written again.
+"""
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import re
+from typing import Any, IO, Iterator, Optional
+
+import ckan.plugins as p
+from ckan.lib.uploader import MB, ResourceUpload, _copy_file
+from ckan.logic import ValidationError
+
+log = logging.getLogger(__name__)
+
+CHECKSUM_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _hash_file(input_file: IO[bytes], max_size: int) -> str:
+    """Return the SHA-256 hex digest of ``input_file``.
+
+    Raises a ``ValidationError`` if the file is bigger than ``max_size``
+    MB, the same way as the default uploader does.
+    """
+    input_file.seek(0)
+    hasher = hashlib.sha256()
+    current_size = 0
+    while True:
+        current_size = current_size + 1
+        data = input_file.read(MB)
+        if not data:
+            break
+        hasher.update(data)
+        if current_size > max_size:
+            raise ValidationError({'upload': ['File upload too large']})
+    input_file.seek(0)
+    return hasher.hexdigest()
+
+
+class DedupStoragePlugin(p.SingletonPlugin):
+    p.implements(p.IUploader, inherit=True)
+
+    # IUploader
+
+    def get_resource_uploader(self, data_dict: dict[str, Any]):
+        return DedupResourceUpload(data_dict)
+
+
+class DedupResourceUpload(ResourceUpload):
+    blob_path: Optional[str]
+    stored_hash: Optional[str]
+
+    def __init__(self, resource: dict[str, Any]) -> None:
+        # checksum of the file currently stored for the resource, to find
+        # its blob without reading it again
+        self.stored_hash = resource.get('hash')
+        super(DedupResourceUpload, self).__init__(resource)
+        self.blob_path = None
+        if self.storage_path:
+            self.blob_path = os.path.join(
+                os.path.dirname(self.storage_path), 'blobs')
+
+    def get_blob_path(self, checksum: str) -> str:
+        if self.blob_path is None:
+            raise TypeError("storage_path is not defined")
+        return os.path.join(self.blob_path, checksum[0:2], checksum[2:])
+
+    @contextlib.contextmanager
+    def _lock(self, checksum: str) -> Iterator[None]:
+        """Hold an exclusive lock on the directory of the blob with
+        ``checksum`` while its links are changed.
+
+        Locks must not be nested: blobs share directories, and a second
+        lock on the same directory would never be granted.
+        """
+        directory = os.path.dirname(self.get_blob_path(checksum))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def upload(self, id: str, max_size: int = 10) -> None:
+        if not self.storage_path:
+            return
+
+        directory = self.get_directory(id)
+        filepath = self.get_path(id)
+
+        if self.filename:
+            assert self.upload_file
+            try:
+                checksum = _hash_file(self.upload_file, max_size)
+                os.makedirs(directory, exist_ok=True)
+                with self._lock(checksum):
+                    blob = self._store_blob(checksum, max_size)
+                    tmp_filepath = self._link_tmp(filepath, blob)
+            finally:
+                self.upload_file.close()
+
+            self._replace(filepath, tmp_filepath)
+            self.checksum = checksum
+            return
+
+        if self.clear:
+            self._release(filepath)
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+
+    def _store_part(self, id: str, part_path: str, checksum: str) -> None:
+        """Move a completed chunked upload to the blob store, or drop it
+        if the content is already stored."""
+        filepath = self.get_path(id)
+        with self._lock(checksum):
+            blob = self.get_blob_path(checksum)
+            try:
+                os.link(part_path, blob)
+            except FileExistsError:
+                log.debug('Reusing stored blob %s', checksum)
+            tmp_filepath = self._link_tmp(filepath, blob)
+        os.remove(part_path)
+        self._replace(filepath, tmp_filepath)
+
+    def _link_tmp(self, filepath: str, blob: str) -> str:
+        """Link ``blob`` next to the resource file at ``filepath`` and
+        return the path of the new link. Called with the blob locked, so
+        that it can't be released before it is referenced."""
+        tmp_filepath = filepath + '~'
+        try:
+            os.link(blob, tmp_filepath)
+        except FileExistsError:
+            os.remove(tmp_filepath)
+            os.link(blob, tmp_filepath)
+        return tmp_filepath
+
+    def _replace(self, filepath: str, tmp_filepath: str) -> None:
+        """Replace the resource file at ``filepath`` with the link at
+        ``tmp_filepath``, dropping the blob of the previous file if it is
+        no longer used."""
+        self._release(filepath)
+        os.replace(tmp_filepath, filepath)
+
+    def _store_blob(self, checksum: str, max_size: int) -> str:
+        """Write the uploaded file to the blob store unless a blob with
+        the same content already exists, and return the blob path.
+
+        Must be called with the blob locked.
+        """
+        blob = self.get_blob_path(checksum)
+        if os.path.exists(blob):
+            log.debug('Reusing stored blob %s', checksum)
+            return blob
+
+        tmp_blob = '{}.{}~'.format(blob, os.getpid())
+        assert self.upload_file
+        with open(tmp_blob, 'wb') as output_file:
+            try:
+                _copy_file(self.upload_file, output_file, max_size)
+            except ValidationError:
+                os.remove(tmp_blob)
+                raise
+        try:
+            os.link(tmp_blob, blob)
+        finally:
+            os.remove(tmp_blob)
+        return blob
+
+    def _find_checksum(self, filepath: str) -> str:
+        """Return the checksum of the blob linked from ``filepath``."""
+        stored_hash = (self.stored_hash or '').lower()
+        if CHECKSUM_RE.match(stored_hash):
+            try:
+                if os.path.samefile(
+                        self.get_blob_path(stored_hash), filepath):
+                    return stored_hash
+            except OSError:
+                pass
+        # the hash of the resource is missing or was changed
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            return _hash_file(f, size // MB + 1)
+
+    def _release(self, filepath: str) -> None:
+        """Drop the blob referenced by the resource file at ``filepath``
+        if this file is its last reference."""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return
+        # one link from the blob store and one from the resource path
+        if stat.st_nlink != 2:
+            return
+        checksum = self._find_checksum(filepath)
+        with self._lock(checksum):
+            blob = self.get_blob_path(checksum)
+            try:
+                if os.path.samefile(blob, filepath) and \
+                        os.stat(blob).st_nlink == 2:
+                    os.remove(blob)
+            except OSError:
+                pass
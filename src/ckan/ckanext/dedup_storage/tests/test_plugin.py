@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import fcntl
+import os
+import hashlib
+import threading
+from io import BytesIO
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import ckan.lib.uploader as uploader
+import ckan.tests.factories as factories
+from ckanext.dedup_storage import plugin
+from ckanext.dedup_storage.plugin import DedupResourceUpload
+
+
+def _upload(resource_id, content, filename=u"data.csv", **resource):
+    upload = DedupResourceUpload(dict(
+        resource,
+        url=u"",
+        upload=FileStorage(BytesIO(content), filename=filename),
+        id=resource_id,
+    ))
+    upload.upload(resource_id)
+    return upload
+
+
+class TestDedupResourceUpload(object):
+    def test_identical_content_is_stored_once(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        second = _upload(u"bbbbbbbb-2222", b"hello,world")
+
+        checksum = hashlib.sha256(b"hello,world").hexdigest()
+        assert first.checksum == second.checksum == checksum
+
+        blob = first.get_blob_path(checksum)
+        path_1 = first.get_path(u"aaaaaaaa-1111")
+        path_2 = second.get_path(u"bbbbbbbb-2222")
+        assert os.path.samefile(path_1, blob)
+        assert os.path.samefile(path_2, blob)
+        assert os.stat(blob).st_nlink == 3
+        with open(path_2, u"rb") as f:
+            assert f.read() == b"hello,world"
+
+    def test_known_content_is_not_written_again(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        blob = first.get_blob_path(first.checksum)
+        mtime = os.stat(blob).st_mtime_ns
+
+        monkeypatch.setattr(plugin, u"_copy_file", pytest.fail)
+        _upload(u"bbbbbbbb-2222", b"hello,world")
+        assert os.stat(blob).st_mtime_ns == mtime
+
+    def test_unreferenced_blob_is_removed(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        old_blob = first.get_blob_path(first.checksum)
+
+        second = _upload(u"aaaaaaaa-1111", b"bye,world")
+
+        assert not os.path.exists(old_blob)
+        assert os.path.samefile(
+            second.get_path(u"aaaaaaaa-1111"),
+            second.get_blob_path(second.checksum))
+
+    def test_shared_blob_is_kept_while_referenced(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        _upload(u"bbbbbbbb-2222", b"hello,world")
+        blob = first.get_blob_path(first.checksum)
+
+        _upload(u"aaaaaaaa-1111", b"bye,world")
+
+        assert os.stat(blob).st_nlink == 2
+
+    def test_stored_hash_finds_the_blob_to_release(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        old_blob = first.get_blob_path(first.checksum)
+        hashed = []
+
+        def hash_file(input_file, max_size):
+            hashed.append(input_file.read())
+            return _hash_file(input_file, max_size)
+
+        _hash_file = plugin._hash_file
+        monkeypatch.setattr(plugin, u"_hash_file", hash_file)
+        _upload(u"aaaaaaaa-1111", b"bye,world", hash=first.checksum)
+
+        # only the new content is read
+        assert hashed == [b"bye,world"]
+        assert not os.path.exists(old_blob)
+
+    def test_wrong_stored_hash_is_ignored(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        other = _upload(u"bbbbbbbb-2222", b"other,world")
+        old_blob = first.get_blob_path(first.checksum)
+
+        _upload(u"aaaaaaaa-1111", b"bye,world", hash=other.checksum)
+
+        assert not os.path.exists(old_blob)
+        assert os.path.exists(other.get_blob_path(other.checksum))
+
+    def test_blob_changes_wait_for_the_lock(
+            self, ckan_config, monkeypatch, tmpdir):
+        monkeypatch.setitem(ckan_config, u"ckan.storage_path", str(tmpdir))
+        first = _upload(u"aaaaaaaa-1111", b"hello,world")
+        blob = first.get_blob_path(first.checksum)
+        lock_path = os.path.join(os.path.dirname(blob), u".lock")
+
+        with open(lock_path, u"a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            thread = threading.Thread(
+                target=_upload, args=(u"bbbbbbbb-2222", b"hello,world"))
+            thread.start()
+            thread.join(0.2)
+            assert thread.is_alive()
+            assert os.stat(blob).st_nlink == 2
+        thread.join()
+
+        assert os.stat(blob).st_nlink == 3
+
+
+@pytest.mark.ckan_config(u"ckan.plugins", u"dedup_storage")
+@pytest.mark.usefixtures(u"clean_db", u"with_plugins")
+def test_resources_share_uploaded_file(create_with_upload):
+    dataset = factories.Dataset()
+    res_1 = create_with_upload(
+        u"hello,world", u"file.csv", package_id=dataset[u"id"])
+    res_2 = create_with_upload(
+        u"hello,world", u"copy.csv", package_id=dataset[u"id"])
+
+    upload = uploader.get_resource_uploader(res_1)
+    assert isinstance(upload, DedupResourceUpload)
+    assert res_1[u"hash"] == res_2[u"hash"]
+    assert os.path.samefile(
+        upload.get_path(res_1[u"id"]), upload.get_path(res_2[u"id"]))
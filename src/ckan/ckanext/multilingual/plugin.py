@@ -1,7 +1,9 @@
 # encoding: utf-8
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
 
 import ckan
 import ckan.lib.navl.dictization_functions
@@ -10,7 +12,82 @@ import ckan.model
 import ckan.plugins as plugins
 
 from ckan.common import request, config, g
-from ckan.logic import get_action
+from ckan.lib import request_cache, signals
+from ckan.lib.redis import connect_to_redis
+
+# All the term translations, as {lang_code: {term: translation}}, together
+# with the generation they were loaded at
+_translations: Optional[tuple[Optional[bytes], dict[str, dict[str, str]]]] = None
+
+
+def _get_generation_key() -> str:
+    return 'ckan:{}:multilingual:generation'.format(config['ckan.site_id'])
+
+
+def _get_generation() -> Optional[bytes]:
+    # the generation changes every time translations are updated by any
+    # CKAN process. Check it only once per request
+    return request_cache.get(
+        'multilingual', 'generation',
+        lambda: connect_to_redis().get(_get_generation_key()))
+
+
+def get_translations() -> dict[str, dict[str, str]]:
+    '''Return all the term translations, as a dict of
+    ``{lang_code: {term: translation}}``.
+
+    The translations are loaded from the database in a single query and
+    kept in memory until they are updated with ``term_translation_update``
+    or ``term_translation_update_many``.
+    '''
+    global _translations
+    generation = _get_generation()
+    if _translations is None or _translations[0] != generation:
+        table: dict[str, dict[str, str]] = {}
+        trans_table = ckan.model.term_translation_table
+        for term, translation, lang_code in ckan.model.Session.execute(
+                select(trans_table.c['term'],
+                       trans_table.c['term_translation'],
+                       trans_table.c['lang_code'])):
+            table.setdefault(lang_code, {})[term] = translation
+        _translations = (generation, table)
+    return _translations[1]
+
+
+def term_translations(
+        terms: Iterable[str],
+        lang_codes: Iterable[str]) -> list[dict[str, str]]:
+    '''Return the translations of the terms into the given languages, in
+    the same format as ``term_translation_show``, without querying the
+    database.
+    '''
+    table = get_translations()
+    languages = [(lang_code, table.get(lang_code, {}))
+                 for lang_code in dict.fromkeys(lang_codes)]
+    return [
+        {'term': term, 'term_translation': translations[term],
+         'lang_code': lang_code}
+        for term in dict.fromkeys(terms)
+        for lang_code, translations in languages
+        if term in translations
+    ]
+
+
+def invalidate_translations() -> None:
+    '''Discard the translations cached by every CKAN process.'''
+    global _translations
+    _translations = None
+    request_cache.invalidate('multilingual')
+    connect_to_redis().incr(_get_generation_key())
+
+
+def _on_action_succeeded(action_name: str, **kwargs: Any) -> None:
+    if action_name in (
+            'term_translation_update', 'term_translation_update_many'):
+        invalidate_translations()
+
+
+signals.action_succeeded.connect(_on_action_succeeded)
 
 
 def translate_data_dict(data_dict: dict[str, Any]):
@@ -46,10 +123,8 @@ def translate_data_dict(data_dict: dict[str, Any]):
                     terms.add(item)
 
     # Get the translations of all the terms (as a list of dictionaries).
-    translations = get_action('term_translation_show')(
-            {},
-            {'terms': terms,
-                'lang_codes': (desired_lang_code, fallback_lang_code)})
+    translations = term_translations(
+            terms, (desired_lang_code, fallback_lang_code))
 
     # Transform the translations into a more convenient structure.
     desired_translations = {}
@@ -137,10 +212,8 @@ def translate_resource_data_dict(data_dict: dict[str, Any]):
                  terms.add(item)
 
     # Get the translations of all the terms (as a list of dictionaries).
-    translations = get_action('term_translation_show')(
-            {},
-            {'terms': terms,
-                'lang_codes': (desired_lang_code, fallback_lang_code)})
+    translations = term_translations(
+            terms, (desired_lang_code, fallback_lang_code))
     # Transform the translations into a more convenient structure.
     desired_translations = {}
     fallback_translations = {}
@@ -215,10 +288,8 @@ class MultilingualDataset(plugins.SingletonPlugin):
         ## translate title
         title = search_data.get('title')
         search_data['title_' + default_lang] = title
-        title_translations = get_action('term_translation_show')(
-                          {},
-                          {'terms': [title],
-                           'lang_codes': self.LANGS})
+        title_translations = term_translations(
+                [title], self.LANGS)
 
         for translation in title_translations:
             title_field = 'title_' + translation['lang_code']
@@ -235,10 +306,8 @@ class MultilingualDataset(plugins.SingletonPlugin):
                 if isinstance(item, str):
                     all_terms.append(item)
 
-        field_translations = get_action('term_translation_show')(
-                          {},
-                          {'terms': all_terms,
-                           'lang_codes': self.LANGS})
+        field_translations = term_translations(
+                all_terms, self.LANGS)
 
         text_field_items = dict(('text_' + lang, []) for lang in self.LANGS)
 
@@ -306,10 +375,8 @@ class MultilingualDataset(plugins.SingletonPlugin):
         for facet in facets.values():
             for item in facet['items']:
                 terms.add(item['display_name'])
-        translations = get_action('term_translation_show')(
-                {},
-                {'terms': terms,
-                    'lang_codes': (desired_lang_code, fallback_lang_code)})
+        translations = term_translations(
+                terms, (desired_lang_code, fallback_lang_code))
 
         # Replace facet display names with translated ones.
         for facet in facets.values():
@@ -344,10 +411,8 @@ class MultilingualDataset(plugins.SingletonPlugin):
         except AttributeError:
             return translate_data_dict(dataset_dict)
         terms = [value for _param, value in fields]
-        translations = get_action('term_translation_show')(
-                {},
-                {'terms': terms,
-                 'lang_codes': (desired_lang_code, fallback_lang_code)})
+        translations = term_translations(
+                terms, (desired_lang_code, fallback_lang_code))
         g.translated_fields = {}
         for param, value in fields:
             matching_translations = [translation for translation in
@@ -237,3 +237,41 @@ class TestDatasetSearchIndex(object):
             u"title_it": u"italian david",
             "text_ru": "",
         }, result
+
+
+@pytest.mark.ckan_config("ckan.plugins", "multilingual_dataset")
+@pytest.mark.usefixtures("clean_db", "clean_redis", "with_plugins")
+class TestTranslationsCache(object):
+    def _translate(self, term, lang_code):
+        call_action(
+            "term_translation_update",
+            term=term, term_translation=term + "_" + lang_code,
+            lang_code=lang_code)
+
+    def test_translations_are_cached(self):
+        self._translate("moo", "fr")
+        assert mulilingual_plugin.term_translations(["moo"], ["fr"]) == [{
+            "term": "moo", "term_translation": "moo_fr", "lang_code": "fr"
+        }]
+
+        # not seen until the cache is invalidated
+        model.Session.execute(model.term_translation_table.delete())
+        model.Session.commit()
+        assert mulilingual_plugin.term_translations(["moo"], ["fr"])
+
+        mulilingual_plugin.invalidate_translations()
+        assert mulilingual_plugin.term_translations(["moo"], ["fr"]) == []
+
+    def test_update_invalidates_translations(self):
+        self._translate("moo", "fr")
+        assert mulilingual_plugin.term_translations(["boo"], ["fr"]) == []
+
+        call_action("term_translation_update_many", data=[{
+            "term": "boo", "term_translation": "boo_fr", "lang_code": "fr"
+        }])
+        assert mulilingual_plugin.term_translations(
+            ["moo", "boo", "moo"], ["fr", "de"]
+        ) == [
+            {"term": "moo", "term_translation": "moo_fr", "lang_code": "fr"},
+            {"term": "boo", "term_translation": "boo_fr", "lang_code": "fr"},
+        ]
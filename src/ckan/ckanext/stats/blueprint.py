@@ -19,37 +19,43 @@ def index():
         'top_tags': stats.top_tags(),
         'top_package_creators': stats.top_package_creators(),
         'most_edited_packages': stats.most_edited_packages(),
-        'new_packages_by_week': stats.get_by_week('new_packages'),
-        'deleted_packages_by_week': stats.get_by_week('deleted_packages'),
-        'num_packages_by_week': stats.get_num_packages_by_week(),
-        'package_revisions_by_week': stats.get_by_week('package_revisions')
     }
 
+    # weekly numbers are read from the summary table, which is refreshed
+    # in the background. Until the first refresh is done it is empty
+    summary = stats.get_weekly_summary()
+    stats.schedule_weekly_summary_refresh()
+    extra_vars['summary_pending'] = not stats.is_weekly_summary_ready()
+
+    new_packages = summary['new_packages']
+    deleted_packages = summary['deleted_packages']
+    package_revisions = summary['package_revisions']
+
     extra_vars['raw_packages_by_week'] = []
     for week_date, num_packages, cumulative_num_packages\
-            in stats.get_num_packages_by_week():
+            in stats.get_num_packages_by_week_from(
+                new_packages, deleted_packages):
         extra_vars['raw_packages_by_week'].append(
             {'date': h.date_str_to_datetime(week_date),
              'total_packages': cumulative_num_packages})
 
+    # all the weekly series start on the same week, so they can be shown in
+    # the same table
+    first_week = min(
+        (min(weeks) for weeks in summary.values() if weeks), default=None)
     extra_vars['raw_all_package_revisions'] = []
-    for week_date, _revs, num_revisions, _cumulative_num_revisions\
-            in stats.get_by_week('package_revisions'):
-        extra_vars['raw_all_package_revisions'].append(
-            {'date': h.date_str_to_datetime(week_date),
-             'total_revisions': num_revisions})
-
     extra_vars['raw_new_datasets'] = []
-    for week_date, _pkgs, num_packages, _cumulative_num_revisions\
-            in stats.get_by_week('new_packages'):
-        extra_vars['raw_new_datasets'].append(
-            {'date': h.date_str_to_datetime(week_date),
-             'new_packages': num_packages})
-
     extra_vars['raw_deleted_datasets'] = []
-    for week_date, _pkgs, num_packages, cumulative_num_packages\
-            in stats.get_by_week('deleted_packages'):
+    for week in stats.get_weeks(first_week):
+        week_date = h.date_str_to_datetime(
+            week.strftime(stats_lib.DATE_FORMAT))
+        extra_vars['raw_all_package_revisions'].append(
+            {'date': week_date,
+             'total_revisions': package_revisions.get(week, 0)})
+        extra_vars['raw_new_datasets'].append(
+            {'date': week_date,
+             'new_packages': new_packages.get(week, 0)})
         extra_vars['raw_deleted_datasets'].append(
-            {'date': h.date_str_to_datetime(
-                week_date), 'deleted_packages': num_packages})
+            {'date': week_date,
+             'deleted_packages': deleted_packages.get(week, 0)})
     return render(u'ckanext/stats/index.html', extra_vars)
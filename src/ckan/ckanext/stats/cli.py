@@ -0,0 +1,21 @@
+# encoding: utf-8
+
+import click
+
+from ckanext.stats.stats import Stats
+
+__all__ = [u"stats"]
+
+
+@click.group(short_help=u"Statistics page commands")
+def stats():
+    pass
+
+
+@stats.command()
+@click.option(u"--full", is_flag=True,
+              help=u"Count all the weeks again, not only the latest ones")
+def refresh(full: bool):
+    """Update the weekly numbers shown on the statistics page."""
+    Stats.refresh_weekly_summary(full)
+    click.secho(u"Weekly statistics updated", fg=u"green")
@@ -0,0 +1,31 @@
+# encoding: utf-8
+
+"""Create stats_weekly_summary table
+
+Revision ID: 1989a66ca2f1
+Revises:
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1989a66ca2f1'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stats_weekly_summary',
+        sa.Column('object_type', sa.UnicodeText, primary_key=True),
+        sa.Column('week', sa.Date, primary_key=True),
+        sa.Column('count', sa.Integer, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('stats_weekly_summary')
@@ -9,6 +9,8 @@ from ckanext.stats import blueprint
 log = getLogger(__name__)
 
 
+@p.toolkit.blanket.cli
+@p.toolkit.blanket.config_declarations
 class StatsPlugin(p.SingletonPlugin):
     u'''Stats plugin.'''
 
@@ -5,14 +5,36 @@ import datetime
 import logging
 from typing import Any, ClassVar, Optional, Union
 
-from sqlalchemy import Table, select, join, func, and_
+from sqlalchemy import (
+    Column, Table, select, join, func, and_, literal_column, types
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.sql import Select
 
 import ckan.model as model
+from ckan.common import config
+from ckan.lib.redis import connect_to_redis
 
 log = logging.getLogger(__name__)
 
 DATE_FORMAT = "%Y-%m-%d"
 
+# objects counted by week
+WEEKLY_OBJECT_TYPES = ("new_packages", "deleted_packages", "package_revisions")
+
+# number of objects of each type by week, maintained by
+# Stats.refresh_weekly_summary
+weekly_summary_table = Table(
+    "stats_weekly_summary",
+    model.meta.metadata,
+    Column("object_type", types.UnicodeText, primary_key=True),
+    Column("week", types.Date, primary_key=True),
+    Column("count", types.Integer, nullable=False),
+)
+
+# key of the advisory lock serializing refreshes of the summary table
+SUMMARY_LOCK_KEY = 1953718639
+
 
 def table(name: str):
     return Table(
@@ -159,9 +181,14 @@ class Stats(object):
         )
         res_ids = model.Session.execute(s).fetchall()
 
+        pkgs = {
+            pkg.id: pkg for pkg in model.Session.query(model.Package).filter(
+                model.Package.id.in_([pkg_id for pkg_id, _val in res_ids])
+            )
+        }
         res_pkgs: list[tuple[model.Package, int]] = []
         for pkg_id, val in res_ids:
-            pkg = model.Session.query(model.Package).get(str(pkg_id))
+            pkg = pkgs.get(pkg_id)
             assert pkg
             res_pkgs.append((pkg, val))
 
@@ -173,85 +200,100 @@ class Stats(object):
         @return: Returns list of revisions and date of them, in
                  format: [(id, date), ...]
         """
-        package = table("package")
-        activity = table("activity")
-        s = select(
-            package.c["id"],
-            activity.c["timestamp"]
-        ).select_from(activity).join(
-            package, activity.c["object_id"] == package.c["id"]
-        ).order_by(
-            activity.c["timestamp"]
-        )
+        s = cls._object_dates("package_revisions").order_by("timestamp")
         res = model.Session.execute(s).fetchall()
         return res
 
     @classmethod
-    def get_by_week(cls, object_type: str) -> list[tuple[str, list[str], int, int]]:
-        cls._object_type = object_type
-
-        def objects_by_week() -> list[tuple[str, list[str], int, int]]:
-            if cls._object_type == "new_packages":
-                objects = cls.get_new_packages()
-
-                def get_date(object_date: int) -> datetime.date:  # type: ignore
-                    return datetime.date.fromordinal(object_date)
-
-            elif cls._object_type == "deleted_packages":
-                objects = cls.get_deleted_packages()
-
-                def get_date(object_date: int) -> datetime.date:  # type: ignore
-                    return datetime.date.fromordinal(object_date)
-
-            elif cls._object_type == "package_revisions":
-                objects = cls.get_package_revisions()
-
-                def get_date(object_date: datetime.datetime):
-                    return datetime2date(object_date)
-
-            else:
-                raise NotImplementedError()
-            first_date = (
-                get_date(objects[0][1])  # type: ignore
-                if objects else datetime.date.today()
+    def _object_dates(cls, object_type: str) -> Select:
+        """
+        @return: Returns a query of the objects of the type and their date,
+                 in columns "id" and "timestamp"
+        """
+        package = table("package")
+        activity = table("activity")
+        if object_type == "package_revisions":
+            s = select(
+                package.c["id"].label("id"),
+                activity.c["timestamp"].label("timestamp")
             )
-            week_commences = cls.get_date_week_started(first_date)
-            week_ends = week_commences + datetime.timedelta(days=7)
-            weekly_pkg_ids: list[tuple[str, list[str], int, int]] = []
-            pkg_id_stack = []
-            cls._cumulative_num_pkgs = 0
-
-            def build_weekly_stats(week_commences: datetime.date, pkg_ids: list[str]) -> tuple[str, list[str], int, int]:
-                num_pkgs = len(pkg_ids)
-                cls._cumulative_num_pkgs += num_pkgs
-                return (
-                    week_commences.strftime(DATE_FORMAT),
-                    pkg_ids,
-                    num_pkgs,
-                    cls._cumulative_num_pkgs,
+        elif object_type in ("new_packages", "deleted_packages"):
+            # Can't filter by time in select because 'min' function has to
+            # be 'for all time' else you get first revision in the time
+            # period.
+            s = select(
+                package.c["id"].label("id"),
+                func.min(activity.c["timestamp"]).label("timestamp")
+            ).group_by(package.c["id"])
+            if object_type == "deleted_packages":
+                s = s.where(
+                    activity.c["activity_type"] == "deleted package"
                 )
+        else:
+            raise NotImplementedError()
+        return s.select_from(activity).join(
+            package, activity.c["object_id"] == package.c["id"]
+        )
 
-            for pkg_id, date_field in objects:
-                date_ = get_date(date_field)  # type: ignore
-                if date_ >= week_ends:
-                    weekly_pkg_ids.append(
-                        build_weekly_stats(week_commences, pkg_id_stack)
-                    )
-                    pkg_id_stack = []
-                    week_commences = week_ends
-                    week_ends = week_commences + datetime.timedelta(days=7)
-                pkg_id_stack.append(pkg_id)
-            weekly_pkg_ids.append(
-                build_weekly_stats(week_commences, pkg_id_stack)
-            )
-            today = datetime.date.today()
-            while week_ends <= today:
-                week_commences = week_ends
-                week_ends = week_commences + datetime.timedelta(days=7)
-                weekly_pkg_ids.append(build_weekly_stats(week_commences, []))
-            return weekly_pkg_ids
+    @classmethod
+    def _weekly_query(cls, object_type: str,
+                      since: Optional[datetime.date] = None,
+                      with_ids: bool = False) -> Select:
+        """
+        @return: Returns a query of the weeks with objects of the type, in
+                 format: [(week_commences, num_objects[, ids]), ...]
+        """
+        objects = cls._object_dates(object_type).subquery()
+        week = func.date_trunc(
+            literal_column("'week'"), objects.c["timestamp"])
+        columns = [week, func.count()]
+        if with_ids:
+            columns.append(func.array_agg(
+                aggregate_order_by(objects.c["id"], objects.c["timestamp"])
+            ))
+        s = select(*columns).group_by(week).order_by(week)
+        if since:
+            s = s.where(objects.c["timestamp"] >= since)
+        return s
 
-        return objects_by_week()
+    @classmethod
+    def get_weeks(cls, first_week: Optional[datetime.date]
+               ) -> list[datetime.date]:
+        """
+        @return: Returns the first day of every week from first_week until
+                 the current one
+        """
+        today = datetime.date.today()
+        week = first_week or cls.get_date_week_started(today)
+        weeks = []
+        while week <= today:
+            weeks.append(week)
+            week += datetime.timedelta(days=7)
+        return weeks
+
+    @classmethod
+    def get_by_week(cls, object_type: str) -> list[tuple[str, list[str], int, int]]:
+        if object_type not in WEEKLY_OBJECT_TYPES:
+            raise NotImplementedError()
+        rows = model.Session.execute(
+            cls._weekly_query(object_type, with_ids=True)
+        ).fetchall()
+        by_week = {
+            week.date(): (ids, num) for week, num, ids in rows
+        }
+
+        weekly_pkg_ids: list[tuple[str, list[str], int, int]] = []
+        cls._cumulative_num_pkgs = 0
+        for week in cls.get_weeks(min(by_week, default=None)):
+            pkg_ids, num_pkgs = by_week.get(week, ([], 0))
+            cls._cumulative_num_pkgs += num_pkgs
+            weekly_pkg_ids.append((
+                week.strftime(DATE_FORMAT),
+                pkg_ids,
+                num_pkgs,
+                cls._cumulative_num_pkgs,
+            ))
+        return weekly_pkg_ids
 
     @classmethod
     def get_new_packages(cls) -> list[tuple[str, int]]:
@@ -259,32 +301,11 @@ class Stats(object):
         @return: Returns list of new pkgs and date when they were created, in
                  format: [(id, date_ordinal), ...]
         """
-
-        def new_packages() -> list[tuple[str, int]]:
-            # Can't filter by time in select because 'min' function has to
-            # be 'for all time' else you get first revision in the time period.
-            package = table("package")
-            activity = table("activity")
-            s = (
-                select(
-                    package.c["id"],
-                    func.min(activity.c["timestamp"])
-                ).select_from(activity)
-                .join(
-                    package, activity.c["object_id"] == package.c["id"]
-                )
-                .group_by(
-                    package.c["id"]
-                )
-                .order_by(func.min(activity.c["timestamp"]))
-            )
-            res = model.Session.execute(s).fetchall()
-            res_pickleable: list[tuple[str, int]] = []
-            for pkg_id, created_datetime in res:
-                res_pickleable.append((pkg_id, created_datetime.toordinal()))
-            return res_pickleable
-
-        return new_packages()
+        s = cls._object_dates("new_packages").order_by("timestamp")
+        return [
+            (pkg_id, created_datetime.toordinal())
+            for pkg_id, created_datetime in model.Session.execute(s)
+        ]
 
     @classmethod
     def get_date_week_started(cls, date_: Union[datetime.datetime, datetime.date]):
@@ -294,93 +315,124 @@ class Stats(object):
         return date_ - datetime.timedelta(days=datetime.date.weekday(date_))
 
     @classmethod
-    def get_num_packages_by_week(cls):
-        def num_packages() -> list[tuple[str, int, int]]:
-            new_packages_by_week = cls.get_by_week("new_packages")
-            deleted_packages_by_week = cls.get_by_week("deleted_packages")
-            first_date = (
-                min(
-                    datetime.datetime.strptime(
-                        new_packages_by_week[0][0], DATE_FORMAT
-                    ),
-                    datetime.datetime.strptime(
-                        deleted_packages_by_week[0][0], DATE_FORMAT
-                    ),
-                )
-            ).date()
-            cls._cumulative_num_pkgs = 0
-            new_pkgs = []
-            deleted_pkgs = []
-
-            def build_weekly_stats(
-                week_commences: datetime.date, new_pkg_ids: list[str], deleted_pkg_ids: list[str]
-            ) -> tuple[str, int, int]:
-                num_pkgs = len(new_pkg_ids) - len(deleted_pkg_ids)
-                new_pkgs.extend(
-                    pkg.name for pkg in
-                    [model.Session.query(model.Package).get(id)
-                     for id in new_pkg_ids] if pkg
-                )
-                deleted_pkgs.extend(
-                    pkg.name for pkg in
-                    [model.Session.query(model.Package).get(id)
-                     for id in deleted_pkg_ids] if pkg
-                )
-                cls._cumulative_num_pkgs += num_pkgs
-                return (
-                    week_commences.strftime(DATE_FORMAT),
-                    num_pkgs,
-                    cls._cumulative_num_pkgs,
-                )
+    def get_num_packages_by_week(cls) -> list[tuple[str, int, int]]:
+        new_packages = cls._get_weekly_counts("new_packages")
+        deleted_packages = cls._get_weekly_counts("deleted_packages")
+        return cls.get_num_packages_by_week_from(
+            new_packages, deleted_packages)
 
-            week_ends = first_date
-            today = datetime.date.today()
-            new_package_week_index = 0
-            deleted_package_week_index = 0
-            # [(week_commences, num_packages, cumulative_num_pkgs])]
-            weekly_numbers: list[tuple[str, int, int]] = []
-            while week_ends <= today:
-                week_commences = week_ends
-                week_ends = week_commences + datetime.timedelta(days=7)
-                if (
-                    datetime.datetime.strptime(
-                        new_packages_by_week[new_package_week_index][0],
-                        DATE_FORMAT,
-                    ).date()
-                    == week_commences
-                ):
-                    new_pkg_ids = new_packages_by_week[new_package_week_index][
-                        1
-                    ]
-                    new_package_week_index += 1
-                else:
-                    new_pkg_ids = []
-                if (
-                    datetime.datetime.strptime(
-                        deleted_packages_by_week[deleted_package_week_index][
-                            0
-                        ],
-                        DATE_FORMAT,
-                    ).date()
-                    == week_commences
-                ):
-                    deleted_pkg_ids = deleted_packages_by_week[
-                        deleted_package_week_index
-                    ][1]
-                    deleted_package_week_index += 1
-                else:
-                    deleted_pkg_ids = []
-                weekly_numbers.append(
-                    build_weekly_stats(
-                        week_commences, new_pkg_ids, deleted_pkg_ids
-                    )
-                )
-            # just check we got to the end of each count
-            assert new_package_week_index == len(new_packages_by_week)
-            assert deleted_package_week_index == len(deleted_packages_by_week)
-            return weekly_numbers
+    @classmethod
+    def _get_weekly_counts(cls, object_type: str) -> dict[datetime.date, int]:
+        return {
+            week.date(): num for week, num in
+            model.Session.execute(cls._weekly_query(object_type))
+        }
+
+    @classmethod
+    def get_num_packages_by_week_from(
+            cls, new_packages: dict[datetime.date, int],
+            deleted_packages: dict[datetime.date, int]
+    ) -> list[tuple[str, int, int]]:
+        # weeks start at the first new or deleted package, or at the current
+        # week if there is none of either
+        this_week = cls.get_date_week_started(datetime.date.today())
+        first_week = min(
+            min(new_packages, default=this_week),
+            min(deleted_packages, default=this_week),
+        )
+        cumulative_num_pkgs = 0
+        # [(week_commences, num_packages, cumulative_num_pkgs])]
+        weekly_numbers: list[tuple[str, int, int]] = []
+        for week in cls.get_weeks(first_week):
+            num_pkgs = (new_packages.get(week, 0)
+                        - deleted_packages.get(week, 0))
+            cumulative_num_pkgs += num_pkgs
+            weekly_numbers.append((
+                week.strftime(DATE_FORMAT), num_pkgs, cumulative_num_pkgs
+            ))
+        return weekly_numbers
+
+    @classmethod
+    def refresh_weekly_summary(cls, full: bool = False) -> None:
+        """
+        Update the number of objects by week stored in the summary table.
 
-        return num_packages()
+        Only the weeks since the last one in the summary table are counted
+        again, unless full is True. Concurrent refreshes wait for each other,
+        so they don't insert the same weeks twice.
+        """
+        summary = weekly_summary_table
+        model.Session.execute(
+            select(func.pg_advisory_xact_lock(SUMMARY_LOCK_KEY)))
+        for object_type in WEEKLY_OBJECT_TYPES:
+            since = None
+            if not full:
+                since = model.Session.execute(
+                    select(func.max(summary.c["week"])).where(
+                        summary.c["object_type"] == object_type)
+                ).scalar()
+            stale = summary.delete().where(
+                summary.c["object_type"] == object_type)
+            if since:
+                # the last week was probably not over yet
+                stale = stale.where(summary.c["week"] >= since)
+            model.Session.execute(stale)
+
+            rows = [
+                {"object_type": object_type, "week": week.date(),
+                 "count": num}
+                for week, num in model.Session.execute(
+                    cls._weekly_query(object_type, since))
+            ]
+            if rows:
+                model.Session.execute(summary.insert(), rows)
+        model.Session.commit()
+        # an empty summary is complete too, e.g. on a site without activity
+        connect_to_redis().set(_summary_key("ready"), 1)
+
+    @classmethod
+    def get_weekly_summary(cls) -> dict[str, dict[datetime.date, int]]:
+        """
+        @return: Returns the number of objects of each type by week, as
+                 stored in the summary table, in format:
+                 {object_type: {week_commences: num_objects}}
+        """
+        summary = weekly_summary_table
+        weekly: dict[str, dict[datetime.date, int]] = {
+            object_type: {} for object_type in WEEKLY_OBJECT_TYPES
+        }
+        for object_type, week, num in model.Session.execute(select(
+                summary.c["object_type"], summary.c["week"],
+                summary.c["count"])):
+            weekly.setdefault(object_type, {})[week] = num
+        return weekly
+
+    @classmethod
+    def is_weekly_summary_ready(cls) -> bool:
+        """
+        @return: Returns True once the summary table has been refreshed,
+                 even if it has no rows
+        """
+        return bool(connect_to_redis().exists(_summary_key("ready")))
+
+    @classmethod
+    def schedule_weekly_summary_refresh(cls) -> None:
+        """
+        Refresh the summary table in a background job, unless it was
+        already done in the last ckanext.stats.summary_refresh_interval
+        seconds.
+        """
+        interval = config.get("ckanext.stats.summary_refresh_interval")
+        key = _summary_key("refreshed")
+        if not connect_to_redis().set(key, 1, nx=True, ex=interval):
+            return
+
+        import ckan.lib.jobs as jobs
+        try:
+            jobs.enqueue(refresh_weekly_summary,
+                         title="Refresh weekly stats summary")
+        except Exception:
+            log.exception("Could not enqueue refresh of weekly stats")
 
     @classmethod
     def get_deleted_packages(cls):
@@ -388,31 +440,17 @@ class Stats(object):
         @return: Returns list of deleted pkgs and date when they were deleted,
                  in format: [(id, date_ordinal), ...]
         """
+        s = cls._object_dates("deleted_packages").order_by("timestamp")
+        return [
+            (pkg_id, deleted_datetime.toordinal())
+            for pkg_id, deleted_datetime in model.Session.execute(s)
+        ]
+
+
+def _summary_key(suffix: str) -> str:
+    return "ckan:{}:stats:summary_{}".format(config["ckan.site_id"], suffix)
 
-        def deleted_packages() -> list[tuple[str, int]]:
-            # Can't filter by time in select because 'min' function has to
-            # be 'for all time' else you get first revision in the time period.
-            package = table("package")
-            activity = table("activity")
-
-            s = (
-                select(
-                    package.c["id"],
-                    func.min(activity.c["timestamp"])
-                ).select_from(activity)
-                .join(
-                    package, activity.c["object_id"] == package.c["id"]
-                )
-                .where(
-                    activity.c["activity_type"] == "deleted package"
-                )
-                .group_by(package.c["id"])
-                .order_by(func.min(activity.c["timestamp"]))
-            )
-            res = model.Session.execute(s).fetchall()
-            res_pickleable: list[tuple[str, int]] = []
-            for pkg_id, deleted_datetime in res:
-                res_pickleable.append((pkg_id, deleted_datetime.toordinal()))
-            return res_pickleable
 
-        return deleted_packages()
+def refresh_weekly_summary(full: bool = False) -> None:
+    """Background job updating the weekly stats summary table."""
+    Stats.refresh_weekly_summary(full)
@@ -2,6 +2,7 @@
 
 import pytest
 import copy
+import datetime
 
 from ckan import model
 from ckan.tests import factories
@@ -201,3 +202,27 @@ class TestStatsPlugin(object):
         assert all([a == b for a, b in zip(num_packages_by_week[2], data3)])
         assert len(num_packages_by_week[3]) == len(data4)
         assert all([a == b for a, b in zip(num_packages_by_week[3], data4)])
+
+    def test_weekly_summary(self, freezer):
+        Stats.refresh_weekly_summary()
+        summary = Stats.get_weekly_summary()
+        week = datetime.date(2011, 1, 10)
+        assert summary["new_packages"] == {datetime.date(2011, 1, 3): 4}
+        assert summary["deleted_packages"] == {week: 1}
+        assert summary["package_revisions"][week] == 1
+
+        # only the latest weeks are counted again
+        freezer.move_to('2011-1-27')
+        ActivityFactory(
+            user_id=factories.User()["id"],
+            object_id=model.Package.by_name(u'test1').id,
+            activity_type="changed package",
+            data={"package": {}, "actor": "Mr Someone"},
+        )
+        model.repo.commit_and_remove()
+        Stats.refresh_weekly_summary()
+        summary = Stats.get_weekly_summary()
+        assert summary["package_revisions"][datetime.date(2011, 1, 24)] == 2
+        assert Stats.get_num_packages_by_week_from(
+            summary["new_packages"], summary["deleted_packages"]
+        )[:2] == [('2011-01-03', 4, 4), ('2011-01-10', -1, 3)]
@@ -1,7 +1,11 @@
 # encoding: utf-8
 
+from unittest import mock
+
 import pytest
 
+from ckanext.stats.stats import Stats, WEEKLY_OBJECT_TYPES
+
 
 @pytest.mark.ckan_config(u'ckan.plugins', u'stats')
 @pytest.mark.usefixtures(u'with_plugins')
@@ -9,3 +13,24 @@ class TestStatsPlugin(object):
     def test_stats_available(self, app):
         resp = app.get(u'/stats')
         assert resp.status_code == 200
+
+    @pytest.mark.usefixtures(u'clean_redis')
+    def test_empty_summary_is_refreshed_in_the_background(self, app):
+        empty = {object_type: {} for object_type in WEEKLY_OBJECT_TYPES}
+        with mock.patch.object(
+                Stats, u'get_weekly_summary', return_value=empty), \
+                mock.patch.object(Stats, u'refresh_weekly_summary') as refresh, \
+                mock.patch.object(
+                    Stats, u'schedule_weekly_summary_refresh') as schedule:
+            resp = app.get(u'/stats')
+        assert not refresh.called
+        assert schedule.called
+        assert u'Weekly statistics are being calculated' in resp.body
+
+    @pytest.mark.usefixtures(u'clean_db', u'clean_redis')
+    def test_empty_summary_is_shown_once_refreshed(self, app):
+        Stats.refresh_weekly_summary()
+        with mock.patch.object(Stats, u'schedule_weekly_summary_refresh'):
+            resp = app.get(u'/stats')
+        assert not any(Stats.get_weekly_summary().values())
+        assert u'Weekly statistics are being calculated' not in resp.body
@@ -285,10 +285,27 @@ def update_tracking_solr(start_date: datetime.datetime):
         )
     )
 
-    from ckan.lib.search import rebuild
-
+    from ckan.lib.search import (
+        rebuild, commit, PackageSearchIndex, SearchIndexError,
+        schema_supports_partial_updates)
+
+    partial_updates = config.get("ckan.search.partial_updates") and \
+        schema_supports_partial_updates()
+    index = PackageSearchIndex()
+    updated = False
     for package_id in package_ids:
         try:
+            if partial_updates:
+                summary = ts.get_for_package(package_id)
+                try:
+                    index.update_fields(package_id, {
+                        "views_total": summary["total"],
+                        "views_recent": summary["recent"],
+                    }, defer_commit=True)
+                    updated = True
+                    continue
+                except SearchIndexError:
+                    pass
             rebuild(package_id)
         except logic.NotFound:
             click.echo("Error: package {} not found.".format(package_id))
@@ -298,6 +315,8 @@ def update_tracking_solr(start_date: datetime.datetime):
             return
         except Exception as e:
             error_shout(e)
+    if updated:
+        commit()
     click.echo(
         "search index rebuilding done."
         + (" {} not found.".format(not_found) if not_found else "")